@@ -0,0 +1,296 @@
+import glob
+import json
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from gcs_utils import download_from_gcs, list_gcs_videos, upload_to_gcs
+from proxy import analyze_with_proxy
+from tts_utils import synthesize_speech
+from video_analysis import analyze_video_cached
+from video_editor import add_score_overlay, create_commentary_video
+from workspace import Workspace
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".avi", ".mkv")
+MODE_STAGES = {
+    "analyze": ("download", "analyze"),
+    "commentary": ("download", "analyze", "render", "upload"),
+    "score-overlay": ("download", "analyze", "render", "upload"),
+}
+
+
+def list_batch_sources(source, list_videos=list_gcs_videos):
+    """Expands a directory, a glob, or a gs://bucket/prefix into a sorted list of videos."""
+    if source.startswith("gs://"):
+        return list_videos(source, VIDEO_EXTENSIONS)
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(
+        path for path in paths
+        if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+
+def _run_name(source, root):
+    """Names a run after its path relative to the batch root, so equal basenames don't collide."""
+    source_path = source.replace("gs://", "", 1)
+    root_path = root.replace("gs://", "", 1)
+    if os.path.isdir(root) or root.startswith("gs://"):
+        source_path = os.path.relpath(source_path, root_path)
+    else:
+        source_path = os.path.basename(source_path)
+    return os.path.splitext(source_path)[0].replace(os.sep, "__")
+
+
+class BatchManifest:
+    """
+    Per-run status for a batch, rewritten after every change so that an
+    interrupted batch resumes where it left off.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.runs = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.runs = json.load(f)["runs"]
+
+    def get(self, source):
+        return self.runs.setdefault(source, {"status": "pending", "completed": []})
+
+    def update(self, source, **fields):
+        self.get(source).update(fields)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({"runs": self.runs}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def _download_stage(run, download=download_from_gcs):
+    download(run["source"], run["local_path"])
+    return {}
+
+
+def _analyze_stage(run, cache, motion_trim, use_proxy, analyze=analyze_video_cached):
+    analysis_result = analyze_with_proxy(
+        run["local_path"], run["work_dir"], cache, analyze, motion_trim=motion_trim, use_proxy=use_proxy
+    )
+    with open(run["analysis_path"], 'w') as f:
+        f.write(analysis_result)
+    return {}
+
+
+def _render_stage(run, mode, cache, render_profile, scoreboard=False, synthesize=synthesize_speech):
+    with open(run["analysis_path"], 'r') as f:
+        analysis_result = f.read()
+    if mode == "commentary":
+        create_commentary_video(
+            run["local_path"],
+            analysis_result,
+            run["render_path"],
+            run["work_dir"],
+            synthesize=synthesize,
+            cache=cache,
+            profile=render_profile,
+            scoreboard=scoreboard,
+        )
+    else:
+        add_score_overlay(
+            run["local_path"],
+            analysis_result,
+            run["render_path"],
+            profile=render_profile,
+            cache=cache,
+            scoreboard=scoreboard,
+            temp_dir=run["work_dir"],
+        )
+    if not os.path.exists(run["render_path"]):
+        raise ValueError(f"Rendering produced no output for {run['source']}")
+    return {}
+
+
+def _upload_stage(run, upload=upload_to_gcs):
+    return {"output_uri": upload(run["render_path"], "output")}
+
+
+def _finish(run):
+    """Moves a done run's output out of its work directory, then removes the directory."""
+    if os.path.exists(run["render_path"]):
+        os.replace(run["render_path"], run["output_path"])
+    shutil.rmtree(run["work_dir"], ignore_errors=True)
+
+
+def run_batch(
+    source,
+    mode="analyze",
+    temp_dir="temp",
+    manifest_path=None,
+    download_workers=4,
+    analyze_workers=4,
+    render_workers=None,
+    upload_workers=4,
+    cache=None,
+    render_profile=None,
+    motion_trim=False,
+    use_proxy=True,
+    scoreboard=False,
+    workspace=None,
+    analyze=analyze_video_cached,
+    synthesize=synthesize_speech,
+    download=download_from_gcs,
+    upload=upload_to_gcs,
+    list_videos=list_gcs_videos,
+    results=None,
+    event="",
+):
+    """
+    Runs download -> analyze -> render -> upload for every video in `source`.
+
+    Each stage has its own bounded pool: threads for the network-bound stages
+    and processes for ffmpeg rendering. Runs flow to the next stage as soon as
+    their previous stage finishes, and the number of runs in flight is capped
+    so downloads cannot race far ahead of rendering.
+
+    Each run's work directory is leased from the `workspace` while the run is
+    in flight. Its output is rendered there, so the quota cannot evict it
+    before the upload, and moved to `temp_dir` once the run is done, when
+    the directory and its downloaded source are removed. Downloads first
+    make room under the workspace quota, and a run whose source or output
+    was evicted before it finished fetches or renders it again.
+
+    `analyze`, `synthesize`, `download`, `upload` and `list_videos` default to
+    the Gemini and GCS backends and can be replaced, e.g. with the offline
+    backends in `replay`. `synthesize` runs in the render processes, so it
+    must be picklable.
+
+    Each analysis is recorded under `event` in the `results` store, if one
+    is given, as soon as it finishes.
+    """
+    stages = MODE_STAGES[mode]
+    sources = list_batch_sources(source, list_videos)
+    if not sources:
+        print(f"No videos found for {source}")
+        return {}
+
+    batch_dir = os.path.join(temp_dir, "batch")
+    os.makedirs(batch_dir, exist_ok=True)
+    workspace = workspace or Workspace(temp_dir, exclude=[cache.cache_dir] if cache else ())
+    manifest = BatchManifest(manifest_path or os.path.join(temp_dir, "batch_manifest.json"))
+    render_workers = render_workers or max(1, (os.cpu_count() or 2) // 2)
+
+    executors = {
+        "download": ThreadPoolExecutor(max_workers=download_workers),
+        "analyze": ThreadPoolExecutor(max_workers=analyze_workers),
+        "render": ProcessPoolExecutor(max_workers=render_workers),
+        "upload": ThreadPoolExecutor(max_workers=upload_workers),
+    }
+    max_in_flight = download_workers + analyze_workers + render_workers + upload_workers
+
+    def prepare(video):
+        name = _run_name(video, source)
+        work_dir = os.path.join(batch_dir, name)
+        workspace.acquire(work_dir)
+        is_gcs = video.startswith("gs://")
+        suffix = "commentary" if mode == "commentary" else "score_overlay"
+        run = {
+            "name": name,
+            "source": video,
+            "work_dir": work_dir,
+            "local_path": os.path.join(work_dir, os.path.basename(video)) if is_gcs else video,
+            "analysis_path": os.path.join(temp_dir, f"{name}_analysis.json"),
+            "output_path": os.path.join(temp_dir, f"{name}_{suffix}.mp4"),
+            # Rendered inside the leased directory until the run is done
+            "render_path": os.path.join(work_dir, f"{name}_{suffix}.mp4"),
+        }
+        completed = set(manifest.get(video)["completed"])
+        if not is_gcs:
+            completed.add("download")
+        elif not os.path.exists(run["local_path"]):
+            completed.discard("download")
+        # Completed stages are shared by every mode, so a run finished in
+        # another mode, or whose output was evicted, renders and uploads again
+        rendered = os.path.exists(run["render_path"])
+        if not rendered and not ("upload" in completed and os.path.exists(run["output_path"])):
+            completed.discard("render")
+        if "render" not in completed:
+            completed.discard("upload")
+        return run, [stage for stage in stages if stage not in completed]
+
+    def submit(run, stage):
+        manifest.update(run["source"], status="running", stage=stage)
+        if stage == "download":
+            workspace.enforce_quota()
+            future = executors[stage].submit(_download_stage, run, download)
+        elif stage == "analyze":
+            future = executors[stage].submit(_analyze_stage, run, cache, motion_trim, use_proxy, analyze)
+        elif stage == "render":
+            future = executors[stage].submit(
+                _render_stage, run, mode, cache, render_profile, scoreboard, synthesize
+            )
+        else:
+            future = executors[stage].submit(_upload_stage, run, upload)
+        pending[future] = (run, stage)
+
+    queued = list(sources)
+    print(f"Batch of {len(sources)} videos.")
+    already_done = 0
+    remaining = {}
+    pending = {}
+
+    try:
+        while queued or pending:
+            while queued and len(remaining) < max_in_flight:
+                run, todo = prepare(queued.pop(0))
+                if not todo:
+                    already_done += 1
+                    manifest.update(run["source"], status="done", stage=None)
+                    _finish(run)
+                    continue
+                remaining[run["source"]] = todo
+                submit(run, todo[0])
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                run, stage = pending.pop(future)
+                todo = remaining[run["source"]]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[{stage}] {run['source']} failed: {e}")
+                    manifest.update(run["source"], status="failed", error=str(e))
+                    # A resumed batch reuses the download
+                    workspace.release(run["work_dir"])
+                    del remaining[run["source"]]
+                    continue
+
+                completed = manifest.get(run["source"])["completed"] + [stage]
+                manifest.update(run["source"], completed=completed, error=None, **result)
+                print(f"[{stage}] {run['source']} done.")
+                if stage == "analyze" and results is not None:
+                    with open(run["analysis_path"], 'r') as f:
+                        analysis_result = f.read()
+                    try:
+                        results.add_run(run["name"], analysis_result, event=event, source=run["source"])
+                    except ValueError as e:
+                        print(f"[{stage}] {run['source']} could not be recorded: {e}")
+                todo.pop(0)
+                if todo:
+                    submit(run, todo[0])
+                else:
+                    manifest.update(run["source"], status="done", stage=None)
+                    _finish(run)
+                    del remaining[run["source"]]
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        for run, _ in pending.values():
+            workspace.release(run["work_dir"])
+
+    statuses = [run["status"] for run in manifest.runs.values()]
+    print(
+        f"Batch finished: {statuses.count('done')} done ({already_done} already done), "
+        f"{statuses.count('failed')} failed."
+    )
+    print(f"Manifest written to {manifest.path}")
+    return manifest.runs
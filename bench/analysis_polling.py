@@ -0,0 +1,96 @@
+"""
+Compares fixed 10 s processing polls against adaptive backoff, using a local
+stub of the Gemini files API with simulated upload, processing and
+generation latency.
+
+    python -m bench.analysis_polling --videos 8 --processing 2 6 --concurrency 4
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from google.genai import types
+import video_analysis
+
+EXAMPLE_ANALYSIS = "example_files/shaun_white_analysis.json"
+
+
+class StubFilesAPI:
+    """Files that finish processing after a random delay drawn from `processing_seconds`."""
+
+    def __init__(self, upload_seconds, processing_seconds):
+        self.upload_seconds = upload_seconds
+        self.processing_seconds = processing_seconds
+        self.ready_at = {}
+        self.polls = 0
+        self._names = itertools.count()
+
+    async def upload(self, file, config=None):
+        await asyncio.sleep(self.upload_seconds)
+        name = f"files/stub-{next(self._names)}"
+        self.ready_at[name] = time.monotonic() + random.uniform(*self.processing_seconds)
+        return SimpleNamespace(name=name, state=types.FileState.PROCESSING)
+
+    async def get(self, name):
+        self.polls += 1
+        ready = time.monotonic() >= self.ready_at[name]
+        return SimpleNamespace(name=name, state=types.FileState.ACTIVE if ready else types.FileState.PROCESSING)
+
+    async def delete(self, name):
+        self.ready_at.pop(name, None)
+
+
+class StubModels:
+    def __init__(self, generation_seconds):
+        self.generation_seconds = generation_seconds
+        with open(EXAMPLE_ANALYSIS, 'r') as f:
+            self.analysis = f.read()
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.generation_seconds)
+        return SimpleNamespace(text=self.analysis)
+
+
+def stub_client(upload_seconds, processing_seconds, generation_seconds):
+    return SimpleNamespace(aio=SimpleNamespace(
+        files=StubFilesAPI(upload_seconds, processing_seconds),
+        models=StubModels(generation_seconds),
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark processing-state polling.")
+    parser.add_argument("--videos", type=int, default=8, help="Number of videos to analyze.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Videos analyzed at once.")
+    parser.add_argument("--upload", type=float, default=0.5, help="Simulated upload seconds.")
+    parser.add_argument("--processing", type=float, nargs=2, default=[1.0, 6.0], help="Min and max processing seconds.")
+    parser.add_argument("--generation", type=float, default=1.0, help="Simulated generation seconds.")
+    args = parser.parse_args()
+
+    adaptive = video_analysis._poll_intervals
+    policies = (("fixed-10s", lambda: itertools.repeat(10.0)), ("adaptive", adaptive))
+
+    print(f"{'polling':<10} {'wall (s)':>9} {'upload':>7} {'process':>8} {'generate':>9} {'polls':>6}")
+    for name, intervals in policies:
+        video_analysis._poll_intervals = intervals
+        client = stub_client(args.upload, args.processing, args.generation)
+        paths = [f"run_{i}.mp4" for i in range(args.videos)]
+        start = time.perf_counter()
+        results = asyncio.run(video_analysis.analyze_videos_async(paths, args.concurrency, client))
+        wall = time.perf_counter() - start
+        phases = {
+            phase: statistics.mean(latencies[phase] for _, latencies in results)
+            for phase in ("upload", "processing", "generation")
+        }
+        print(
+            f"{name:<10} {wall:>9.2f} {phases['upload']:>7.2f} {phases['processing']:>8.2f} "
+            f"{phases['generation']:>9.2f} {client.aio.files.polls:>6}"
+        )
+    video_analysis._poll_intervals = adaptive
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares the previous commentary clip handling, one WAV write and one
+ffprobe subprocess per clip, against in-memory `AudioClip`s whose duration
+follows from their PCM length.
+
+    python -m bench.commentary_audio --clips 20 --seconds 4
+"""
+import argparse
+import os
+import tempfile
+import time
+import wave
+import ffmpeg
+from tts_utils import TTS_SAMPLE_RATE, AudioClip, concat_clips
+
+
+def files_and_probes(pcms, temp_dir):
+    durations = []
+    for i, pcm in enumerate(pcms):
+        path = os.path.join(temp_dir, f"temp_audio_{i}.wav")
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(TTS_SAMPLE_RATE)
+            wf.writeframes(pcm)
+        durations.append(float(ffmpeg.probe(path)["format"]["duration"]))
+    return durations
+
+
+def in_memory(pcms):
+    track, offsets = concat_clips([AudioClip(pcm) for pcm in pcms])
+    return offsets, track.duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark commentary clip handling.")
+    parser.add_argument("--clips", type=int, default=20, help="Number of commentary clips.")
+    parser.add_argument("--seconds", type=float, default=4.0, help="Length of each clip.")
+    args = parser.parse_args()
+
+    pcms = [os.urandom(int(TTS_SAMPLE_RATE * args.seconds) * 2) for _ in range(args.clips)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = time.perf_counter()
+        files_and_probes(pcms, temp_dir)
+        files_wall = time.perf_counter() - start
+
+    start = time.perf_counter()
+    in_memory(pcms)
+    memory_wall = time.perf_counter() - start
+
+    print(f"{'clips':<24} {'wall (ms)':>10} {'subprocesses':>13} {'files':>6}")
+    print(f"{'WAV files + ffprobe':<24} {files_wall * 1000:>10.1f} {args.clips:>13} {args.clips:>6}")
+    print(f"{'in memory':<24} {memory_wall * 1000:>10.1f} {0:>13} {0:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares the seek/grab frame sampler against decoding every frame with
+`read()` and discarding the ones that are not kept.
+
+    python -m bench.frame_sampling --duration 120 --intervals 10 30 300
+"""
+import argparse
+import os
+import tempfile
+import time
+import cv2
+from bench.synthetic import make_test_clip
+from extract_frames import SEEK_THRESHOLD_SECONDS, iter_sampled_frames, sample_frame_indices
+
+
+def read_every_frame(video_path, interval):
+    """The previous extraction loop, minus the JPEG writes."""
+    cap = cv2.VideoCapture(video_path)  # pylint: disable=no-member
+    frame_count = 0
+    kept = 0
+    while cap.isOpened():
+        ret, _ = cap.read()
+        if not ret:
+            break
+        if frame_count % interval == 0:
+            kept += 1
+        frame_count += 1
+    cap.release()
+    return kept
+
+
+def sample_with_seeks(video_path, interval):
+    cap = cv2.VideoCapture(video_path)  # pylint: disable=no-member
+    native_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0  # pylint: disable=no-member
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None  # pylint: disable=no-member
+    indices = sample_frame_indices(native_fps, interval, frame_count=frame_count)
+    kept = sum(1 for _ in iter_sampled_frames(cap, indices, int(native_fps * SEEK_THRESHOLD_SECONDS)))
+    cap.release()
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame sampling.")
+    parser.add_argument("--duration", type=int, default=60, help="Synthetic clip length in seconds.")
+    parser.add_argument("--intervals", type=int, nargs="+", default=[10, 30, 300], help="Sampling intervals in frames.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic clip.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_frames_")
+    os.makedirs(work_dir, exist_ok=True)
+    source = make_test_clip(os.path.join(work_dir, f"source_{args.duration}s.mp4"), args.duration)
+
+    print(f"{'interval':>8} {'sampler':<10} {'frames':>7} {'wall (s)':>9} {'frames/s':>9}")
+    for interval in args.intervals:
+        for name, sampler in (("read-all", read_every_frame), ("seek/grab", sample_with_seeks)):
+            start = time.perf_counter()
+            kept = sampler(source, interval)
+            wall = time.perf_counter() - start
+            print(f"{interval:>8} {name:<10} {kept:>7} {wall:>9.2f} {kept / wall:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
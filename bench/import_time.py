@@ -0,0 +1,96 @@
+"""
+Measures CLI startup with `python -X importtime`: each command runs in a
+fresh interpreter, and the cumulative import time of every top-level module
+it loads is parsed from stderr. Reports the wall time and total import time
+of each command and its slowest imports. With `--budget-ms`, exits non-zero
+when a command's imports exceed the budget, so startup regressions fail CI.
+
+    python -m bench.import_time --runs 5 --top 5 --budget-ms 300
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_ANALYSIS = os.path.join(ROOT, "example_files", "shaun_white_analysis.json")
+
+# Commands that should start without loading the Gemini, GCS or OpenCV clients
+COMMANDS = {
+    "help": ["main.py", "--help"],
+    "clean": ["main.py", "clean"],
+    "analyze --help": ["main.py", "analyze", "--help"],
+    "analyze --analysis-file --analyze-only": [
+        "main.py", "analyze", "--local-file", "run.mp4", "--analysis-file", EXAMPLE_ANALYSIS, "--analyze-only"
+    ],
+    "extract_frames --help": ["extract_frames.py", "--help"],
+}
+
+
+def parse_importtime(stderr):
+    """Returns `{module: cumulative_us}` for the top-level imports in `-X importtime` output."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the module that triggered them
+        if name.startswith("  "):
+            continue
+        imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def time_command(argv, work_dir):
+    script, *script_args = argv
+    start = time.perf_counter()
+    # Run from a scratch directory, so `clean` and the analysis output never touch ./temp
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT, script), *script_args],
+        capture_output=True,
+        text=True,
+        cwd=work_dir,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise ValueError(f"{' '.join(argv)} exited with {result.returncode}:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup and import time.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per command; the median is reported.")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per command.")
+    parser.add_argument("--budget-ms", type=float, help="Fail when a command's import time exceeds this.")
+    parser.add_argument("--command", action="append", choices=sorted(COMMANDS), help="Only time these commands.")
+    args = parser.parse_args()
+
+    over_budget = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in args.command or COMMANDS:
+            walls, totals, imports = [], [], {}
+            for _ in range(args.runs):
+                wall, run_imports = time_command(COMMANDS[name], work_dir)
+                walls.append(wall)
+                totals.append(sum(run_imports.values()) / 1000)
+                for module, us in run_imports.items():
+                    imports.setdefault(module, []).append(us / 1000)
+            wall_ms = statistics.median(walls) * 1000
+            import_ms = statistics.median(totals)
+            print(f"\n{name}: {wall_ms:.0f} ms wall, {import_ms:.0f} ms importing")
+            slowest = sorted(imports.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+            for module, ms in slowest[:args.top]:
+                print(f"  {statistics.median(ms):8.1f} ms  {module}")
+            if args.budget_ms is not None and import_ms > args.budget_ms:
+                over_budget.append(name)
+
+    if over_budget:
+        print(f"\nOver the {args.budget_ms:g} ms import budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
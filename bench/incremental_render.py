@@ -0,0 +1,61 @@
+"""
+Measures the review loop of the commentary render: a cold render, an
+unchanged re-render, and re-renders after editing one trick's commentary and
+the final score, all against one cache. Commentary comes from a fake TTS
+backend with simulated latency.
+
+    python -m bench.incremental_render --duration 300 --tricks 8 --tts-latency 1.5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from bench.synthetic import make_test_clip, synthetic_tricks
+from bench.tts_pipeline import FakeTTS
+from cache_utils import ContentCache
+from video_editor import create_commentary_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental commentary re-renders.")
+    parser.add_argument("--duration", type=int, default=180, help="Synthetic clip length in seconds.")
+    parser.add_argument("--tricks", type=int, default=6, help="Number of synthetic tricks.")
+    parser.add_argument("--tts-latency", type=float, default=1.5, help="Mean simulated TTS latency in seconds.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_incremental_")
+    os.makedirs(work_dir, exist_ok=True)
+    source = make_test_clip(os.path.join(work_dir, f"source_{args.duration}s.mp4"), args.duration)
+    cache = ContentCache(tempfile.mkdtemp(prefix="cache_", dir=work_dir))
+    tts = FakeTTS(latency=args.tts_latency, jitter=0.1)
+    tricks = [trick.model_dump() for trick in synthetic_tricks(args.duration, args.tricks)]
+
+    def edit_commentary(tricks):
+        tricks[len(tricks) // 2]["commentary"] += " What a landing!"
+
+    def edit_score(tricks):
+        tricks[-1]["final_run_score"] += 1.5
+
+    results = []
+    for name, edit in (("cold", None), ("unchanged", None), ("commentary edit", edit_commentary),
+                       ("final score edit", edit_score)):
+        if edit:
+            edit(tricks)
+        calls = tts.calls
+        start = time.perf_counter()
+        create_commentary_video(
+            source, json.dumps(tricks), os.path.join(work_dir, "commentary.mp4"), work_dir,
+            synthesize=tts, cache=cache,
+        )
+        results.append((name, time.perf_counter() - start, tts.calls - calls))
+
+    print(f"\n{'render':<17} {'wall (s)':>9} {'tts calls':>10}")
+    for name, wall, calls in results:
+        print(f"{name:<17} {wall:>9.2f} {calls:>10}")
+    cache.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compares answering leaderboard questions by parsing every analysis JSON
+against the indexed SQLite results store, for tens of thousands of
+synthetic runs: the bulk import, then "top 10 runs of an event" and
+"all McTwists scoring more than 80" from each.
+
+    python -m bench.leaderboard --runs 20000 --repeat 20
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from results_store import ResultsStore, run_name, trick_key
+from timeline import Timeline
+
+SKATERS = ["tony_hawk", "shaun_white", "bob_burnquist", "sandro_dias", "pierre_luc_gagnon", "jimmy_wilkins"]
+TRICKS = ["McTwist", "Backside 540", "Frontside 720", "Kickflip Indy", "Heelflip Varial", "900", "Ollie to Fakie"]
+EVENTS = ["heats", "semis", "finals"]
+
+
+def write_runs(work_dir, count, seed=0):
+    """Writes `count` synthetic `<event>/<skater>_<n>_analysis.json` files."""
+    rng = random.Random(seed)
+    for i in range(count):
+        tricks = []
+        for j in range(rng.randint(5, 12)):
+            tricks.append({
+                "trick_name": rng.choice(TRICKS),
+                "time_stamp_start": f"00:{j * 4:02}",
+                "time_stamp_end": f"00:{j * 4 + 3:02}",
+                "description": "Synthetic trick.",
+                "trick_score": round(rng.uniform(50, 98), 1),
+                "previous_tricks": "",
+                "final_run_score": 0.0,
+                "commentary": "Synthetic commentary.",
+            })
+        tricks[-1]["final_run_score"] = round(rng.uniform(50, 98), 1)
+        path = os.path.join(work_dir, rng.choice(EVENTS), f"{rng.choice(SKATERS)}_{i}_analysis.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(tricks, f)
+
+
+def scan_files(work_dir, event, trick, score_above):
+    """Answers both questions the old way, loading and parsing every analysis file."""
+    runs, tricks = [], []
+    for path in glob.glob(os.path.join(work_dir, "*", "*_analysis.json")):
+        with open(path, 'r') as f:
+            timeline = Timeline.from_json(f.read())
+        run_event = os.path.basename(os.path.dirname(path))
+        if run_event == event:
+            runs.append((timeline.final_score, run_name(path)))
+        for t in timeline.tricks:
+            if trick_key(t.trick_name).startswith(trick_key(trick)) and t.trick_score > score_above:
+                tricks.append((t.trick_score, run_name(path)))
+    return sorted(runs, reverse=True)[:10], sorted(tricks, reverse=True)
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark leaderboard queries on the results store.")
+    parser.add_argument("--runs", type=int, default=20000, help="Synthetic runs to generate.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions of each store query.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the analysis files and the store.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_leaderboard_")
+    runs_dir = os.path.join(work_dir, "runs")
+    if not glob.glob(os.path.join(runs_dir, "*", "*_analysis.json")):
+        print(f"Writing {args.runs} synthetic analyses to {runs_dir}...")
+        write_runs(runs_dir, args.runs)
+
+    start = time.perf_counter()
+    (scan_runs, scan_tricks) = scan_files(runs_dir, "finals", "McTwist", 80)
+    scan = time.perf_counter() - start
+
+    db_path = os.path.join(work_dir, "results.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    store = ResultsStore(db_path)
+    start = time.perf_counter()
+    imported = 0
+    for event in EVENTS:
+        imported += store.import_files([os.path.join(runs_dir, event)], event=event)[0]
+    bulk_import = time.perf_counter() - start
+
+    top, top_time = _timed(lambda: store.top_runs(10, event="finals"), args.repeat)
+    tricks, tricks_time = _timed(lambda: store.find_tricks("McTwist", 80, limit=1_000_000), args.repeat)
+    _, stats_time = _timed(lambda: store.trick_stats(20), args.repeat)
+    _, skaters_time = _timed(lambda: store.skater_stats(20), args.repeat)
+    store.close()
+
+    assert [run["final_score"] for run in top] == [score for score, _ in scan_runs]
+    assert len(tricks) == len(scan_tricks)
+    print(f"\n{imported} runs, {len(tricks)} McTwists scoring > 80")
+    print(f"parse every file, both questions: {scan * 1000:10.1f} ms")
+    print(f"bulk import into the store:       {bulk_import * 1000:10.1f} ms (once)")
+    print(f"store: top 10 runs of an event:   {top_time * 1000:10.2f} ms")
+    print(f"store: McTwists scoring > 80:     {tricks_time * 1000:10.2f} ms")
+    print(f"store: per-trick stats:           {stats_time * 1000:10.2f} ms")
+    print(f"store: per-skater stats:          {skaters_time * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures live scoring latency: a synthetic clip with idle and active
+stretches is ingested at its native rate, as a live source would arrive,
+and each closed window is scored by a stub analysis with a fixed delay.
+Reports when each window closed and the latency of each trick's score.
+
+    python -m bench.live_latency --idle 10 --active 6 --runs 3 --analysis-seconds 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from bench.motion_trim import make_idle_active_clip
+from live import LiveScorer
+from timeline import format_timestamp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live scoring latency.")
+    parser.add_argument("--idle", type=int, default=10, help="Seconds of each idle stretch.")
+    parser.add_argument("--active", type=int, default=6, help="Seconds of each active run.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of active runs.")
+    parser.add_argument("--analysis-seconds", type=float, default=5.0, help="Simulated analysis latency.")
+    parser.add_argument("--chunk-seconds", type=float, default=2.0, help="Ingest chunk length.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_live_")
+    os.makedirs(work_dir, exist_ok=True)
+    source = make_idle_active_clip(
+        os.path.join(work_dir, f"idle{args.idle}_active{args.active}_x{args.runs}.mp4"), args.idle, args.active, args.runs
+    )
+
+    def stub_analyze(local_video_path, cache=None, content_digest=None, mime_type=None, prompt_hints=None):
+        time.sleep(args.analysis_seconds)
+        # One trick across the middle of the window
+        return json.dumps([{
+            "trick_name": "Synthetic", "time_stamp_start": format_timestamp(2), "time_stamp_end": format_timestamp(4),
+            "description": "", "trick_score": 80.0, "previous_tricks": "", "final_run_score": 80.0, "commentary": "",
+        }])
+
+    scorer = LiveScorer(
+        os.path.join(work_dir, "live"), analyze=stub_analyze, chunk_seconds=args.chunk_seconds
+    )
+    if os.path.exists(scorer.events_path):
+        os.remove(scorer.events_path)
+    start = time.perf_counter()
+    scorer.run(source, realtime=True)
+    wall = time.perf_counter() - start
+
+    truth = [
+        (args.idle + i * (args.idle + args.active), (i + 1) * (args.idle + args.active)) for i in range(args.runs)
+    ]
+    with open(scorer.events_path) as f:
+        events = [json.loads(line) for line in f]
+    print("\nActive runs:    " + ", ".join(f"{s:.0f}-{e:.0f}" for s, e in truth))
+    print("Scored windows: " + ", ".join(f"{e['window'][0]:.1f}-{e['window'][1]:.1f}" for e in events))
+    print("Latencies (s):  " + ", ".join(f"{e['latency']:.1f}" for e in events))
+    print(f"Stream of {truth[-1][1] + args.idle}s scored in {wall:.1f}s wall time")
+
+
+if __name__ == "__main__":
+    main()
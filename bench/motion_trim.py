@@ -0,0 +1,98 @@
+"""
+Measures the motion pre-pass on a synthetic clip that alternates idle
+stretches (a static, noisy frame) with active ones (a moving pattern):
+detection speed, how well the detected segments match the active spans,
+and how much smaller the uploaded proxy is than the source.
+
+    python -m bench.motion_trim --idle 30 --active 15 --runs 3
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import ffmpeg
+from motion import analyze_active_segments, detect_active_segments
+from timeline import format_timestamp
+
+
+def make_idle_active_clip(path, idle, active, runs, size="1280x720", rate=30):
+    """Renders `runs` active spans of `active` seconds, each preceded and followed by `idle` seconds."""
+    if os.path.exists(path):
+        return path
+    parts = []
+    for i in range(runs * 2 + 1):
+        if i % 2:
+            video = ffmpeg.input(f"testsrc2=size={size}:rate={rate}", f="lavfi", t=active)
+        else:
+            video = ffmpeg.input(f"color=c=gray:size={size}:rate={rate}", f="lavfi", t=idle).filter(
+                "noise", alls=4, allf="t", all_seed=i
+            )
+        parts.append(video)
+    total = idle * (runs + 1) + active * runs
+    audio = ffmpeg.input("sine=frequency=440:sample_rate=48000", f="lavfi", t=total)
+    (
+        ffmpeg.output(
+            ffmpeg.concat(*parts, v=1, a=0), audio, path,
+            vcodec="libx264", preset="ultrafast", pix_fmt="yuv420p", acodec="aac",
+        )
+        .run(overwrite_output=True, quiet=True)
+    )
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the motion pre-pass.")
+    parser.add_argument("--idle", type=int, default=30, help="Seconds of each idle stretch.")
+    parser.add_argument("--active", type=int, default=15, help="Seconds of each active run.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of active runs.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_motion_")
+    os.makedirs(work_dir, exist_ok=True)
+    source = make_idle_active_clip(
+        os.path.join(work_dir, f"idle{args.idle}_active{args.active}_x{args.runs}.mp4"), args.idle, args.active, args.runs
+    )
+    truth = [
+        (args.idle + i * (args.idle + args.active), (i + 1) * (args.idle + args.active)) for i in range(args.runs)
+    ]
+
+    start = time.perf_counter()
+    segments, duration = detect_active_segments(source)
+    detect_seconds = time.perf_counter() - start
+
+    uploaded = {}
+
+    def stub_analyze(local_video_path, cache=None, content_digest=None, mime_type=None, prompt_hints=None):
+        uploaded["bytes"] = os.path.getsize(local_video_path)
+        uploaded["hints"] = prompt_hints
+        # One trick in the middle of each clip of the proxy
+        tricks = []
+        offset = 0.0
+        for clip_start, clip_end in segments:
+            middle = offset + (clip_end - clip_start) / 2
+            tricks.append({
+                "trick_name": "Synthetic", "time_stamp_start": format_timestamp(middle - 1),
+                "time_stamp_end": format_timestamp(middle + 1), "description": "", "trick_score": 80.0,
+                "previous_tricks": "", "final_run_score": 80.0, "commentary": "",
+            })
+            offset += clip_end - clip_start
+        return json.dumps(tricks)
+
+    start = time.perf_counter()
+    analysis = json.loads(analyze_active_segments(source, work_dir, analyze=stub_analyze))
+    proxy_seconds = time.perf_counter() - start - detect_seconds
+
+    print(f"\nSource: {duration:.1f}s, {os.path.getsize(source) / (1024 * 1024):.1f} MB")
+    print(f"Detection: {detect_seconds:.2f}s ({duration / detect_seconds:.0f}x realtime)")
+    print("Active spans:   " + ", ".join(f"{s:.1f}-{e:.1f}" for s, e in truth))
+    print("Detected spans: " + ", ".join(f"{s:.1f}-{e:.1f}" for s, e in segments))
+    print(f"Proxy: {uploaded['bytes'] / (1024 * 1024):.1f} MB uploaded, rendered in {proxy_seconds:.2f}s")
+    print("Remapped trick midpoints: " + ", ".join(
+        f"{trick['time_stamp_start']}-{trick['time_stamp_end']}" for trick in analysis
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures audio alignment of synchronized angles: synthetic angles are cut
+from one recording at known offsets, each with its own microphone coloring
+and noise, and the recovered offsets and alignment time are reported.
+
+    python -m bench.multicam_align --duration 180 --offsets 0 3.25 -7.5
+"""
+import argparse
+import os
+import tempfile
+import time
+import ffmpeg
+from multicam import align_angles
+
+
+def make_angle(path, duration, offset, seed, size="640x360", rate=30):
+    """
+    Renders an angle that starts `offset` seconds into a shared pink noise
+    recording, after `max(0, -offset)` seconds of its own unrelated noise.
+    """
+    if os.path.exists(path):
+        return path
+    lead = max(0.0, -offset)
+    shared = ffmpeg.input(f"anoisesrc=color=pink:duration={duration + 60}:seed=1", f="lavfi").filter(
+        "atrim", start=max(0.0, offset), duration=duration - lead
+    ).filter("asetpts", "PTS-STARTPTS").filter("highpass", f=100 + 200 * seed)
+    hiss = ffmpeg.input(f"anoisesrc=color=white:duration={duration}:seed={seed + 10}:amplitude=0.05", f="lavfi")
+    if lead:
+        shared = ffmpeg.concat(ffmpeg.input(f"anoisesrc=duration={lead}:seed={seed + 20}", f="lavfi"), shared, v=0, a=1)
+    audio = ffmpeg.filter([shared, hiss], "amix", inputs=2, duration="shortest")
+    video = ffmpeg.input(f"testsrc2=size={size}:rate={rate}", f="lavfi", t=duration)
+    (
+        ffmpeg.output(video, audio, path, vcodec="libx264", preset="ultrafast", pix_fmt="yuv420p", acodec="aac")
+        .run(overwrite_output=True, quiet=True)
+    )
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-angle audio alignment.")
+    parser.add_argument("--duration", type=int, default=120, help="Length of each angle in seconds.")
+    parser.add_argument(
+        "--offsets", type=float, nargs="+", default=[0.0, 3.25, -7.5], help="Start of each angle on the shared clock."
+    )
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_multicam_")
+    os.makedirs(work_dir, exist_ok=True)
+    angles = [
+        make_angle(os.path.join(work_dir, f"angle{i}_{offset:+g}s_{args.duration}s.mp4"), args.duration, offset, i)
+        for i, offset in enumerate(args.offsets)
+    ]
+
+    start = time.perf_counter()
+    offsets = align_angles(angles)
+    seconds = time.perf_counter() - start
+
+    print(f"\n{'angle':<6} {'true (s)':>9} {'found (s)':>10} {'error (ms)':>11}")
+    for i, (found, true) in enumerate(zip(offsets, args.offsets)):
+        expected = true - args.offsets[0]
+        print(f"{i:<6} {expected:>9.3f} {found:>10.3f} {abs(found - expected) * 1000:>11.1f}")
+    print(f"Aligned {len(angles)} angles in {seconds:.2f}s; one analysis replaces {len(angles)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures the analysis upload proxy on a synthetic high resolution, high
+frame rate clip: transcode time, how much smaller the upload gets, and
+whether the proxy keeps the source's duration, so timestamps need no mapping.
+
+    python -m bench.proxy_upload --size 3840x2160 --rate 60 --duration 30
+"""
+import argparse
+import os
+import tempfile
+import time
+import ffmpeg
+from proxy import make_proxy
+from render_profiles import PROXY_PROFILE
+
+
+def make_clip(path, size, rate, duration):
+    if os.path.exists(path):
+        return path
+    video = ffmpeg.input(f"testsrc2=size={size}:rate={rate}", f="lavfi", t=duration)
+    audio = ffmpeg.input("sine=frequency=440:sample_rate=48000", f="lavfi", t=duration)
+    (
+        ffmpeg.output(video, audio, path, vcodec="libx264", preset="ultrafast", pix_fmt="yuv420p", acodec="aac")
+        .run(overwrite_output=True, quiet=True)
+    )
+    return path
+
+
+def describe(path):
+    probe = ffmpeg.probe(path)
+    video = next(stream for stream in probe["streams"] if stream["codec_type"] == "video")
+    return (
+        f"{os.path.getsize(path) / (1024 * 1024):.1f} MB, {video['width']}x{video['height']} "
+        f"@ {video['avg_frame_rate']}, video {float(video['duration']):.3f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis upload proxy.")
+    parser.add_argument("--size", default="3840x2160", help="Source resolution.")
+    parser.add_argument("--rate", type=int, default=60, help="Source frame rate.")
+    parser.add_argument("--duration", type=int, default=30, help="Source length in seconds.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_proxy_")
+    os.makedirs(work_dir, exist_ok=True)
+    source = make_clip(
+        os.path.join(work_dir, f"{args.size}_{args.rate}fps_{args.duration}s.mp4"), args.size, args.rate, args.duration
+    )
+    proxy_path = os.path.join(work_dir, "proxy.mp4")
+
+    start = time.perf_counter()
+    make_proxy(source, proxy_path)
+    seconds = time.perf_counter() - start
+
+    print(f"\nProfile: {PROXY_PROFILE}")
+    print(f"Source: {describe(source)}")
+    print(f"Proxy:  {describe(proxy_path)}")
+    print(
+        f"Transcoded in {seconds:.2f}s ({args.duration / seconds:.1f}x realtime); "
+        f"upload is {os.path.getsize(source) / os.path.getsize(proxy_path):.0f}x smaller"
+    )
+
+
+if __name__ == "__main__":
+    main()
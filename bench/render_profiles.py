@@ -0,0 +1,74 @@
+"""
+Renders the score overlay for synthetic clips of several lengths with each
+render profile and reports encode fps, output size and ffmpeg CPU time, so
+profiles can be chosen from measurements on the machine at hand.
+
+    python -m bench.render_profiles --durations 30 120 --profiles preview fast archive
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+from bench.synthetic import make_test_clip, synthetic_tricks
+from render_profiles import RENDER_PROFILES
+from video_editor import add_score_overlay
+
+FRAME_RATE = 30
+
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark render profiles.")
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 120], help="Clip lengths in seconds.")
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=sorted(RENDER_PROFILES),
+        default=list(RENDER_PROFILES),
+        help="Profiles to compare.",
+    )
+    parser.add_argument("--size", default="1280x720", help="Resolution of the synthetic clips.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs and renders.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_profiles_")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = []
+    for duration in args.durations:
+        source = make_test_clip(
+            os.path.join(work_dir, f"source_{duration}s_{args.size}.mp4"), duration, args.size, FRAME_RATE
+        )
+        analysis_json = json.dumps([trick.model_dump() for trick in synthetic_tricks(duration, 1)])
+        for name in args.profiles:
+            output = os.path.join(work_dir, f"{name}_{duration}s.mp4")
+            cpu_before = children_cpu_seconds()
+            start = time.perf_counter()
+            # A full render, so every frame goes through the profile's encoder
+            add_score_overlay(source, analysis_json, output, segmented=False, profile=name)
+            wall = time.perf_counter() - start
+            results.append({
+                "profile": name,
+                "duration": duration,
+                "wall": wall,
+                "fps": duration * FRAME_RATE / wall,
+                "cpu": children_cpu_seconds() - cpu_before,
+                "size_mb": os.path.getsize(output) / (1024 * 1024),
+            })
+
+    print(f"\n{'profile':<9} {'clip (s)':>8} {'wall (s)':>9} {'enc fps':>8} {'cpu (s)':>8} {'size (MB)':>10}")
+    for r in results:
+        print(
+            f"{r['profile']:<9} {r['duration']:>8} {r['wall']:>9.2f} {r['fps']:>8.1f} "
+            f"{r['cpu']:>8.2f} {r['size_mb']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compares the single-pass commentary render against the previous multi-input
+render on a synthetic clip.
+
+    python -m bench.render_single_pass --duration 120 --tricks 20
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import ffmpeg
+from bench.synthetic import make_test_clip, make_tone_wav, synthetic_tricks
+from timeline import Timeline, parse_timestamp
+from tts_utils import AudioClip, concat_clips
+from video_editor import build_commentary_graph
+
+
+def legacy_render(source_video_path, tricks, audio_clips, output_video_path, temp_dir):
+    """The previous render path: one source input per segment plus one frame grab per trick."""
+    video_streams = []
+    audio_streams = []
+    last_end_time = 0
+    original_audio = ffmpeg.input(source_video_path)['a']
+
+    for i, (trick, (audio_path, audio_duration)) in enumerate(zip(tricks, audio_clips)):
+        trick_end_time = parse_timestamp(trick.time_stamp_end)
+        video_streams.append(
+            ffmpeg.input(source_video_path).trim(start=last_end_time, end=trick_end_time).setpts('PTS-STARTPTS')
+        )
+        temp_frame_path = os.path.join(temp_dir, f"temp_frame_{i}.jpg")
+        ffmpeg.input(source_video_path, ss=trick_end_time).output(temp_frame_path, vframes=1).run(
+            overwrite_output=True, quiet=True
+        )
+        video_streams.append(ffmpeg.input(temp_frame_path, loop=1, t=audio_duration)['v'])
+        audio_streams.append(
+            original_audio.filter('atrim', start=last_end_time, end=trick_end_time).filter('asetpts', 'PTS-STARTPTS')
+        )
+        audio_streams.append(ffmpeg.input(audio_path)['a'])
+        last_end_time = trick_end_time
+
+    video_streams.append(
+        ffmpeg.input(source_video_path)
+        .trim(start=last_end_time)
+        .setpts("PTS-STARTPTS")
+        .drawtext(
+            text=f"Final Score: {tricks[-1].final_run_score}",
+            x="w-tw-10",
+            y="h-th-10",
+            fontsize=48,
+            fontcolor="white",
+            box=1,
+            boxcolor="black@0.5",
+            boxborderw=5,
+            enable="between(t,1,6)",
+        )
+    )
+    audio_streams.append(original_audio.filter("atrim", start=last_end_time).filter("asetpts", "PTS-STARTPTS"))
+    final_video = ffmpeg.concat(*video_streams, v=1, a=0)
+    final_audio = ffmpeg.concat(*audio_streams, v=0, a=1)
+    ffmpeg.output(final_video, final_audio, output_video_path).run(overwrite_output=True, quiet=True)
+
+
+def single_pass_render(source_video_path, tricks, audio_clips, output_video_path, temp_dir):
+    commentary_track, offsets = concat_clips([AudioClip.from_wav(audio_path) for audio_path, _ in audio_clips])
+    build_commentary_graph(source_video_path, Timeline(tricks), commentary_track, offsets, output_video_path).run(
+        input=commentary_track.pcm, overwrite_output=True, quiet=True
+    )
+
+
+def _measure(render, args):
+    start = time.perf_counter()
+    render(*args)
+    wall = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return wall, usage.ru_maxrss / 1024, usage.ru_utime + usage.ru_stime
+
+
+def measure(render, *args):
+    """Runs `render` in a fresh process so peak RSS only covers its ffmpeg children."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_measure, render, args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark commentary rendering.")
+    parser.add_argument("--duration", type=int, default=60, help="Synthetic clip length in seconds.")
+    parser.add_argument("--tricks", type=int, default=10, help="Number of synthetic tricks.")
+    parser.add_argument("--commentary-seconds", type=float, default=4.0, help="Length of each commentary clip.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_render_")
+    os.makedirs(work_dir, exist_ok=True)
+    source = make_test_clip(os.path.join(work_dir, f"source_{args.duration}s.mp4"), args.duration)
+    tone = make_tone_wav(os.path.join(work_dir, f"tone_{args.commentary_seconds}s.wav"), args.commentary_seconds)
+    tricks = synthetic_tricks(args.duration, args.tricks)
+    audio_clips = [(tone, args.commentary_seconds)] * len(tricks)
+
+    print(f"{'render':<12} {'wall (s)':>10} {'peak RSS (MB)':>14} {'CPU (s)':>10}")
+    for name, render in (("legacy", legacy_render), ("single-pass", single_pass_render)):
+        output = os.path.join(work_dir, f"{name}.mp4")
+        wall, peak_rss, cpu = measure(render, source, tricks, audio_clips, output, work_dir)
+        print(f"{name:<12} {wall:>10.2f} {peak_rss:>14.1f} {cpu:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares two ways of burning a running per-trick scoreboard into a video
+as the trick count grows: one `drawtext` filter per trick with an `enable`
+window, evaluated on every frame, against pre-rendered score cards composited
+by a single `overlay` filter from `scoreboard.apply_overlays`.
+
+    python -m bench.scoreboard_overlay --duration 60 --tricks 5 20 50
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+import ffmpeg
+from bench.synthetic import make_test_clip, synthetic_tricks
+from scoreboard import FINAL_SCORE_SECONDS, apply_overlays, score_overlays
+from timeline import Timeline
+
+DRAWTEXT_STYLE = {
+    "x": "w-tw-10",
+    "y": "h-th-10",
+    "fontsize": 48,
+    "fontcolor": "white",
+    "box": 1,
+    "boxcolor": "black@0.5",
+    "boxborderw": 5,
+    "line_spacing": 8,
+}
+
+
+def drawtext_chain(video, overlays):
+    """One `drawtext` per card, each enabled over its own window."""
+    for lines, start, end in overlays:
+        enable = f"gte(t,{start})" if end is None else f"between(t,{start},{end})"
+        video = video.drawtext(text="\n".join(lines), enable=enable, **DRAWTEXT_STYLE)
+    return video
+
+
+def _run(video):
+    """Runs `video` through the graph into the null muxer, so the filters dominate, and returns wall and CPU seconds."""
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    ffmpeg.output(video, "-", f="null").run(overwrite_output=True, quiet=True)
+    wall = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return wall, (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoreboard overlay rendering.")
+    parser.add_argument("--duration", type=int, default=60, help="Synthetic clip length in seconds.")
+    parser.add_argument("--tricks", type=int, nargs="+", default=[5, 20, 50], help="Trick counts to compare.")
+    parser.add_argument("--size", default="1280x720", help="Synthetic clip size.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_scoreboard_")
+    os.makedirs(work_dir, exist_ok=True)
+    source_path = make_test_clip(os.path.join(work_dir, f"source_{args.duration}s_{args.size}.mp4"), args.duration, args.size)
+
+    results = []
+    for count in args.tricks:
+        timeline = Timeline(synthetic_tricks(args.duration, count))
+        overlays = score_overlays(timeline, args.duration - FINAL_SCORE_SECONDS, scoreboard=True)
+        source = ffmpeg.input(source_path)
+        wall, cpu = _run(drawtext_chain(source.video, overlays))
+        results.append((count, f"{len(overlays)} drawtext", wall, cpu))
+
+        source = ffmpeg.input(source_path)
+        start = time.perf_counter()
+        video = apply_overlays(source.video, overlays, os.path.join(work_dir, f"cards_{count}"))
+        cards = time.perf_counter() - start
+        wall, cpu = _run(video)
+        results.append((count, "1 overlay", wall + cards, cpu))
+
+    print(f"\n{'tricks':>6} {'filters':<14} {'wall (s)':>9} {'cpu (s)':>8}")
+    for count, filters, wall, cpu in results:
+        print(f"{count:>6} {filters:<14} {wall:>9.2f} {cpu:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares segment-level rendering, which stream-copies untouched spans,
+against re-encoding the whole video, for the score overlay and the
+commentary render.
+
+    python -m bench.segment_render --duration 300 --tricks 8
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from bench.synthetic import make_test_clip, make_tone_wav, synthetic_tricks
+from segment_render import render_segments
+from timeline import Timeline
+from tts_utils import AudioClip, concat_clips
+from video_editor import add_score_overlay, build_commentary_graph, build_commentary_segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segment-level rendering.")
+    parser.add_argument("--duration", type=int, default=180, help="Synthetic clip length in seconds.")
+    parser.add_argument("--tricks", type=int, default=6, help="Number of synthetic tricks.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the synthetic inputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_segments_")
+    os.makedirs(work_dir, exist_ok=True)
+    source = make_test_clip(os.path.join(work_dir, f"source_{args.duration}s.mp4"), args.duration)
+    tone = make_tone_wav(os.path.join(work_dir, "tone_4.0s.wav"), 4.0)
+    tricks = synthetic_tricks(args.duration, args.tricks)
+    analysis_json = json.dumps([trick.model_dump() for trick in tricks])
+    timeline = Timeline(tricks)
+    audio_clips = [AudioClip.from_wav(tone)] * len(tricks)
+    commentary_track, offsets = concat_clips(audio_clips)
+
+    renders = (
+        ("overlay", "full", lambda out: add_score_overlay(source, analysis_json, out, segmented=False)),
+        ("overlay", "segments", lambda out: add_score_overlay(source, analysis_json, out)),
+        ("commentary", "full", lambda out: build_commentary_graph(
+            source, timeline, commentary_track, offsets, out
+        ).run(input=commentary_track.pcm, overwrite_output=True, quiet=True)),
+        ("commentary", "segments", lambda out: render_segments(
+            source, build_commentary_segments(timeline, audio_clips), out
+        )),
+    )
+
+    results = []
+    for render, mode, run in renders:
+        start = time.perf_counter()
+        run(os.path.join(work_dir, f"{render}_{mode}.mp4"))
+        results.append((render, mode, time.perf_counter() - start))
+
+    print(f"{'render':<11} {'mode':<9} {'wall (s)':>9}")
+    for render, mode, wall in results:
+        print(f"{render:<11} {mode:<9} {wall:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
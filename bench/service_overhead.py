@@ -0,0 +1,102 @@
+"""
+Compares the startup cost of a cold `python main.py` process against the
+per-job overhead of the scoring service, using a stub analysis backend so
+only the process and queueing overhead is measured. A final burst shows
+the service rejecting jobs once its queue is full.
+
+    python -m bench.service_overhead --jobs 50 --cold-runs 3
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from bench.synthetic import make_test_clip
+from service import ScoringService, create_server
+
+EXAMPLE_ANALYSIS = "example_files/shaun_white_analysis.json"
+
+
+def stub_analyze(local_video_path, cache=None, content_digest=None, mime_type=None, delay=0.0):
+    time.sleep(delay)
+    with open(EXAMPLE_ANALYSIS, 'r') as f:
+        return f.read()
+
+
+def post_job(base_url, source):
+    request = urllib.request.Request(
+        f"{base_url}/jobs",
+        data=json.dumps({"source": source}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def get_json(url):
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def wait_for_job(base_url, job_id):
+    while True:
+        job = get_json(f"{base_url}/jobs/{job_id}")
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.005)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoring service overhead.")
+    parser.add_argument("--jobs", type=int, default=50, help="Sequential jobs sent to the service.")
+    parser.add_argument("--cold-runs", type=int, default=3, help="Cold `main.py` startups to time.")
+    parser.add_argument("--burst", type=int, default=20, help="Jobs submitted at once against a queue of 4.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_service_")
+    source = make_test_clip(f"{work_dir}/source_5s.mp4", 5)
+
+    cold = []
+    for _ in range(args.cold_runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", "--help"], check=True, capture_output=True)
+        cold.append(time.perf_counter() - start)
+
+    service = ScoringService(temp_dir=work_dir, analyze=stub_analyze)
+    server = create_server(service, port=0, workers=2, queue_size=4)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    latencies = []
+    for _ in range(args.jobs):
+        start = time.perf_counter()
+        status, job = post_job(base_url, source)
+        assert status == 202, job
+        job = wait_for_job(base_url, job["id"])
+        assert job["status"] == "done", job
+        latencies.append(time.perf_counter() - start)
+
+    # Slow jobs so the burst outpaces the two workers
+    service.analyze = lambda *a, **kw: stub_analyze(*a, delay=0.5, **kw)
+    statuses = [post_job(base_url, source)[0] for _ in range(args.burst)]
+
+    server.shutdown()
+    server.server_close()
+    server.jobs.close()
+
+    print(f"cold main.py startup:      {statistics.median(cold) * 1000:8.1f} ms (median of {len(cold)})")
+    print(f"service job round trip:    {statistics.median(latencies) * 1000:8.1f} ms (median of {len(latencies)})")
+    print(f"burst of {args.burst}: {statuses.count(202)} accepted, {statuses.count(503)} rejected with 503")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import ffmpeg
+from video_analysis import Trick
+
+
+def make_test_clip(path, duration=60, size="1280x720", rate=30):
+    """Renders a synthetic test clip with a moving pattern and a tone."""
+    if os.path.exists(path):
+        return path
+    video = ffmpeg.input(f"testsrc2=size={size}:rate={rate}", f="lavfi", t=duration)
+    audio = ffmpeg.input("sine=frequency=440:sample_rate=48000", f="lavfi", t=duration)
+    (
+        ffmpeg.output(video, audio, path, vcodec="libx264", preset="ultrafast", pix_fmt="yuv420p", acodec="aac")
+        .run(overwrite_output=True, quiet=True)
+    )
+    return path
+
+
+def make_tone_wav(path, duration, rate=24000):
+    """Renders a mono tone WAV, standing in for a commentary clip."""
+    if os.path.exists(path):
+        return path
+    (
+        ffmpeg.input(f"sine=frequency=880:sample_rate={rate}", f="lavfi", t=duration)
+        .output(path, ac=1)
+        .run(overwrite_output=True, quiet=True)
+    )
+    return path
+
+
+def synthetic_tricks(duration, count):
+    """Spreads `count` evenly spaced tricks across a clip of `duration` seconds."""
+    spacing = duration / (count + 1)
+    tricks = []
+    for i in range(count):
+        start = int(spacing * (i + 0.5))
+        end = int(spacing * (i + 1))
+        tricks.append(Trick(
+            trick_name=f"Trick {i + 1}",
+            time_stamp_start=f"{start // 60:02}:{start % 60:02}",
+            time_stamp_end=f"{end // 60:02}:{end % 60:02}",
+            description="Synthetic trick.",
+            trick_score=80.0,
+            previous_tricks="",
+            final_run_score=80.0 if i == count - 1 else 0.0,
+            commentary=f"Commentary for trick {i + 1}.",
+        ))
+    return tricks
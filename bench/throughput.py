@@ -0,0 +1,154 @@
+"""
+End-to-end throughput of the batch pipeline on the offline replay backends.
+
+Copies of a synthetic clip are placed in a replay GCS bucket and run through
+download -> analyze -> render -> upload at each concurrency level, with the
+analysis, TTS and GCS latencies drawn from the `REPLAY_*_LATENCY`
+distributions scaled by `--latency-scale`. Reports runs/hour, CPU
+utilization across all cores, and latency percentiles of every traced stage.
+
+    python -m bench.throughput --runs 8 --concurrency 1 2 4 --latency-scale 0.1
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+import tracing
+from batch import run_batch
+from bench.synthetic import make_test_clip
+from replay import (
+    REPLAY_ANALYSIS_LATENCY,
+    REPLAY_GCS_LATENCY,
+    REPLAY_TTS_LATENCY,
+    Latency,
+    ReplayAnalysis,
+    ReplayGCS,
+    ReplayTTS,
+)
+
+
+def _cpu_seconds():
+    """CPU time of this process and its reaped children, which include the render processes and ffmpeg."""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def percentile(values, q):
+    """The `q`th percentile of `values` by linear interpolation."""
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def stage_latencies(trace_path):
+    latencies = {}
+    with open(trace_path, 'r') as f:
+        for line in f:
+            record = json.loads(line)
+            latencies.setdefault(record["stage"], []).append(record["wall"])
+    return latencies
+
+
+def run_level(args, gcs, concurrency, work_dir):
+    temp_dir = os.path.join(work_dir, f"concurrency_{concurrency}")
+    trace_path = os.path.join(temp_dir, "trace.jsonl")
+    os.makedirs(temp_dir, exist_ok=True)
+    tracing.configure(trace_path)
+
+    def latency(spec, seed):
+        return Latency.parse(spec, scale=args.latency_scale, seed=seed)
+
+    cpu_before = _cpu_seconds()
+    start = time.perf_counter()
+    runs = run_batch(
+        f"gs://{gcs.bucket}/runs/",
+        args.mode,
+        temp_dir,
+        download_workers=concurrency,
+        analyze_workers=concurrency,
+        render_workers=concurrency,
+        upload_workers=concurrency,
+        use_proxy=not args.no_proxy,
+        analyze=ReplayAnalysis(latency=latency(REPLAY_ANALYSIS_LATENCY, 1)),
+        synthesize=ReplayTTS(latency=latency(REPLAY_TTS_LATENCY, 2)),
+        download=gcs.download,
+        upload=gcs.upload,
+        list_videos=gcs.list_videos,
+    )
+    wall = time.perf_counter() - start
+    cpu = _cpu_seconds() - cpu_before
+    done = sum(run["status"] == "done" for run in runs.values())
+    return {
+        "concurrency": concurrency,
+        "done": done,
+        "failed": len(runs) - done,
+        "wall": wall,
+        "runs_per_hour": done / wall * 3600,
+        "cpu_utilization": cpu / (wall * (os.cpu_count() or 1)),
+        "stages": stage_latencies(trace_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end batch throughput on replay backends.")
+    parser.add_argument("--runs", type=int, default=8, help="Videos in the replay bucket.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4], help="Workers per stage to compare.")
+    parser.add_argument("--duration", type=int, default=30, help="Synthetic clip length in seconds.")
+    parser.add_argument("--size", default="1280x720", help="Synthetic clip size.")
+    parser.add_argument("--mode", default="commentary", choices=["analyze", "commentary", "score-overlay"])
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=0.1,
+        help="Multiplier on the replay latencies; 1 replays them at full length.",
+    )
+    parser.add_argument("--no-proxy", action="store_true", help="Skip the analysis proxy transcode.")
+    parser.add_argument("--work-dir", default=None, help="Directory for the clip, bucket and outputs.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_throughput_")
+    os.makedirs(work_dir, exist_ok=True)
+    source_path = make_test_clip(
+        os.path.join(work_dir, f"source_{args.duration}s_{args.size}.mp4"), args.duration, args.size
+    )
+    gcs = ReplayGCS(
+        os.path.join(work_dir, "gcs"), bucket="bench", latency=Latency.parse(REPLAY_GCS_LATENCY, scale=args.latency_scale)
+    )
+    bucket_dir = os.path.join(gcs.root, gcs.bucket, "runs")
+    shutil.rmtree(bucket_dir, ignore_errors=True)
+    os.makedirs(bucket_dir)
+    for i in range(args.runs):
+        os.link(source_path, os.path.join(bucket_dir, f"run_{i:03}.mp4"))
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"\n=== concurrency {concurrency} ===")
+        results.append(run_level(args, gcs, concurrency, work_dir))
+
+    print(f"\n{'workers':>7} {'done':>5} {'failed':>6} {'wall (s)':>9} {'runs/hour':>10} {'CPU util':>9}")
+    for result in results:
+        print(
+            f"{result['concurrency']:>7} {result['done']:>5} {result['failed']:>6} {result['wall']:>9.1f} "
+            f"{result['runs_per_hour']:>10.0f} {result['cpu_utilization']:>9.0%}"
+        )
+    for result in results:
+        print(f"\nStage latency at concurrency {result['concurrency']} (s):")
+        print(f"  {'stage':<20} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'mean':>8}")
+        for name, walls in sorted(result["stages"].items(), key=lambda item: -sum(item[1])):
+            print(
+                f"  {name:<20} {len(walls):>6} {percentile(walls, 50):>8.2f} {percentile(walls, 90):>8.2f} "
+                f"{percentile(walls, 99):>8.2f} {statistics.mean(walls):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
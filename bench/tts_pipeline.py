@@ -0,0 +1,75 @@
+"""
+Measures commentary synthesis with a fake TTS backend that simulates network
+latency and rate limiting, at different concurrency caps.
+
+    python -m bench.tts_pipeline --clips 20 --latency 1.5 --concurrency 1 4 8
+"""
+import argparse
+import random
+import threading
+import time
+from tts_utils import iter_commentary_audio
+
+
+class FakeRateLimitError(Exception):
+    code = 429
+
+
+class FakeTTS:
+    """
+    Stands in for the Gemini TTS model: sleeps for a jittered latency and
+    returns silent PCM whose length scales with the text. Once more than
+    `rate_limit` requests are in flight it raises a 429 instead.
+    """
+
+    def __init__(self, latency=1.0, jitter=0.3, rate_limit=None, rate=24000, chars_per_second=15):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate = rate
+        self.chars_per_second = chars_per_second
+        self.in_flight = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            limited = self.rate_limit is not None and self.in_flight > self.rate_limit
+            if limited:
+                self.rate_limited += 1
+        try:
+            if limited:
+                time.sleep(0.05)
+                raise FakeRateLimitError("429 RESOURCE_EXHAUSTED")
+            time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+            samples = int(self.rate * len(text) / self.chars_per_second)
+            return b"\x00\x00" * samples
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent commentary synthesis.")
+    parser.add_argument("--clips", type=int, default=20, help="Number of commentary clips.")
+    parser.add_argument("--latency", type=float, default=1.5, help="Mean simulated request latency in seconds.")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Simulated concurrent request limit.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Concurrency caps to compare.")
+    args = parser.parse_args()
+
+    texts = [f"Trick {i + 1} lands clean with huge amplitude over the coping." for i in range(args.clips)]
+    print(f"{'concurrency':>11} {'wall (s)':>10} {'calls':>6} {'429s':>6}")
+    for concurrency in args.concurrency:
+        backend = FakeTTS(latency=args.latency, rate_limit=args.rate_limit)
+        start = time.perf_counter()
+        for _ in iter_commentary_audio(texts, max_concurrency=concurrency, synthesize=backend):
+            pass
+        wall = time.perf_counter() - start
+        print(f"{concurrency:>11} {wall:>10.2f} {backend.calls:>6} {backend.rate_limited:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "2048"))
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    Returns the hex MD5 of a file's bytes. MD5 is what GCS reports for
+    uploaded objects, so a local file and its GCS copy share cache keys.
+    """
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _size_or_zero(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def content_key(*parts):
+    """Derives a cache key from every input that affects a cached result."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ContentCache:
+    """
+    A directory of cached results addressed by content hash.
+
+    Entries live under `<cache_dir>/<namespace>/<key[:2]>/<key><suffix>`. Hits
+    refresh an entry's mtime, and once the cache grows past `max_bytes` the
+    least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(_size_or_zero(path) for path, _ in self._entries())
+
+    def __getstate__(self):
+        # Caches are handed to worker processes by directory; stats stay local
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["stats"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                # In-flight writes; stale ones are left to the workspace's orphan sweep
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.path.getmtime(path)
+                except FileNotFoundError:
+                    continue
+
+    def _record(self, namespace, outcome):
+        with self._lock:
+            counts = self.stats.setdefault(namespace, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def path_for(self, namespace, key, suffix=""):
+        return os.path.join(self.cache_dir, namespace, key[:2], f"{key}{suffix}")
+
+    def get_path(self, namespace, key, suffix=""):
+        """Returns the path of a cached entry, or None on a miss."""
+        path = self.path_for(namespace, key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._record(namespace, "misses")
+            return None
+        self._record(namespace, "hits")
+        return path
+
+    def get_text(self, namespace, key, suffix=""):
+        path = self.get_path(namespace, key, suffix)
+        if path is None:
+            return None
+        with open(path, 'r') as f:
+            return f.read()
+
+    def put_file(self, namespace, key, source_path, suffix="", move=False):
+        """Stores a file in the cache and returns its cached path."""
+        path = self.path_for(namespace, key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if move:
+            shutil.move(source_path, temp_path)
+        else:
+            shutil.copyfile(source_path, temp_path)
+        return self._commit(temp_path, path)
+
+    def put_bytes(self, namespace, key, data, suffix=""):
+        """Stores bytes in the cache and returns the cached path."""
+        path = self.path_for(namespace, key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        return self._commit(temp_path, path)
+
+    def put_text(self, namespace, key, text, suffix=""):
+        path = self.path_for(namespace, key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        return self._commit(temp_path, path)
+
+    def _commit(self, temp_path, path):
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+        with self._lock:
+            self._size += os.path.getsize(path) - previous_size
+        self.evict()
+        return path
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in `max_bytes`."""
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            self._size = sum(_size_or_zero(path) for path, _ in entries)
+            for path, _ in entries:
+                if self._size <= self.max_bytes:
+                    break
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    # Another worker sharing the cache evicted it first
+                    continue
+                self._size -= size
+                print(f"Evicted {os.path.relpath(path, self.cache_dir)} from cache")
+
+    def print_stats(self):
+        for namespace, counts in sorted(self.stats.items()):
+            print(f"Cache {namespace}: {counts['hits']} hits, {counts['misses']} misses")
+        print(f"Cache size: {self._size / (1024 * 1024):.1f} MB of {self.max_bytes / (1024 * 1024):.0f} MB")
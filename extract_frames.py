@@ -1,98 +1,256 @@
-import cv2
 import os
 import argparse
+import itertools
+import json
+import math
+import queue
 import tempfile
+import threading
 import shutil
-from google.cloud import storage
 from dotenv import load_dotenv
-import google.genai as genai
-from PIL import Image
+from pydantic import BaseModel
+from video_analysis import get_client
+from timeline import Timeline
+from gcs_utils import GCS_STREAM_THRESHOLD_MB, resolve_video_source, upload_dir_to_gcs
+from tracing import stage
 
 load_dotenv()
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME")
 GCS_FRAMES_OUTPUT_FOLDER = os.getenv("GCS_FRAMES_OUTPUT_FOLDER", "frames")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+# Gaps longer than this are seeked over rather than decoded frame by frame
+SEEK_THRESHOLD_SECONDS = float(os.getenv("SEEK_THRESHOLD_SECONDS", "4"))
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-
-def download_from_gcs(gcs_uri, local_path):
-    """Downloads a file from GCS."""
-    client = storage.Client()
-    bucket_name, blob_name = gcs_uri.replace("gs://", "").split("/", 1)
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
-    blob.download_to_filename(local_path)
-    print(f"Downloaded {gcs_uri} to {local_path}")
-
-def upload_dir_to_gcs(local_dir, gcs_bucket_name, gcs_folder):
-    """Uploads a directory to a GCS bucket."""
-    client = storage.Client()
-    bucket = client.bucket(gcs_bucket_name)
-    for local_file in os.listdir(local_dir):
-        local_path = os.path.join(local_dir, local_file)
-        if os.path.isfile(local_path):
-            blob_name = f"{gcs_folder}/{local_file}"
-            blob = bucket.blob(blob_name)
-            blob.upload_from_filename(local_path)
-    print(f"Uploaded frames to gs://{gcs_bucket_name}/{gcs_folder}")
-
-
-def analyze_frame_with_gemini(image_path):
-    """Sends an image to the Gemini API and asks for a description."""
-    if not GEMINI_API_KEY:
-        print("GEMINI_API_KEY not found in .env file. Skipping analysis.")
-        return
+FRAME_ANALYSIS_PROMPT = """What skateboarding trick is the person doing in each of these video frames?
+Each frame is preceded by its frame index and timestamp. Return one entry per frame, using its frame index."""
 
-    print(f"Analyzing frame: {os.path.basename(image_path)}")
-    try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
-        image = Image.open(image_path)
-        prompt = "What skateboarding trick is this person doing in this image?"
-        response = client.models.generate_content(
+
+class FrameAnalysis(BaseModel):
+    frame_index: int
+    trick_name: str
+    description: str
+
+
+def analyze_frames_with_gemini(frames):
+    """
+    Sends a batch of adjacent frames to the Gemini API in one request.
+
+    `frames` is a list of `(frame_index, timestamp, jpeg_bytes)` tuples, and the
+    result is a list of `FrameAnalysis`, one per frame.
+    """
+    from google.genai import types
+
+    print(f"Analyzing frames: {', '.join(str(frame_index) for frame_index, _, _ in frames)}")
+    contents = [FRAME_ANALYSIS_PROMPT]
+    for frame_index, timestamp, jpeg_bytes in frames:
+        contents.append(f"Frame {frame_index} at {timestamp:.2f}s:")
+        contents.append(types.Part.from_bytes(data=jpeg_bytes, mime_type="image/jpeg"))
+
+    with stage("gemini.frames", frames=len(frames)):
+        response = get_client().models.generate_content(
             model=f"models/{GEMINI_MODEL}",
-            contents=[prompt, image]
+            contents=contents,
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": list[FrameAnalysis],
+            },
         )
-        if response.text:
-            print(f"  Gemini says: {response.text.strip()}")
-        else:
-            print("  Gemini did not provide a text response.")
-    except Exception as e:
-        print(f"  Error analyzing frame: {e}")
+    return [FrameAnalysis(**analysis) for analysis in json.loads(response.text)]
+
+
+def _frame_analysis_worker(batches, results, results_lock, analyze_frames=analyze_frames_with_gemini):
+    while True:
+        batch = batches.get()
+        if batch is None:
+            return
+        try:
+            analyses = analyze_frames(batch)
+        except Exception as e:
+            print(f"  Error analyzing frames {batch[0][0]}-{batch[-1][0]}: {e}")
+            continue
+        with results_lock:
+            results.extend(analyses)
+
+
+def trick_windows(analysis_json, padding=1.0):
+    """Returns `(start, end)` seconds for each trick in an analysis JSON, padded on both sides."""
+    return Timeline.from_json(analysis_json).windows(padding)
+
+
+def sample_frame_indices(native_fps, interval=60, fps=None, windows=None, frame_count=None):
+    """
+    Yields the indices of the frames to keep, in increasing order.
+
+    Frames are taken every `interval` frames, or `fps` times per second when
+    given. With `windows`, sampling is restricted to those `(start, end)`
+    second ranges and restarts at the beginning of each one.
+    """
+    if fps:
+        step = native_fps / fps
+    else:
+        step = interval
+
+    if not windows:
+        windows = [(0.0, frame_count / native_fps if frame_count else float("inf"))]
+
+    last_index = -1
+    for start, end in sorted(windows):
+        first = math.ceil(start * native_fps)
+        last = end * native_fps
+        if frame_count:
+            last = min(last, frame_count - 1)
+        for k in itertools.count():
+            index = first + round(k * step)
+            if index > last:
+                break
+            if index > last_index:
+                yield index
+                last_index = index
+
+
+def iter_sampled_frames(cap, indices, seek_threshold):
+    """
+    Yields `(index, frame)` for each requested frame index.
+
+    Frames in short gaps are skipped with `grab()`, which avoids the color
+    conversion and copy of `read()`. Gaps longer than `seek_threshold` frames
+    seek instead, so whole keyframe intervals are never decoded.
+    """
+    import cv2
+
+    position = 0
+    for index in indices:
+        if index - position > seek_threshold:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)  # pylint: disable=no-member
+            position = index
+        while position < index:
+            if not cap.grab():
+                return
+            position += 1
+        ret, frame = cap.read()
+        if not ret:
+            return
+        position += 1
+        yield index, frame
 
 
-def extract_frames(video_path, output_dir, interval=60, analyze=False):
+def extract_frames(
+    video_path,
+    output_dir,
+    interval=60,
+    analyze=False,
+    fps=None,
+    windows=None,
+    analysis_workers=4,
+    frames_per_request=1,
+    queue_size=16,
+    analyze_frames=analyze_frames_with_gemini,
+):
     """
     Extracts frames from a video and optionally analyzes them with Gemini.
+
+    Frames are sampled every `interval` frames, or at `fps` frames per second,
+    optionally only within the `(start, end)` second ranges in `windows`.
+
+    With `analyze`, the decoder pushes JPEG-encoded frames, grouped into
+    batches of `frames_per_request`, onto a bounded queue that a pool of
+    `analysis_workers` drains. Decoding only waits when the queue is full.
+    Returns the frame analyses ordered by frame index. `analyze_frames`
+    defaults to Gemini and can be replaced, e.g. with `replay.ReplayFrames`.
     """
+    # OpenCV is only loaded once frames are decoded, which keeps --help and imports of the helpers fast
+    import cv2
+
+    if analyze and analyze_frames is analyze_frames_with_gemini and not GEMINI_API_KEY:
+        print("GEMINI_API_KEY not found in .env file. Skipping analysis.")
+        analyze = False
+
     os.makedirs(output_dir, exist_ok=True)
     cap = cv2.VideoCapture(video_path)  # pylint: disable=no-member
+    native_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0  # pylint: disable=no-member
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None  # pylint: disable=no-member
 
-    frame_count = 0
-    saved_count = 0
+    indices = sample_frame_indices(native_fps, interval, fps, windows, frame_count)
+    seek_threshold = int(native_fps * SEEK_THRESHOLD_SECONDS)
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if frame_count % interval == 0:
+    results = []
+    workers = []
+    if analyze:
+        batches = queue.Queue(maxsize=queue_size)
+        results_lock = threading.Lock()
+        workers = [
+            threading.Thread(target=_frame_analysis_worker, args=(batches, results, results_lock, analyze_frames))
+            for _ in range(analysis_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+    saved_count = 0
+    batch = []
+    try:
+        for frame_index, frame in iter_sampled_frames(cap, indices, seek_threshold):
+            # Encode once in memory; the same bytes are saved and sent to Gemini
+            jpeg_bytes = cv2.imencode(".jpg", frame)[1].tobytes()  # pylint: disable=no-member
             filename = os.path.join(output_dir, f"frame_{saved_count:04}.jpg")
-            cv2.imwrite(filename, frame)  # pylint: disable=no-member
-            if analyze:
-                analyze_frame_with_gemini(filename)
+            with open(filename, "wb") as f:
+                f.write(jpeg_bytes)
             saved_count += 1
-        frame_count += 1
 
-    cap.release()
+            if analyze:
+                batch.append((frame_index, frame_index / native_fps, jpeg_bytes))
+                if len(batch) == frames_per_request:
+                    batches.put(batch)
+                    batch = []
+    finally:
+        cap.release()
+        if analyze:
+            if batch:
+                batches.put(batch)
+            for _ in workers:
+                batches.put(None)
+            for worker in workers:
+                worker.join()
+
     print(f"✅ Extracted {saved_count} frames into '{output_dir}'")
+    return sorted(results, key=lambda analysis: analysis.frame_index)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract frames from a video.")
     parser.add_argument("--local-file", help="Path to a local video file.")
     parser.add_argument("--gcs-uri", help="GCS URI of the video file.")
     parser.add_argument("--interval", type=int, default=30, help="Frame extraction interval.")
+    parser.add_argument("--fps", type=float, help="Sample this many frames per second instead of using --interval.")
+    parser.add_argument("--analysis-file", help="Analysis JSON; only sample frames within its trick windows.")
+    parser.add_argument(
+        "--window-padding",
+        type=float,
+        default=1.0,
+        help="Seconds of padding around each trick window.",
+    )
     parser.add_argument("--analyze-frames", action="store_true", help="Enable Gemini analysis for each frame.")
+    parser.add_argument("--analysis-workers", type=int, default=4, help="Concurrent Gemini frame requests.")
+    parser.add_argument(
+        "--frames-per-request",
+        type=int,
+        default=1,
+        help="Number of adjacent frames sent to Gemini in one request.",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Analyze frames with the offline replay backend instead of Gemini.",
+    )
+    parser.add_argument(
+        "--record-dir",
+        help="Record the live frame analyses and latencies here; with --replay, replay them.",
+    )
+    parser.add_argument(
+        "--stream-threshold-mb",
+        type=int,
+        default=GCS_STREAM_THRESHOLD_MB,
+        help="GCS videos at least this large are streamed instead of downloaded.",
+    )
 
     args = parser.parse_args()
 
@@ -107,21 +265,52 @@ if __name__ == "__main__":
     try:
         if args.local_file:
             video_to_process = args.local_file
+            video_name = os.path.splitext(os.path.basename(args.local_file))[0]
         elif args.gcs_uri:
             is_gcs = True
-            temp_video_file = os.path.join(temp_dir, os.path.basename(args.gcs_uri))
-            download_from_gcs(args.gcs_uri, temp_video_file)
-            video_to_process = temp_video_file
+            video_name = os.path.splitext(os.path.basename(args.gcs_uri))[0]
+            # Keep the downloaded video out of the frames directory that gets uploaded
+            temp_video_file = os.path.join(tempfile.mkdtemp(dir=temp_dir), os.path.basename(args.gcs_uri))
+            video_to_process, _ = resolve_video_source(args.gcs_uri, temp_video_file, args.stream_threshold_mb)
         else:
             parser.print_help()
             exit()
 
         if video_to_process:
             # Create a unique folder name for the frames in GCS
-            video_name = os.path.splitext(os.path.basename(video_to_process))[0]
             gcs_frames_folder = f"{GCS_FRAMES_OUTPUT_FOLDER}/{video_name}"
 
-            extract_frames(video_to_process, temp_dir, args.interval, args.analyze_frames)
+            windows = None
+            if args.analysis_file:
+                with open(args.analysis_file, 'r') as f:
+                    windows = trick_windows(f.read(), args.window_padding)
+
+            analyze_frames = analyze_frames_with_gemini
+            if args.replay:
+                from replay import ReplayFrames
+
+                analyze_frames = ReplayFrames(record_dir=args.record_dir)
+            elif args.record_dir:
+                from replay import RecordingFrames
+
+                analyze_frames = RecordingFrames(args.record_dir)
+            frame_analyses = extract_frames(
+                video_to_process,
+                temp_dir,
+                args.interval,
+                args.analyze_frames,
+                args.fps,
+                windows,
+                args.analysis_workers,
+                args.frames_per_request,
+                analyze_frames=analyze_frames,
+            )
+            if frame_analyses:
+                os.makedirs("temp", exist_ok=True)
+                frame_analysis_path = os.path.join("temp", f"{video_name}_frame_analysis.json")
+                with open(frame_analysis_path, 'w') as f:
+                    json.dump([analysis.model_dump() for analysis in frame_analyses], f, indent=2)
+                print(f"Frame analysis saved to {frame_analysis_path}")
             if not args.analyze_frames:
                 upload_dir_to_gcs(temp_dir, GCS_BUCKET_NAME, gcs_frames_folder)
             else:
@@ -1,9 +1,71 @@
+import base64
+import datetime
 import os
-from google.cloud import storage
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from cache_utils import file_digest
+from tracing import stage
 
 load_dotenv()
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME")
+# Point at a local fake GCS server (e.g., fake-gcs-server) for testing
+STORAGE_EMULATOR_HOST = os.getenv("STORAGE_EMULATOR_HOST")
+GCS_TRANSFER_WORKERS = int(os.getenv("GCS_TRANSFER_WORKERS", "8"))
+GCS_SLICED_DOWNLOAD_THRESHOLD_MB = int(os.getenv("GCS_SLICED_DOWNLOAD_THRESHOLD_MB", "64"))
+GCS_CHUNK_SIZE_MB = int(os.getenv("GCS_CHUNK_SIZE_MB", "32"))
+# Videos at least this large are streamed instead of downloaded
+GCS_STREAM_THRESHOLD_MB = int(os.getenv("GCS_STREAM_THRESHOLD_MB", "256"))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns a storage client shared by every transfer in this process, so
+    its authenticated HTTP connection pool is reused between calls.
+    """
+    # The client library is slow to import, so it is only loaded once GCS is used
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import storage
+
+    pid = os.getpid()
+    with _clients_lock:
+        # Clients are not fork-safe, so worker processes get their own
+        if pid not in _clients:
+            if STORAGE_EMULATOR_HOST:
+                _clients[pid] = storage.Client(project="test", credentials=AnonymousCredentials())
+            else:
+                _clients[pid] = storage.Client()
+        return _clients[pid]
+
+
+def _parse_gcs_uri(gcs_uri):
+    bucket_name, _, blob_name = gcs_uri.replace("gs://", "").partition("/")
+    return bucket_name, blob_name
+
+
+def _local_md5(local_path):
+    """Returns a file's MD5 in the base64 form GCS reports in `md5_hash`."""
+    return base64.b64encode(bytes.fromhex(file_digest(local_path))).decode("ascii")
+
+
+def _upload_file(bucket, local_path, blob_name, remote_md5=None):
+    """
+    Uploads a file as a chunked resumable upload with checksum verification.
+    Returns False without uploading if the object already has identical content.
+    """
+    if remote_md5 is not None and remote_md5 == _local_md5(local_path):
+        print(f"Skipping {local_path}, gs://{bucket.name}/{blob_name} is identical.")
+        return False
+
+    with stage("upload", uri=f"gs://{bucket.name}/{blob_name}") as record:
+        blob = bucket.blob(blob_name, chunk_size=GCS_CHUNK_SIZE_MB * 1024 * 1024)
+        blob.upload_from_filename(local_path)
+        record["bytes"] = os.path.getsize(local_path)
+    return True
 
 
 def upload_to_gcs(local_path, gcs_folder):
@@ -11,23 +73,156 @@ def upload_to_gcs(local_path, gcs_folder):
     if not GCS_BUCKET_NAME or GCS_BUCKET_NAME == "your-gcs-bucket-name-here":
         raise ValueError("GCS_BUCKET_NAME is not set in the .env file.")
 
-    client = storage.Client()
-    bucket = client.bucket(GCS_BUCKET_NAME)
+    bucket = get_client().bucket(GCS_BUCKET_NAME)
     blob_name = os.path.basename(local_path)
     gcs_path = f"{gcs_folder}/{blob_name}"
-    blob = bucket.blob(gcs_path)
+    existing = bucket.get_blob(gcs_path)
 
     print(f"Uploading {local_path} to gs://{GCS_BUCKET_NAME}/{gcs_path}...")
-    blob.upload_from_filename(local_path)
+    _upload_file(bucket, local_path, gcs_path, existing.md5_hash if existing else None)
     print("Upload complete.")
     return f"gs://{GCS_BUCKET_NAME}/{gcs_path}"
 
 
+def upload_many_to_gcs(local_paths, gcs_bucket_name, gcs_folder, max_workers=GCS_TRANSFER_WORKERS):
+    """
+    Uploads files concurrently into a GCS folder and returns their URIs.
+
+    Files whose content already matches the object in GCS are skipped, so
+    re-running an interrupted upload only sends what is missing or changed.
+    """
+    bucket = get_client().bucket(gcs_bucket_name)
+    remote_md5s = {
+        blob.name: blob.md5_hash
+        for blob in get_client().list_blobs(gcs_bucket_name, prefix=f"{gcs_folder}/")
+    }
+
+    def upload(local_path):
+        blob_name = f"{gcs_folder}/{os.path.basename(local_path)}"
+        _upload_file(bucket, local_path, blob_name, remote_md5s.get(blob_name))
+        return f"gs://{gcs_bucket_name}/{blob_name}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(upload, local_paths))
+
+
+def upload_dir_to_gcs(local_dir, gcs_bucket_name, gcs_folder, max_workers=GCS_TRANSFER_WORKERS):
+    """Uploads a directory to a GCS bucket."""
+    local_paths = [
+        os.path.join(local_dir, local_file)
+        for local_file in sorted(os.listdir(local_dir))
+        if os.path.isfile(os.path.join(local_dir, local_file))
+    ]
+    upload_many_to_gcs(local_paths, gcs_bucket_name, gcs_folder, max_workers)
+    print(f"Uploaded frames to gs://{gcs_bucket_name}/{gcs_folder}")
+
+
 def download_from_gcs(gcs_uri, local_path):
-    """Downloads a file from GCS."""
-    client = storage.Client()
-    bucket_name, blob_name = gcs_uri.replace("gs://", "").split("/", 1)
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
-    blob.download_to_filename(local_path)
+    """
+    Downloads a file from GCS.
+
+    Large objects are fetched as concurrent byte-range slices. Both paths are
+    checksum-verified by the client library, and an existing local file with
+    identical content is kept as is.
+    """
+    bucket_name, blob_name = _parse_gcs_uri(gcs_uri)
+    blob = get_client().bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        raise ValueError(f"{gcs_uri} does not exist.")
+
+    if os.path.exists(local_path) and blob.md5_hash and blob.md5_hash == _local_md5(local_path):
+        print(f"{local_path} is identical to {gcs_uri}, skipping download.")
+        return
+
+    with stage("download", uri=gcs_uri, bytes=blob.size):
+        if blob.size >= GCS_SLICED_DOWNLOAD_THRESHOLD_MB * 1024 * 1024:
+            from google.cloud.storage import transfer_manager
+
+            transfer_manager.download_chunks_concurrently(
+                blob,
+                local_path,
+                chunk_size=GCS_CHUNK_SIZE_MB * 1024 * 1024,
+                worker_type=transfer_manager.THREAD,
+                max_workers=GCS_TRANSFER_WORKERS,
+            )
+        else:
+            blob.download_to_filename(local_path)
     print(f"Downloaded {gcs_uri} to {local_path}")
+
+
+def get_signed_url(gcs_uri, expiration_minutes=120):
+    """
+    Returns an HTTPS URL that ffmpeg and OpenCV can read with range requests.
+    """
+    bucket_name, blob_name = _parse_gcs_uri(gcs_uri)
+    if STORAGE_EMULATOR_HOST:
+        quoted_name = urllib.parse.quote(blob_name, safe="")
+        return f"{STORAGE_EMULATOR_HOST}/download/storage/v1/b/{bucket_name}/o/{quoted_name}?alt=media"
+
+    blob = get_client().bucket(bucket_name).blob(blob_name)
+    expiration = datetime.timedelta(minutes=expiration_minutes)
+    try:
+        return blob.generate_signed_url(version="v4", expiration=expiration, method="GET")
+    except AttributeError:
+        # Token-only credentials (e.g., on GCE or Cloud Run) sign through the IAM API
+        import google.auth
+        from google.auth.transport.requests import Request
+
+        credentials, _ = google.auth.default()
+        credentials.refresh(Request())
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=expiration,
+            method="GET",
+            service_account_email=credentials.service_account_email,
+            access_token=credentials.token,
+        )
+
+
+def open_gcs_stream(gcs_uri):
+    """Opens a GCS object as a seekable binary file that reads ranges on demand."""
+    bucket_name, blob_name = _parse_gcs_uri(gcs_uri)
+    blob = get_client().bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        raise ValueError(f"{gcs_uri} does not exist.")
+    return blob.open("rb", chunk_size=GCS_CHUNK_SIZE_MB * 1024 * 1024)
+
+
+def gcs_content_digest(gcs_uri):
+    """Returns the hex MD5 of a GCS object, matching `cache_utils.file_digest` for its bytes."""
+    bucket_name, blob_name = _parse_gcs_uri(gcs_uri)
+    blob = get_client().bucket(bucket_name).get_blob(blob_name)
+    if blob is None or not blob.md5_hash:
+        # Composite objects have no MD5
+        return None
+    return base64.b64decode(blob.md5_hash).hex()
+
+
+def resolve_video_source(gcs_uri, local_path, stream_threshold_mb=GCS_STREAM_THRESHOLD_MB):
+    """
+    Returns `(source, streamed)` for a GCS video. Videos smaller than
+    `stream_threshold_mb` are downloaded to `local_path`; larger ones are
+    returned as a signed URL so decoding starts while bytes are still arriving.
+    """
+    bucket_name, blob_name = _parse_gcs_uri(gcs_uri)
+    blob = get_client().bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        raise ValueError(f"{gcs_uri} does not exist.")
+
+    if blob.size < stream_threshold_mb * 1024 * 1024:
+        download_from_gcs(gcs_uri, local_path)
+        return local_path, False
+
+    print(f"Streaming {gcs_uri} ({blob.size / (1024 * 1024):.0f} MB) instead of downloading it.")
+    return get_signed_url(gcs_uri), True
+
+
+def list_gcs_videos(gcs_prefix_uri, extensions=(".mp4", ".mov", ".m4v", ".avi", ".mkv")):
+    """Lists the video files under a GCS prefix (e.g., gs://bucket/event/)."""
+    bucket_name, prefix = _parse_gcs_uri(gcs_prefix_uri)
+    blobs = get_client().list_blobs(bucket_name, prefix=prefix)
+    return sorted(
+        f"gs://{bucket_name}/{blob.name}"
+        for blob in blobs
+        if blob.name.lower().endswith(extensions)
+    )
@@ -0,0 +1,334 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+import ffmpeg
+import numpy as np
+from dotenv import load_dotenv
+from motion import (
+    MOTION_MIN_GAP_SECONDS,
+    MOTION_PADDING_SECONDS,
+    MOTION_SAMPLE_FPS,
+    MOTION_THRESHOLD,
+    SegmentTimeMap,
+    active_segments,
+    motion_energy,
+    remap_analysis,
+)
+from render_profiles import PROXY_PROFILE
+from timeline import Timeline
+from tracing import run_ffmpeg, stage
+from video_analysis import analyze_video_cached
+
+load_dotenv()
+# Chunks are the unit of ingest; a trick is seen at most this long after it ends
+LIVE_CHUNK_SECONDS = float(os.getenv("LIVE_CHUNK_SECONDS", "2"))
+# Windows still active after this long are closed anyway, which bounds latency
+LIVE_MAX_WINDOW_SECONDS = float(os.getenv("LIVE_MAX_WINDOW_SECONDS", "30"))
+LIVE_ANALYSIS_WORKERS = int(os.getenv("LIVE_ANALYSIS_WORKERS", "2"))
+LIVE_POLL_SECONDS = 0.2
+
+LIVE_PROMPT_HINTS = (
+    "This clip is a window cut from a live broadcast around detected motion. "
+    "Score only the tricks it shows."
+)
+
+
+def start_ingest(
+    source, work_dir, chunk_seconds=LIVE_CHUNK_SECONDS, realtime=False, follow=False, profile=PROXY_PROFILE
+):
+    """
+    Starts ffmpeg transcoding `source` to `profile` and cutting it into
+    `chunk_seconds` MP4 chunks in `work_dir`, with a keyframe at every chunk
+    boundary. `source` is anything ffmpeg reads, e.g. `rtmp://` or `udp://`
+    URLs. `realtime` reads a file at its native rate, and `follow` keeps
+    reading a file that is still being written. Returns the ffmpeg process
+    and the CSV segment list it appends to as each chunk is closed.
+    """
+    input_kwargs = {}
+    if realtime:
+        input_kwargs["re"] = None
+    if follow:
+        input_kwargs["follow"] = 1
+    stream = ffmpeg.input(source, **input_kwargs)
+    segment_list = os.path.join(work_dir, "chunks.csv")
+    output = ffmpeg.output(
+        profile.filter_video(stream.video),
+        stream["a?"],
+        os.path.join(work_dir, "chunk_%05d.mp4"),
+        ac=1,
+        f="segment",
+        segment_time=chunk_seconds,
+        # Cut on the forced keyframes even when their times are slightly off the boundary
+        segment_time_delta=0.5 / (profile.frame_rate or 30),
+        segment_format="mp4",
+        segment_list=segment_list,
+        segment_list_type="csv",
+        reset_timestamps=1,
+        force_key_frames=f"expr:gte(t,n_forced*{chunk_seconds})",
+        # No B-frames or lookahead: frames leave the encoder as they arrive, and
+        # chunk times match the source's without an encoder delay
+        tune="zerolatency",
+        **profile.output_kwargs(),
+    )
+    with open(os.path.join(work_dir, "ingest.log"), "wb") as log:
+        process = subprocess.Popen(
+            ffmpeg.compile(output, overwrite_output=True), stdin=subprocess.DEVNULL, stdout=log, stderr=log
+        )
+    return process, segment_list
+
+
+def iter_chunks(process, segment_list, poll=LIVE_POLL_SECONDS):
+    """Yields `(path, start, end)` for each chunk as ffmpeg closes it, until ingest ends."""
+    position = 0
+    pending = ""
+    while True:
+        running = process.poll() is None
+        if os.path.exists(segment_list):
+            with open(segment_list, "r") as f:
+                f.seek(position)
+                pending += f.read()
+                position = f.tell()
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                name, start, end = line.rsplit(",", 2)
+                yield os.path.join(os.path.dirname(segment_list), name), float(start), float(end)
+        if not running:
+            return
+        time.sleep(poll)
+
+
+class WindowDetector:
+    """
+    Turns chunks into trick windows as they arrive. Motion energy is
+    accumulated across chunks, and a window is closed once its motion has
+    been followed by `min_gap` seconds of stillness, or once it has run for
+    `max_window` seconds.
+    """
+
+    def __init__(
+        self,
+        sample_fps=MOTION_SAMPLE_FPS,
+        threshold=MOTION_THRESHOLD,
+        padding=MOTION_PADDING_SECONDS,
+        min_gap=MOTION_MIN_GAP_SECONDS,
+        max_window=LIVE_MAX_WINDOW_SECONDS,
+    ):
+        self.sample_fps = sample_fps
+        self.threshold = threshold
+        self.padding = padding
+        self.min_gap = min_gap
+        self.max_window = max_window
+        self.times = []
+        self.energy = []
+        self.now = 0.0
+        self.closed_until = 0.0
+
+    def add_chunk(self, path, start, end):
+        """Adds a closed chunk and returns the `(start, end)` windows it closes."""
+        with stage("motion.detect", path=path) as record:
+            times, energy, _ = motion_energy(path, self.sample_fps)
+            record["frames"] = len(energy)
+        self.times.extend(start + times)
+        self.energy.extend(energy)
+        self.now = end
+        return self._close(final=False)
+
+    def flush(self):
+        """Closes every window still open, at the end of the stream."""
+        return self._close(final=True)
+
+    def _close(self, final):
+        segments = active_segments(
+            np.array(self.times),
+            np.array(self.energy),
+            self.now,
+            self.threshold,
+            self.padding,
+            self.min_gap,
+            self.sample_fps,
+        )
+        closed = []
+        for start, end in segments:
+            start = max(start, self.closed_until)
+            if final or end + self.min_gap <= self.now or self.now - start >= self.max_window:
+                closed.append((start, end))
+            else:
+                break
+        if closed:
+            self.closed_until = closed[-1][1]
+            keep = bisect_left(self.times, self.closed_until)
+            self.times = self.times[keep:]
+            self.energy = self.energy[keep:]
+        return closed
+
+
+class LiveScorer:
+    """
+    Scores a live stream trick by trick: ingest cuts the stream into proxy
+    chunks, `WindowDetector` closes windows around motion, and each window is
+    analyzed as soon as it closes, by up to `workers` analyses at once.
+
+    Each scored trick is appended to `events_path` as a JSON line, in stream
+    time, with its latency: seconds from the chunk holding the trick's end
+    being ingested to its score being emitted. `scoreboard_path` is rewritten
+    with the latest trick and running average, for an ffmpeg `drawtext`
+    overlay with `textfile=<path>:reload=1` on the broadcast.
+    """
+
+    def __init__(
+        self,
+        work_dir,
+        cache=None,
+        analyze=analyze_video_cached,
+        workers=LIVE_ANALYSIS_WORKERS,
+        chunk_seconds=LIVE_CHUNK_SECONDS,
+        detector=None,
+        events_path=None,
+        scoreboard_path=None,
+    ):
+        self.work_dir = work_dir
+        self.cache = cache
+        self.analyze = analyze
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self.detector = detector or WindowDetector()
+        self.events_path = events_path or os.path.join(work_dir, "events.jsonl")
+        self.scoreboard_path = scoreboard_path or os.path.join(work_dir, "scoreboard.txt")
+        self.chunks = []
+        self.chunk_ends = []
+        self.chunk_ingested = []
+        self.scores = []
+        self.latencies = []
+        # The trick ending latest in stream time, which the scoreboard shows
+        self.latest_trick = None
+        self.latest_end = float("-inf")
+        self._lock = threading.Lock()
+        os.makedirs(work_dir, exist_ok=True)
+
+    def run(self, source, realtime=False, follow=False):
+        """Scores `source` until its stream ends or the run is interrupted, then prints latency stats."""
+        process, segment_list = start_ingest(source, self.work_dir, self.chunk_seconds, realtime, follow)
+        print(f"Ingesting {source} in {self.chunk_seconds:g}s chunks, events in {self.events_path}")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for path, start, end in iter_chunks(process, segment_list):
+                    self.chunks.append((path, start, end))
+                    self.chunk_ends.append(end)
+                    self.chunk_ingested.append(time.time())
+                    for window in self.detector.add_chunk(path, start, end):
+                        self._submit(executor, window)
+                    self._prune()
+            except KeyboardInterrupt:
+                print("Stopping ingest...")
+            finally:
+                if process.poll() is None:
+                    process.terminate()
+                process.wait()
+            for window in self.detector.flush():
+                self._submit(executor, window)
+        if process.returncode not in (0, -15, 255):
+            print(f"Ingest exited with {process.returncode}; see {os.path.join(self.work_dir, 'ingest.log')}")
+        self.print_summary()
+
+    def _submit(self, executor, window):
+        start, end = window
+        window = self._cut_window(start, end)
+        if window is None:
+            print(f"Window {start:.1f}s-{end:.1f}s has no chunks left, skipping.")
+            return
+        window_path, window_start, window_end = window
+        print(f"Window {window_start:.1f}s-{window_end:.1f}s closed, analyzing...")
+        executor.submit(self._score_window, window_path, window_start, window_end)
+
+    def _cut_window(self, start, end):
+        """
+        Joins the chunks overlapping `[start, end]` without re-encoding;
+        returns the path and its span, or None if no chunk overlaps it.
+        """
+        chunks = [chunk for chunk in self.chunks if chunk[2] > start and chunk[1] < end]
+        if not chunks:
+            return None
+        window_path = os.path.join(self.work_dir, f"window_{chunks[0][1]:09.3f}.mp4")
+        concat_list = f"{window_path}.txt"
+        with open(concat_list, "w") as f:
+            for path, _, _ in chunks:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        run_ffmpeg(
+            ffmpeg.input(concat_list, f="concat", safe=0).output(window_path, c="copy"),
+            "ffmpeg.live_window",
+            quiet=True,
+        )
+        os.remove(concat_list)
+        return window_path, chunks[0][1], chunks[-1][2]
+
+    def _prune(self):
+        """Deletes chunks that no open window can still need."""
+        detector = self.detector
+        # Windows open at most the padding plus one sample step before their first active sample
+        earliest = detector.times[0] if detector.times else detector.now
+        keep_after = earliest - detector.padding - 1 / detector.sample_fps
+        while self.chunks and self.chunks[0][2] < keep_after:
+            os.remove(self.chunks.pop(0)[0])
+
+    def _score_window(self, window_path, window_start, window_end):
+        try:
+            analysis_result = self.analyze(window_path, self.cache, prompt_hints=LIVE_PROMPT_HINTS)
+            timeline = Timeline.from_json(
+                remap_analysis(analysis_result, SegmentTimeMap([(window_start, window_end)]))
+            )
+            self._emit(timeline, window_start, window_end)
+        except Exception as e:
+            print(f"Error scoring window {window_start:.1f}s-{window_end:.1f}s: {e}")
+        finally:
+            os.remove(window_path)
+
+    def _emit(self, timeline, window_start, window_end):
+        emitted_at = time.time()
+        with self._lock:
+            with open(self.events_path, "a") as f:
+                for trick, start, end in zip(timeline.tricks, timeline.starts, timeline.ends):
+                    i = min(bisect_left(self.chunk_ends, end), len(self.chunk_ends) - 1)
+                    latency = emitted_at - self.chunk_ingested[i]
+                    self.scores.append(trick.trick_score)
+                    self.latencies.append(latency)
+                    event = {
+                        "trick_name": trick.trick_name,
+                        "start": round(start, 2),
+                        "end": round(end, 2),
+                        "trick_score": trick.trick_score,
+                        "commentary": trick.commentary,
+                        "window": [round(window_start, 2), round(window_end, 2)],
+                        "latency": round(latency, 3),
+                    }
+                    f.write(json.dumps(event) + "\n")
+                    print(f"[{start:.1f}s] {trick.trick_name}: {trick.trick_score} ({latency:.1f}s after the trick)")
+            if not len(timeline):
+                return
+            # Windows can finish out of order, so an earlier window never replaces a later trick
+            i = max(range(len(timeline)), key=timeline.ends.__getitem__)
+            if timeline.ends[i] > self.latest_end:
+                self.latest_trick, self.latest_end = timeline.tricks[i], timeline.ends[i]
+            self._write_scoreboard()
+
+    def _write_scoreboard(self):
+        trick = self.latest_trick
+        temp_path = f"{self.scoreboard_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(f"{trick.trick_name}: {trick.trick_score:g}\n")
+            f.write(f"Tricks: {len(self.scores)}  Average: {sum(self.scores) / len(self.scores):.1f}")
+        # drawtext may reload at any moment, so the file is replaced atomically
+        os.replace(temp_path, self.scoreboard_path)
+
+    def print_summary(self):
+        if not self.latencies:
+            print("No tricks scored.")
+            return
+        latencies = sorted(self.latencies)
+        print(
+            f"Scored {len(latencies)} tricks. Latency after each trick: "
+            f"p50 {latencies[len(latencies) // 2]:.1f}s, max {latencies[-1]:.1f}s"
+        )
@@ -1,122 +1,668 @@
 import argparse
 import os
-from gcs_utils import upload_to_gcs, download_from_gcs
-from video_analysis import analyze_video
-from video_editor import create_commentary_video, add_score_overlay
+import shutil
+import sys
 from dotenv import load_dotenv
+from cache_utils import CACHE_MAX_MB, ContentCache
+from render_profiles import DEFAULT_RENDER_PROFILE, RENDER_PROFILES
+from results_store import RESULTS_DB, ResultsStore
+from workspace import WORKSPACE_QUOTA_MB, Workspace
 
 load_dotenv()
 GCS_SOURCE_VIDEO_FOLDER = os.getenv("GCS_SOURCE_VIDEO_FOLDER", "videos")
 
+# Each command imports the subsystems it runs, so e.g. `clean` or rendering a
+# reviewed analysis never loads the Gemini, GCS or OpenCV clients
+COMMANDS = ("analyze", "batch", "angles", "serve", "live", "clean", "leaderboard")
+LEGACY_COMMAND_FLAGS = {"--clean-temp": "clean", "--batch": "batch", "--angles": "angles"}
 
-def main():
+
+def run_clean(args, temp_dir):
+    if args.orphans:
+        print("Sweeping orphaned files from the temporary directory...")
+        Workspace(temp_dir).sweep_orphans()
+        return
+    print("Cleaning up temporary directory...")
+    for file in os.listdir(temp_dir):
+        path = os.path.join(temp_dir, file)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    print("Temporary directory cleaned.")
+
+
+def _record_result(args, run, analysis_result, source, skater=None):
+    """Adds a run's analysis to the results store behind `leaderboard`."""
+    store = ResultsStore(args.results_db)
+    try:
+        store.add_run(run, analysis_result, skater=skater, event=args.event, source=source)
+        print(f"Recorded {run} in {args.results_db}")
+    except ValueError as e:
+        print(f"Could not record {run} in {args.results_db}: {e}")
+    finally:
+        store.close()
+
+
+def _print_rows(rows, columns):
+    """Prints `rows` as a table of `(key, heading, format)` columns."""
+    if not rows:
+        print("No results.")
+        return
+    cells = [[format(row[key], spec) if row[key] is not None else "-" for key, _, spec in columns] for row in rows]
+    widths = [max(len(heading), *(len(line[i]) for line in cells)) for i, (_, heading, _) in enumerate(columns)]
+    print("  ".join(heading.ljust(width) for (_, heading, _), width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def run_leaderboard(args):
+    store = ResultsStore(args.results_db)
+    try:
+        if args.import_paths:
+            imported, skipped = store.import_files(args.import_paths, event=args.event)
+            print(f"Imported {imported} runs into {args.results_db}, skipped {skipped}.")
+            return
+        if args.trick or args.score_above is not None:
+            rows = store.find_tricks(args.trick, args.score_above, args.limit, args.event, args.skater)
+            _print_rows(rows, [
+                ("trick_name", "trick", "s"), ("score", "score", ".1f"), ("skater", "skater", "s"),
+                ("run", "run", "s"), ("event", "event", "s"), ("start_seconds", "at (s)", ".1f"),
+            ])
+        elif args.by == "trick":
+            rows = store.trick_stats(args.limit, args.event, args.skater)
+            _print_rows(rows, [
+                ("trick_name", "trick", "s"), ("count", "landed", "d"),
+                ("average_score", "average", ".1f"), ("best_score", "best", ".1f"),
+            ])
+        elif args.by == "skater":
+            rows = store.skater_stats(args.limit, args.event)
+            _print_rows(rows, [
+                ("skater", "skater", "s"), ("runs", "runs", "d"),
+                ("best_score", "best", ".1f"), ("average_score", "average", ".1f"),
+            ])
+        elif args.by == "event":
+            _print_rows(store.events(), [("event", "event", "s"), ("runs", "runs", "d"), ("best_score", "best", ".1f")])
+        else:
+            rows = store.top_runs(args.limit, args.event, args.skater)
+            _print_rows(rows, [
+                ("final_score", "score", ".1f"), ("skater", "skater", "s"), ("run", "run", "s"),
+                ("event", "event", "s"), ("trick_count", "tricks", "d"), ("best_trick_score", "best trick", ".1f"),
+            ])
+    finally:
+        store.close()
+
+
+def _backends(args):
+    """The analysis, TTS and GCS backends selected by --replay and --record-dir; empty for the live ones."""
+    if args.replay:
+        from replay import REPLAY_GCS_DIR, ReplayAnalysis, ReplayGCS, ReplayTTS
+
+        gcs = ReplayGCS(REPLAY_GCS_DIR, record_dir=args.record_dir)
+        return {
+            "analyze": ReplayAnalysis(record_dir=args.record_dir),
+            "synthesize": ReplayTTS(record_dir=args.record_dir),
+            "download": gcs.download,
+            "upload": gcs.upload,
+            "list_videos": gcs.list_videos,
+        }
+    if args.record_dir:
+        from replay import RecordingAnalysis, RecordingGCS, RecordingTTS
+
+        gcs = RecordingGCS(args.record_dir)
+        return {
+            "analyze": RecordingAnalysis(args.record_dir),
+            "synthesize": RecordingTTS(args.record_dir),
+            "download": gcs.download,
+            "upload": gcs.upload,
+            "list_videos": gcs.list_videos,
+        }
+    return {}
+
+
+def _pick(backends, *names):
+    """The `backends` a command takes as keyword arguments, so unset ones keep their defaults."""
+    return {name: backend for name, backend in backends.items() if name in names}
+
+
+def run_serve(args, cache, temp_dir, workspace):
+    from gcs_utils import GCS_STREAM_THRESHOLD_MB
+    from service import SERVICE_QUEUE_SIZE, SERVICE_WORKERS, ScoringService, serve
+
+    stream_threshold_mb = args.stream_threshold_mb or GCS_STREAM_THRESHOLD_MB
+    # The service fetches gs:// sources from GCS whichever backends are used
+    backends = _pick(_backends(args), "analyze", "synthesize")
+    service = ScoringService(
+        cache,
+        temp_dir,
+        stream_threshold_mb=stream_threshold_mb,
+        workspace=workspace,
+        results=ResultsStore(args.results_db),
+        **backends,
+    )
+    serve(service, args.host, args.port, args.workers or SERVICE_WORKERS, args.queue_size or SERVICE_QUEUE_SIZE)
+    cache.print_stats()
+
+
+def run_live(args, cache, temp_dir, workspace):
+    from live import LIVE_ANALYSIS_WORKERS, LIVE_CHUNK_SECONDS, LIVE_MAX_WINDOW_SECONDS, LiveScorer, WindowDetector
+
+    name = os.path.splitext(os.path.basename(args.source.rstrip("/")))[0] or "stream"
+    work_dir = os.path.join(temp_dir, "live", name)
+    scorer = LiveScorer(
+        work_dir,
+        cache,
+        workers=args.workers or LIVE_ANALYSIS_WORKERS,
+        chunk_seconds=args.chunk_seconds or LIVE_CHUNK_SECONDS,
+        detector=WindowDetector(max_window=args.max_window or LIVE_MAX_WINDOW_SECONDS),
+        **_pick(_backends(args), "analyze"),
+    )
+    with workspace.lease(work_dir):
+        scorer.run(args.source, realtime=args.realtime, follow=args.follow)
+    cache.print_stats()
+
+
+def _render_mode(args):
+    if args.with_commentary:
+        return "commentary"
+    if args.score_overlay_only:
+        return "score-overlay"
+    return "analyze"
+
+
+def run_batch_command(args, cache, temp_dir, workspace):
+    from batch import run_batch
+
+    run_batch(
+        args.source,
+        _render_mode(args),
+        temp_dir,
+        manifest_path=args.manifest,
+        download_workers=args.download_workers,
+        analyze_workers=args.analyze_workers,
+        render_workers=args.render_workers,
+        upload_workers=args.upload_workers,
+        cache=cache,
+        render_profile=args.render_profile,
+        motion_trim=args.motion_trim,
+        use_proxy=not args.no_proxy,
+        scoreboard=args.scoreboard,
+        workspace=workspace,
+        results=ResultsStore(args.results_db),
+        event=args.event,
+        **_backends(args),
+    )
+    cache.print_stats()
+
+
+def run_angles(args, cache, temp_dir, job_dir):
+    from gcs_utils import upload_to_gcs
+    from multicam import analyze_multicam, render_angles
+
+    backends = _backends(args)
+    upload = backends.get("upload", upload_to_gcs)
+    primary = args.primary_angle if args.primary_angle == "composite" else int(args.primary_angle)
+    print(f"\nAligning and analyzing {len(args.videos)} angles...")
+    analyses = analyze_multicam(
+        args.videos,
+        job_dir,
+        cache,
+        primary,
+        motion_trim=args.motion_trim,
+        use_proxy=not args.no_proxy,
+        **_pick(backends, "analyze"),
+    )
+    for angle_path, analysis_result in zip(args.videos, analyses):
+        analysis_file_path = os.path.join(
+            temp_dir, f"{os.path.splitext(os.path.basename(angle_path))[0]}_analysis.json"
+        )
+        with open(analysis_file_path, 'w') as f:
+            f.write(analysis_result)
+        print(f"Analysis saved to {analysis_file_path}")
+    # The angles are one run, recorded once under the first angle's name
+    _record_result(args, os.path.splitext(os.path.basename(args.videos[0]))[0], analyses[0], args.videos[0])
+
+    if args.with_commentary or args.score_overlay_only:
+        print(f"\nRendering {len(args.videos)} angles...")
+        for output_video_path in render_angles(
+            args.videos,
+            analyses,
+            temp_dir,
+            _render_mode(args),
+            cache,
+            segmented=not args.full_render,
+            profile=args.render_profile,
+            scoreboard=args.scoreboard,
+            temp_dir=job_dir,
+            **_pick(backends, "synthesize"),
+        ):
+            print(f"Rendered {output_video_path}")
+            try:
+                print(f"Uploaded to: {upload(output_video_path, 'output')}")
+            except ValueError as e:
+                print(f"Error uploading {output_video_path}: {e}")
+    cache.print_stats()
+
+
+def run_analyze(args, cache, temp_dir, job_dir):
+    backends = _backends(args)
+    streamed = False
+    if args.local_file:
+        local_video_path = args.local_file
+        video_name = os.path.splitext(os.path.basename(local_video_path))[0]
+    else:
+        from gcs_utils import GCS_STREAM_THRESHOLD_MB, resolve_video_source
+
+        video_name = os.path.splitext(os.path.basename(args.gcs_uri))[0]
+        local_video_path = os.path.join(temp_dir, os.path.basename(args.gcs_uri))
+        print(f"Fetching {args.gcs_uri}...")
+        if "download" in backends:
+            # Replayed and recorded objects are always downloaded whole
+            backends["download"](args.gcs_uri, local_video_path)
+        else:
+            # Large videos come back as a signed URL that ffmpeg reads directly
+            local_video_path, streamed = resolve_video_source(
+                args.gcs_uri, local_video_path, args.stream_threshold_mb or GCS_STREAM_THRESHOLD_MB
+            )
+
+    analysis_file_path = os.path.join(temp_dir, f"{video_name}_analysis.json")
+
+    if args.analysis_file:
+        print(f"\nUsing the analysis in {args.analysis_file}")
+        with open(args.analysis_file, 'r') as f:
+            analysis_result = f.read()
+    else:
+        print("\nStarting video analysis...")
+        if streamed:
+            from proxy import analyze_gcs_stream
+
+            analysis_result = analyze_gcs_stream(
+                args.gcs_uri,
+                local_video_path,
+                job_dir,
+                cache,
+                motion_trim=args.motion_trim,
+                use_proxy=not args.no_proxy,
+                **_pick(backends, "analyze"),
+            )
+        else:
+            from proxy import analyze_with_proxy
+
+            analysis_result = analyze_with_proxy(
+                local_video_path,
+                job_dir,
+                cache,
+                motion_trim=args.motion_trim,
+                use_proxy=not args.no_proxy,
+                **_pick(backends, "analyze"),
+            )
+        with open(analysis_file_path, 'w') as f:
+            f.write(analysis_result)
+        print(f"\nAnalysis saved to {analysis_file_path}")
+
+    _record_result(args, video_name, analysis_result, args.local_file or args.gcs_uri, skater=args.skater)
+
+    print("\n--- Analysis Result ---")
+    print(analysis_result)
+    print("-----------------------")
+
+    if args.analyze_only or not (args.with_commentary or args.score_overlay_only):
+        cache.print_stats()
+        return
+
+    from gcs_utils import gcs_content_digest, upload_to_gcs
+    from video_editor import add_score_overlay, create_commentary_video
+
+    upload = backends.get("upload", upload_to_gcs)
+    # Render segments of a streamed source are keyed by its GCS MD5
+    source_digest = gcs_content_digest(args.gcs_uri) if streamed else None
+    if args.with_commentary:
+        print("\nGenerating video with commentary...")
+        output_video_path = os.path.join(temp_dir, f"{video_name}_commentary.mp4")
+        create_commentary_video(
+            local_video_path,
+            analysis_result,
+            output_video_path,
+            job_dir,
+            cache=cache,
+            segmented=not args.full_render,
+            profile=args.render_profile,
+            scoreboard=args.scoreboard,
+            source_digest=source_digest,
+            **_pick(backends, "synthesize"),
+        )
+        print(f"\nCommentary video saved to: {output_video_path}")
+
+        try:
+            gcs_uri = upload(output_video_path, "output")
+            print(f"Uploaded commentary video to: {gcs_uri}")
+        except ValueError as e:
+            print(f"Error uploading commentary video: {e}")
+    else:
+        print("\nAdding score overlay to video...")
+        output_video_path = os.path.join(temp_dir, f"{video_name}_score_overlay.mp4")
+        add_score_overlay(
+            local_video_path,
+            analysis_result,
+            output_video_path,
+            segmented=not args.full_render,
+            profile=args.render_profile,
+            cache=cache,
+            scoreboard=args.scoreboard,
+            temp_dir=job_dir,
+            source_digest=source_digest,
+        )
+        print(f"\nVideo with score overlay saved to: {output_video_path}")
+
+        try:
+            gcs_uri = upload(output_video_path, "output")
+            print(f"Uploaded video with score overlay to: {gcs_uri}")
+        except ValueError as e:
+            print(f"Error uploading video with score overlay: {e}")
+
+    cache.print_stats()
+
+
+def legacy_argv(argv):
     """
-    Main function to orchestrate the video analysis.
+    Maps the flag-only invocations from before subcommands onto them:
+    `--batch SOURCE` becomes `batch SOURCE`, `--angles A B` becomes
+    `angles A B`, `--clean-temp` becomes `clean`, and anything else runs
+    `analyze`. Only the first argument is taken as a subcommand, since a
+    later one may be an option's value, such as `--event live`.
     """
-    parser = argparse.ArgumentParser(
-        description="Analyze skateboarding videos with Gemini 2.5 Pro."
+    if not argv or argv[0] in COMMANDS or argv[0] in ("-h", "--help"):
+        return argv
+    for flag, command in LEGACY_COMMAND_FLAGS.items():
+        for i, arg in enumerate(argv):
+            if arg == flag:
+                return [command] + argv[:i] + argv[i + 1:]
+            if arg.startswith(f"{flag}="):
+                return [command] + argv[:i] + [arg.split("=", 1)[1]] + argv[i + 1:]
+    return ["analyze"] + argv
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--cache-dir",
+        default=os.path.join("temp", "cache"),
+        help="Content-addressed cache for analyses and commentary audio.",
     )
-    parser.add_argument("--local-file", help="Path to a local video file to analyze.")
-    parser.add_argument(
-        "--gcs-uri",
-        help="GCS URI of a video to analyze (e.g., gs://bucket/video.mp4).",
+    common.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=CACHE_MAX_MB,
+        help="Size limit of the cache before least recently used entries are evicted.",
+    )
+    common.add_argument(
+        "--workspace-quota-mb",
+        type=int,
+        default=WORKSPACE_QUOTA_MB,
+        help="Size limit of the temp directory outside the cache before least recently used videos are "
+        "evicted; 0 for no limit (default: WORKSPACE_QUOTA_MB).",
+    )
+    common.add_argument(
+        "--trace-file",
+        help="Append per-stage timings and resource usage to this JSON-lines file (default: TRACE_FILE).",
+    )
+    common.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-stage timing summary at the end (traces to temp/trace.jsonl unless --trace-file is set).",
     )
-    parser.add_argument(
+    common.add_argument("--metrics-port", type=int, help="Serve per-stage Prometheus metrics on this port.")
+
+    backend = argparse.ArgumentParser(add_help=False)
+    backend.add_argument(
+        "--replay",
+        action="store_true",
+        help="Use the offline replay backends instead of Gemini and GCS (see REPLAY_* settings).",
+    )
+    backend.add_argument(
+        "--record-dir",
+        help="Record the live analyses, commentary audio and latencies here; with --replay, replay them.",
+    )
+
+    results = argparse.ArgumentParser(add_help=False)
+    results.add_argument(
+        "--results-db",
+        default=RESULTS_DB,
+        help="SQLite results store that analyses are recorded in (default: RESULTS_DB).",
+    )
+    results.add_argument("--event", default="", help="Event the runs are recorded under.")
+
+    stream = argparse.ArgumentParser(add_help=False)
+    stream.add_argument(
+        "--stream-threshold-mb",
+        type=int,
+        help="GCS videos at least this large are streamed instead of downloaded (default: GCS_STREAM_THRESHOLD_MB).",
+    )
+
+    analysis = argparse.ArgumentParser(add_help=False)
+    analysis.add_argument(
+        "--motion-trim",
+        action="store_true",
+        help="Detect motion locally and upload only the active stretches of the video for analysis.",
+    )
+    analysis.add_argument(
+        "--no-proxy",
+        action="store_true",
+        help="Upload the original video for analysis instead of a downscaled, low frame rate proxy.",
+    )
+
+    render = argparse.ArgumentParser(add_help=False)
+    render.add_argument(
         "--with-commentary",
         action="store_true",
         help="Generate a new video with commentary.",
     )
-    parser.add_argument(
+    render.add_argument(
         "--score-overlay-only",
         action="store_true",
         help="Generate a new video with only the final score overlay.",
     )
-    parser.add_argument(
+    render.add_argument(
+        "--scoreboard",
+        action="store_true",
+        help="Show each trick's score and the running average from the trick's end until the next trick's.",
+    )
+    render.add_argument(
+        "--full-render",
+        action="store_true",
+        help="Re-encode the whole video instead of stream-copying spans without overlays or freeze frames.",
+    )
+    render.add_argument(
+        "--render-profile",
+        choices=sorted(RENDER_PROFILES),
+        default=DEFAULT_RENDER_PROFILE,
+        help="Encoder settings for rendered videos: preview (fast, 480p), fast, or archive (slow, high quality).",
+    )
+    render.add_argument(
         "--analyze-only",
         action="store_true",
         help="Only generate the analysis JSON file.",
     )
-    parser.add_argument(
-        "--clean-temp",
-        action="store_true",
-        help="Remove all files from the temp directory.",
+
+    parser = argparse.ArgumentParser(
+        description="Analyze skateboarding videos with Gemini 2.5 Pro.",
+        epilog="The flag-only form from earlier versions, e.g. `main.py --local-file run.mp4`, still works.",
     )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
 
-    args = parser.parse_args()
+    analyze_parser = subparsers.add_parser(
+        "analyze",
+        parents=[common, stream, analysis, render, backend, results],
+        help="Analyze one video and optionally render it.",
+    )
+    source = analyze_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--local-file", help="Path to a local video file to analyze.")
+    source.add_argument(
+        "--gcs-uri",
+        help="GCS URI of a video to analyze (e.g., gs://bucket/video.mp4).",
+    )
+    analyze_parser.add_argument(
+        "--analysis-file",
+        help="Render from this analysis JSON, e.g. one edited after review, instead of analyzing the video.",
+    )
+    analyze_parser.add_argument(
+        "--skater", help="Skater the run is recorded under (default: guessed from the file name)."
+    )
 
-    local_video_path = None
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
+    batch_parser = subparsers.add_parser(
+        "batch",
+        parents=[common, analysis, render, backend, results],
+        help="Analyze every video in a directory, glob, or GCS prefix.",
+    )
+    batch_parser.add_argument("source", help="Directory, glob, or GCS prefix (e.g., gs://bucket/event/).")
+    batch_parser.add_argument(
+        "--manifest",
+        help="Batch status manifest used to resume an interrupted batch (default: temp/batch_manifest.json).",
+    )
+    batch_parser.add_argument("--download-workers", type=int, default=4, help="Concurrent batch downloads.")
+    batch_parser.add_argument("--analyze-workers", type=int, default=4, help="Concurrent batch analyses.")
+    batch_parser.add_argument(
+        "--render-workers",
+        type=int,
+        default=None,
+        help="Concurrent batch ffmpeg renders (default: half the CPU cores).",
+    )
+    batch_parser.add_argument("--upload-workers", type=int, default=4, help="Concurrent batch uploads.")
 
-    try:
-        if args.clean_temp:
-            print("Cleaning up temporary directory...")
-            for file in os.listdir(temp_dir):
-                os.remove(os.path.join(temp_dir, file))
-            print("Temporary directory cleaned.")
-            return
+    angles_parser = subparsers.add_parser(
+        "angles",
+        parents=[common, analysis, render, backend, results],
+        help="Score one run filmed from several synchronized angles with a single analysis.",
+    )
+    angles_parser.add_argument("videos", nargs="+", help="Video of each angle.")
+    angles_parser.add_argument(
+        "--primary-angle",
+        default="0",
+        help="Index of the angle to analyze, or 'composite' to analyze all angles side by side.",
+    )
 
-        if args.local_file:
-            local_video_path = args.local_file
-            video_name = os.path.splitext(os.path.basename(local_video_path))[0]
-        elif args.gcs_uri:
-            video_name = os.path.splitext(os.path.basename(args.gcs_uri))[0]
-            local_video_path = os.path.join(temp_dir, os.path.basename(args.gcs_uri))
-            if not os.path.exists(local_video_path):
-                print(f"Downloading {args.gcs_uri} to {local_video_path}...")
-                download_from_gcs(args.gcs_uri, local_video_path)
-                print("Download complete.")
-        else:
-            parser.print_help()
-            return
+    serve_parser = subparsers.add_parser(
+        "serve", parents=[common, stream, backend, results], help="Run a local HTTP scoring service with warm clients."
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    serve_parser.add_argument("--port", type=int, default=8080, help="Port to listen on.")
+    serve_parser.add_argument("--workers", type=int, help="Jobs run concurrently (default: SERVICE_WORKERS).")
+    serve_parser.add_argument(
+        "--queue-size",
+        type=int,
+        help="Jobs allowed to wait before new ones are rejected with 503 (default: SERVICE_QUEUE_SIZE).",
+    )
 
-        analysis_file_path = os.path.join(temp_dir, f"{video_name}_analysis.json")
+    live_parser = subparsers.add_parser(
+        "live", parents=[common, backend], help="Score a live stream trick by trick as it arrives."
+    )
+    live_parser.add_argument("source", help="Stream URL (rtmp://, udp://, ...) or video file to score.")
+    live_parser.add_argument("--realtime", action="store_true", help="Read a file at its native frame rate.")
+    live_parser.add_argument("--follow", action="store_true", help="Keep reading a file that is still being written.")
+    live_parser.add_argument(
+        "--chunk-seconds", type=float, help="Length of each ingested chunk (default: LIVE_CHUNK_SECONDS)."
+    )
+    live_parser.add_argument(
+        "--max-window",
+        type=float,
+        help="Close a window that has been active this long, bounding the latency of long runs "
+        "(default: LIVE_MAX_WINDOW_SECONDS).",
+    )
+    live_parser.add_argument(
+        "--workers", type=int, help="Windows analyzed concurrently (default: LIVE_ANALYSIS_WORKERS)."
+    )
 
-        if os.path.exists(analysis_file_path):
-            print(f"Using cached analysis from {analysis_file_path}")
-            with open(analysis_file_path, 'r') as f:
-                analysis_result = f.read()
-        else:
-            print("\nStarting video analysis...")
-            analysis_result = analyze_video(local_video_path)
-            with open(analysis_file_path, 'w') as f:
-                f.write(analysis_result)
-            print(f"\nAnalysis saved to {analysis_file_path}")
+    leaderboard_parser = subparsers.add_parser(
+        "leaderboard",
+        help="Query the recorded runs: top runs, tricks by name and score, or per-trick and per-skater stats.",
+    )
+    leaderboard_parser.add_argument(
+        "--results-db", default=RESULTS_DB, help="SQLite results store to query (default: RESULTS_DB)."
+    )
+    leaderboard_parser.add_argument("--event", help="Only this event's runs; with --import, the event to record.")
+    leaderboard_parser.add_argument(
+        "--by",
+        choices=["run", "trick", "skater", "event"],
+        default="run",
+        help="Rank runs by final score (default), or aggregate per trick, skater or event.",
+    )
+    leaderboard_parser.add_argument(
+        "--trick", help="List the best tricks whose name starts with this, e.g. 'McTwist' (case-insensitive)."
+    )
+    leaderboard_parser.add_argument("--score-above", type=float, help="List tricks scoring more than this.")
+    leaderboard_parser.add_argument("--skater", help="Only this skater's runs.")
+    leaderboard_parser.add_argument("--limit", type=int, default=10, help="Rows shown.")
+    leaderboard_parser.add_argument(
+        "--import",
+        dest="import_paths",
+        nargs="+",
+        metavar="PATH",
+        help="Import analysis JSON files, globs or directories of *_analysis.json, under --event.",
+    )
+
+    clean_parser = subparsers.add_parser("clean", help="Remove all files from the temp directory.")
+    clean_parser.add_argument(
+        "--orphans",
+        action="store_true",
+        help="Only remove what crashed jobs left behind; safe while other jobs are running.",
+    )
+    return parser
 
-        print("\n--- Analysis Result ---")
-        print(analysis_result)
-        print("-----------------------")
 
-        if args.analyze_only:
-            return
+def main():
+    """
+    Main function to orchestrate the video analysis.
+    """
+    parser = build_parser()
+    argv = sys.argv[1:]
+    if not argv:
+        parser.print_help()
+        return
+    args = parser.parse_args(legacy_argv(argv))
 
-        if args.with_commentary:
-            print("\nGenerating video with commentary...")
-            output_video_path = os.path.join(temp_dir, f"{video_name}_commentary.mp4")
-            create_commentary_video(local_video_path, analysis_result, output_video_path, temp_dir)
-            print(f"\nCommentary video saved to: {output_video_path}")
+    temp_dir = "temp"
+    os.makedirs(temp_dir, exist_ok=True)
+    if args.command == "clean":
+        run_clean(args, temp_dir)
+        return
+    if args.command == "leaderboard":
+        run_leaderboard(args)
+        return
 
-            try:
-                gcs_uri = upload_to_gcs(output_video_path, "output")
-                print(f"Uploaded commentary video to: {gcs_uri}")
-            except ValueError as e:
-                print(f"Error uploading commentary video: {e}")
-        elif args.score_overlay_only:
-            print("\nAdding score overlay to video...")
-            output_video_path = os.path.join(temp_dir, f"{video_name}_score_overlay.mp4")
-            add_score_overlay(local_video_path, analysis_result, output_video_path)
-            print(f"\nVideo with score overlay saved to: {output_video_path}")
+    if args.trace_file or args.profile or args.metrics_port:
+        from tracing import TRACE_FILE, configure as configure_tracing, serve_metrics
 
-            try:
-                gcs_uri = upload_to_gcs(output_video_path, "output")
-                print(f"Uploaded video with score overlay to: {gcs_uri}")
-            except ValueError as e:
-                print(f"Error uploading video with score overlay: {e}")
+        if args.trace_file or args.profile:
+            configure_tracing(args.trace_file or TRACE_FILE or os.path.join(temp_dir, "trace.jsonl"))
+        if args.metrics_port:
+            serve_metrics(args.metrics_port)
+
+    try:
+        cache = ContentCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+        workspace = Workspace(temp_dir, args.workspace_quota_mb * 1024 * 1024, exclude=[args.cache_dir])
+        workspace.sweep_orphans()
+        if args.command == "serve":
+            run_serve(args, cache, temp_dir, workspace)
+        elif args.command == "live":
+            run_live(args, cache, temp_dir, workspace)
+        elif args.command == "batch":
+            run_batch_command(args, cache, temp_dir, workspace)
+        elif args.command == "angles":
+            with workspace.job("angles") as job_dir:
+                run_angles(args, cache, temp_dir, job_dir)
+        else:
+            with workspace.job("analyze") as job_dir:
+                run_analyze(args, cache, temp_dir, job_dir)
 
     except ValueError as e:
         print(f"Error: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
+    finally:
+        if args.profile:
+            from tracing import print_summary
+
+            print_summary()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,207 @@
+import json
+import os
+from bisect import bisect_right
+import cv2
+import ffmpeg
+import numpy as np
+from dotenv import load_dotenv
+from cache_utils import content_key, file_digest
+from extract_frames import SEEK_THRESHOLD_SECONDS, iter_sampled_frames, sample_frame_indices
+from render_profiles import PROXY_PROFILE
+from timeline import Timeline, format_timestamp
+from tracing import run_ffmpeg, stage
+from video_analysis import analysis_cache_key, analyze_video_cached
+
+load_dotenv()
+MOTION_SAMPLE_FPS = float(os.getenv("MOTION_SAMPLE_FPS", "5"))
+# Mean absolute difference between consecutive downscaled gray frames, 0-255
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "3"))
+MOTION_PADDING_SECONDS = float(os.getenv("MOTION_PADDING_SECONDS", "2"))
+# Idle gaps shorter than this are kept, so one run is not split into pieces
+MOTION_MIN_GAP_SECONDS = float(os.getenv("MOTION_MIN_GAP_SECONDS", "4"))
+# Trimming is skipped when it would keep more than this share of the video
+MOTION_MAX_ACTIVE_RATIO = float(os.getenv("MOTION_MAX_ACTIVE_RATIO", "0.8"))
+
+MOTION_DOWNSCALE_WIDTH = 160
+
+
+def motion_energy(video_path, sample_fps=MOTION_SAMPLE_FPS, width=MOTION_DOWNSCALE_WIDTH):
+    """
+    Returns `(times, energy, duration)`: for each frame sampled at
+    `sample_fps`, the mean absolute difference from the previous sampled
+    frame, computed on downscaled grayscale frames.
+    """
+    cap = cv2.VideoCapture(video_path)  # pylint: disable=no-member
+    native_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0  # pylint: disable=no-member
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None  # pylint: disable=no-member
+    indices = sample_frame_indices(native_fps, fps=sample_fps, frame_count=frame_count)
+
+    times = []
+    energy = []
+    previous = None
+    try:
+        for frame_index, frame in iter_sampled_frames(cap, indices, int(native_fps * SEEK_THRESHOLD_SECONDS)):
+            height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+            small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)  # pylint: disable=no-member
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)  # pylint: disable=no-member
+            if previous is not None:
+                times.append(frame_index / native_fps)
+                energy.append(np.abs(gray - previous).mean())
+            previous = gray
+    finally:
+        cap.release()
+
+    duration = frame_count / native_fps if frame_count else (times[-1] if times else 0.0)
+    return np.array(times), np.array(energy), duration
+
+
+def active_segments(
+    times,
+    energy,
+    duration,
+    threshold=MOTION_THRESHOLD,
+    padding=MOTION_PADDING_SECONDS,
+    min_gap=MOTION_MIN_GAP_SECONDS,
+    sample_fps=MOTION_SAMPLE_FPS,
+):
+    """
+    Returns the `(start, end)` seconds where smoothed motion energy exceeds
+    `threshold`, padded on both sides, with gaps under `min_gap` merged.
+    """
+    if not len(energy):
+        return []
+    # Smooth over about half a second so single noisy frames don't count
+    window = max(1, int(sample_fps / 2))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="same")
+    active = np.concatenate(([False], smoothed > threshold, [False]))
+    edges = np.flatnonzero(np.diff(active.astype(np.int8)))
+    step = 1 / sample_fps
+
+    segments = []
+    for first, last in zip(edges[::2], edges[1::2]):
+        start = max(0.0, float(times[first]) - step - padding)
+        end = min(duration, float(times[last - 1]) + padding)
+        if segments and start - segments[-1][1] < min_gap:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+def detect_active_segments(video_path, sample_fps=MOTION_SAMPLE_FPS, threshold=MOTION_THRESHOLD):
+    """Returns `(segments, duration)` for the stretches of a video with motion."""
+    with stage("motion.detect", path=video_path) as record:
+        times, energy, duration = motion_energy(video_path, sample_fps)
+        segments = active_segments(times, energy, duration, threshold, sample_fps=sample_fps)
+        record["frames"] = len(energy)
+    return segments, duration
+
+
+def render_active_proxy(video_path, segments, output_path, profile=PROXY_PROFILE):
+    """Renders only `segments` of a video, back to back and downscaled, for upload."""
+    with stage("ffprobe", path=video_path):
+        probe = ffmpeg.probe(video_path)
+    has_audio = any(stream["codec_type"] == "audio" for stream in probe["streams"])
+    source = ffmpeg.input(video_path)
+    video_split = source.video.split()
+    audio_split = source.audio.asplit() if has_audio else None
+    streams = []
+    for i, (start, end) in enumerate(segments):
+        streams.append(video_split[i].trim(start=start, end=end).setpts("PTS-STARTPTS"))
+        if has_audio:
+            streams.append(audio_split[i].filter("atrim", start=start, end=end).filter("asetpts", "PTS-STARTPTS"))
+    joined = ffmpeg.concat(*streams, v=1, a=int(has_audio)).node
+    audio = [joined[1]] if has_audio else []
+    run_ffmpeg(
+        ffmpeg.output(profile.filter_video(joined[0]), *audio, output_path, **profile.output_kwargs()),
+        "ffmpeg.motion_proxy",
+        quiet=True,
+    )
+    return output_path
+
+
+class SegmentTimeMap:
+    """Maps times in a proxy made of `segments` laid back to back to times in the source."""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.offsets = []
+        offset = 0.0
+        for start, end in segments:
+            self.offsets.append(offset)
+            offset += end - start
+
+    def to_source(self, t):
+        i = max(0, bisect_right(self.offsets, t) - 1)
+        start, end = self.segments[i]
+        return min(end, start + t - self.offsets[i])
+
+
+def segment_hints(segments, joined=False):
+    if joined:
+        header = "This video joins the active spans of a longer recording. Each span starts a new clip:"
+    else:
+        header = "Motion was detected in these spans; tricks happen within them:"
+    return header + "\n" + "\n".join(
+        f"- {format_timestamp(start)} to {format_timestamp(end)}" for start, end in segments
+    )
+
+
+def remap_analysis(analysis_json, time_map):
+    """Rewrites the trick timestamps of an analysis of a proxy in source time."""
+    timeline = Timeline.from_json(analysis_json)
+    return json.dumps([
+        {
+            **trick.model_dump(),
+            "time_stamp_start": format_timestamp(time_map.to_source(start)),
+            "time_stamp_end": format_timestamp(time_map.to_source(end)),
+        }
+        for trick, start, end in zip(timeline.tricks, timeline.starts, timeline.ends)
+    ], indent=2)
+
+
+def analyze_active_segments(local_video_path, work_dir, cache=None, analyze=analyze_video_cached, content_digest=None):
+    """
+    Analyzes a video after dropping its idle stretches.
+
+    Motion is detected locally on downscaled frames. If the active segments
+    cover at most `MOTION_MAX_ACTIVE_RATIO` of the video, only they are
+    uploaded, as a downscaled proxy, and the trick timestamps in the result
+    are mapped back to the source. Otherwise the full video is uploaded. In
+    both cases the segments are passed to the prompt as hints.
+
+    `content_digest` identifies the video for caching, as in
+    `analyze_video_cached`.
+    """
+    segments, duration = detect_active_segments(local_video_path)
+    if not segments:
+        print("No motion detected, analyzing the full video.")
+        return analyze(local_video_path, cache, content_digest)
+
+    active = sum(end - start for start, end in segments)
+    print(f"Motion in {len(segments)} segments, {active:.1f}s of {duration:.1f}s.")
+    if active > duration * MOTION_MAX_ACTIVE_RATIO:
+        return analyze(local_video_path, cache, content_digest, prompt_hints=segment_hints(segments))
+
+    time_map = SegmentTimeMap(segments)
+    proxy_segments = [(offset, offset + end - start) for offset, (start, end) in zip(time_map.offsets, segments)]
+    prompt_hints = segment_hints(proxy_segments, joined=True)
+
+    # The proxy's encode is not byte-stable, so it is keyed by its source and cuts,
+    # and a cached analysis is found without rendering it
+    digest = None
+    if cache:
+        digest = content_key(content_digest or file_digest(local_video_path), segments, repr(PROXY_PROFILE))
+        analysis_result = cache.get_text("analysis", analysis_cache_key(digest, prompt_hints), ".json")
+        if analysis_result is not None:
+            print(f"Using cached analysis of the active segments for {digest}")
+            return remap_analysis(analysis_result, time_map)
+
+    proxy_path = os.path.join(work_dir, f"{os.path.splitext(os.path.basename(local_video_path))[0]}_active.mp4")
+    render_active_proxy(local_video_path, segments, proxy_path)
+    print(f"Uploading a {os.path.getsize(proxy_path) / (1024 * 1024):.1f} MB proxy of the active segments.")
+    try:
+        analysis_result = analyze(proxy_path, cache, digest, prompt_hints=prompt_hints)
+    finally:
+        os.remove(proxy_path)
+    return remap_analysis(analysis_result, time_map)
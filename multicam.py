@@ -0,0 +1,233 @@
+import os
+import ffmpeg
+import numpy as np
+from dotenv import load_dotenv
+from cache_utils import content_key, file_digest
+from motion import remap_analysis
+from proxy import analyze_with_proxy
+from render_profiles import PROXY_PROFILE
+from tracing import run_ffmpeg, stage
+from tts_utils import synthesize_speech
+from video_analysis import analyze_video_cached
+from video_editor import add_score_overlay, create_commentary_video
+
+load_dotenv()
+# Speech and board noise carry enough structure at a low sample rate
+MULTICAM_AUDIO_RATE = int(os.getenv("MULTICAM_AUDIO_RATE", "8000"))
+# Only the start of each recording is correlated; angles start within this of each other
+MULTICAM_MAX_OFFSET_SECONDS = float(os.getenv("MULTICAM_MAX_OFFSET_SECONDS", "30"))
+MULTICAM_WINDOW_SECONDS = float(os.getenv("MULTICAM_WINDOW_SECONDS", "120"))
+# Height of each angle in the side-by-side composite
+MULTICAM_COMPOSITE_HEIGHT = int(os.getenv("MULTICAM_COMPOSITE_HEIGHT", "360"))
+
+
+def read_audio(video_path, rate=MULTICAM_AUDIO_RATE, seconds=None):
+    """Decodes the first `seconds` of a video's audio to a mono float32 array at `rate`."""
+    kwargs = {"t": seconds} if seconds else {}
+    with stage("ffmpeg.multicam_audio", path=video_path) as record:
+        pcm, _ = (
+            ffmpeg.input(video_path, **kwargs)
+            .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=rate)
+            .run(capture_stdout=True, quiet=True)
+        )
+        record["bytes"] = len(pcm)
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+
+
+def audio_offset(reference, other, rate=MULTICAM_AUDIO_RATE, max_offset=MULTICAM_MAX_OFFSET_SECONDS):
+    """
+    Returns `(offset, confidence)`: the time in `reference` at which `other`
+    starts, in seconds, found at the peak of the FFT cross-correlation of the
+    two signals, and the peak's normalized correlation, 0-1.
+    """
+    reference = reference - reference.mean()
+    other = other - other.mean()
+    n = 1 << (len(reference) + len(other) - 1).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(reference, n) * np.conj(np.fft.rfft(other, n)), n)
+    max_lag = min(int(max_offset * rate), n // 2 - 1)
+    # Lags 0..max_lag: other starts later; the wrapped tail holds negative lags
+    lags = np.concatenate((np.arange(max_lag + 1), np.arange(-max_lag, 0)))
+    window = np.concatenate((correlation[:max_lag + 1], correlation[n - max_lag:]))
+    best = int(np.argmax(window))
+    norm = np.sqrt(np.dot(reference, reference) * np.dot(other, other)) or 1.0
+    return float(lags[best] / rate), float(window[best] / norm)
+
+
+def align_angles(video_paths, reference=0, rate=MULTICAM_AUDIO_RATE, window=MULTICAM_WINDOW_SECONDS):
+    """
+    Returns the offset of each angle against `video_paths[reference]`: the
+    time on the reference's clock at which the angle starts.
+    """
+    with stage("multicam.align", angles=len(video_paths)):
+        tracks = [read_audio(path, rate, window) for path in video_paths]
+        offsets = []
+        for path, track in zip(video_paths, tracks):
+            offset, confidence = audio_offset(tracks[reference], track, rate)
+            print(f"{path}: starts at {offset:+.3f}s on the reference clock (correlation {confidence:.2f})")
+            offsets.append(offset)
+    return offsets
+
+
+class OffsetTimeMap:
+    """Maps times on the shared clock to times in one angle that starts `offset` seconds into it."""
+
+    def __init__(self, offset, duration):
+        self.offset = offset
+        self.duration = duration
+
+    def to_source(self, t):
+        return min(self.duration, max(0.0, t - self.offset))
+
+
+def composite_angles(
+    video_paths, offsets, output_path, reference=0, height=MULTICAM_COMPOSITE_HEIGHT, profile=PROXY_PROFILE
+):
+    """
+    Renders the angles side by side on the clock of `video_paths[reference]`,
+    with its audio, so one upload shows the model every angle.
+    """
+    videos = []
+    for path, offset in zip(video_paths, offsets):
+        video = ffmpeg.input(path).video
+        if offset > 0:
+            video = video.filter("tpad", start_duration=offset, start_mode="clone")
+        elif offset < 0:
+            video = video.trim(start=-offset).setpts("PTS-STARTPTS")
+        videos.append(profile.filter_video(video.filter("scale", -2, height)).filter("setsar", 1))
+    audio = ffmpeg.input(video_paths[reference]).audio
+    run_ffmpeg(
+        ffmpeg.output(
+            ffmpeg.filter(videos, "hstack", inputs=len(videos), shortest=1), audio, output_path, ac=1,
+            **profile.output_kwargs(),
+        ),
+        "ffmpeg.multicam_composite",
+        quiet=True,
+    )
+    return output_path
+
+
+def composite_key(video_paths, offsets):
+    """Keys a composite by its angles' bytes, their alignment and the composite settings."""
+    return content_key(
+        [file_digest(path) for path in video_paths], offsets, MULTICAM_COMPOSITE_HEIGHT, repr(PROXY_PROFILE)
+    )
+
+
+def get_composite(video_paths, offsets, work_dir, cache=None, key=None):
+    """
+    Returns the path of the side-by-side composite of `video_paths`, reusing
+    one cached under `key`, by default `composite_key`. Without a cache the
+    composite is written to `work_dir` and the caller removes it.
+    """
+    if cache:
+        key = key or composite_key(video_paths, offsets)
+        cached_composite = cache.get_path("multicam", key, ".mp4")
+        if cached_composite:
+            print(f"Using cached composite {cached_composite}")
+            return cached_composite
+
+    name = os.path.splitext(os.path.basename(video_paths[0]))[0]
+    output_path = os.path.join(work_dir, f"{name}_angles.mp4")
+    composite_angles(video_paths, offsets, output_path)
+    if cache:
+        return cache.put_file("multicam", key, output_path, ".mp4", move=True)
+    return output_path
+
+
+def _duration(video_path):
+    with stage("ffprobe", path=video_path):
+        return float(ffmpeg.probe(video_path)["format"]["duration"])
+
+
+def analyze_multicam(
+    video_paths,
+    work_dir,
+    cache=None,
+    primary=0,
+    analyze=analyze_video_cached,
+    motion_trim=False,
+    use_proxy=True,
+):
+    """
+    Scores one run filmed from several synchronized angles with a single
+    analysis, returning an analysis JSON per angle, in `video_paths` order.
+
+    Angles are aligned by cross-correlating their audio. `primary` is the
+    index of the angle that is analyzed, or "composite" to analyze all
+    angles side by side. Trick timestamps are then shifted onto each angle's
+    own clock, so every angle renders the same tricks, scores and commentary.
+    """
+    if len(video_paths) < 2:
+        raise ValueError("Multi-angle scoring needs at least two angles.")
+    if primary != "composite" and not 0 <= primary < len(video_paths):
+        raise ValueError(f"Primary angle {primary} is out of range for {len(video_paths)} angles.")
+    reference = 0 if primary == "composite" else primary
+    offsets = align_angles(video_paths, reference)
+
+    if primary == "composite":
+        digest = composite_key(video_paths, offsets) if cache else None
+        composite_path = get_composite(video_paths, offsets, work_dir, cache, digest)
+        hints = (
+            f"This video shows {len(video_paths)} synchronized camera angles of the same run side by side. "
+            "Score each trick once, using whichever angle shows it best."
+        )
+        try:
+            analysis_result = analyze(composite_path, cache, digest, prompt_hints=hints)
+        finally:
+            if not cache:
+                os.remove(composite_path)
+    else:
+        analysis_result = analyze_with_proxy(
+            video_paths[primary], work_dir, cache, analyze, motion_trim=motion_trim, use_proxy=use_proxy
+        )
+
+    results = []
+    for path, offset in zip(video_paths, offsets):
+        if offset == 0.0:
+            results.append(analysis_result)
+        else:
+            results.append(remap_analysis(analysis_result, OffsetTimeMap(offset, _duration(path))))
+    return results
+
+
+def render_angles(
+    video_paths, analyses, output_dir, mode, cache=None, segmented=True, profile=None, scoreboard=False,
+    temp_dir=None, synthesize=synthesize_speech,
+):
+    """
+    Renders every angle in `mode` ("commentary" or "score-overlay") from its
+    shifted analysis and returns the output paths. Angles share commentary
+    text, so each clip is synthesized once and reused from the cache.
+    Intermediates are written to `temp_dir`, `output_dir` by default.
+    `synthesize` is the TTS backend, as in `create_commentary_video`.
+    """
+    output_paths = []
+    for video_path, analysis_result in zip(video_paths, analyses):
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        if mode == "commentary":
+            output_path = os.path.join(output_dir, f"{name}_commentary.mp4")
+            create_commentary_video(
+                video_path,
+                analysis_result,
+                output_path,
+                temp_dir or output_dir,
+                synthesize=synthesize,
+                cache=cache,
+                segmented=segmented,
+                profile=profile,
+                scoreboard=scoreboard,
+            )
+        else:
+            output_path = os.path.join(output_dir, f"{name}_score_overlay.mp4")
+            add_score_overlay(
+                video_path,
+                analysis_result,
+                output_path,
+                segmented=segmented,
+                profile=profile,
+                cache=cache,
+                scoreboard=scoreboard,
+                temp_dir=temp_dir,
+            )
+        output_paths.append(output_path)
+    return output_paths
@@ -0,0 +1,159 @@
+import os
+import uuid
+import ffmpeg
+from dotenv import load_dotenv
+from cache_utils import content_key, file_digest
+from motion import analyze_active_segments
+from render_profiles import PROXY_PROFILE
+from tracing import run_ffmpeg, stage
+from video_analysis import analyze_video_cached
+
+load_dotenv()
+# Smaller sources are uploaded as they are; transcoding them saves too little
+PROXY_MIN_MB = int(os.getenv("PROXY_MIN_MB", "32"))
+
+
+def proxy_key(source_digest, profile=PROXY_PROFILE):
+    """Keys a proxy by its source's bytes and every setting of the profile that made it."""
+    return content_key(source_digest, repr(profile))
+
+
+def needs_proxy(source_video_path, profile=PROXY_PROFILE, min_mb=PROXY_MIN_MB):
+    """
+    Whether transcoding to `profile` would meaningfully shrink the upload.
+    `source_video_path` may be a signed URL, with `min_mb` 0 to skip the size check.
+    """
+    if min_mb and os.path.getsize(source_video_path) < min_mb * 1024 * 1024:
+        return False
+    with stage("ffprobe", path=source_video_path):
+        probe = ffmpeg.probe(source_video_path)
+    video = next(stream for stream in probe["streams"] if stream["codec_type"] == "video")
+    num, _, den = video["avg_frame_rate"].partition("/")
+    frame_rate = float(num) / float(den) if den and float(den) else float(num)
+    return int(video["height"]) > profile.max_height or frame_rate > profile.frame_rate * 2
+
+
+def make_proxy(source_video_path, output_path, profile=PROXY_PROFILE):
+    """
+    Transcodes a video to `profile` for upload. Only resolution, frame rate
+    and bitrate change: no frames are cut and timestamps still start at zero,
+    so times in the proxy are times in the source.
+    """
+    with stage("ffprobe", path=source_video_path):
+        probe = ffmpeg.probe(source_video_path)
+    source = ffmpeg.input(source_video_path)
+    audio = [source.audio] if any(stream["codec_type"] == "audio" for stream in probe["streams"]) else []
+    run_ffmpeg(
+        ffmpeg.output(profile.filter_video(source.video), *audio, output_path, ac=1, **profile.output_kwargs()),
+        "ffmpeg.proxy",
+        quiet=True,
+    )
+    return output_path
+
+
+def get_proxy(source_video_path, work_dir, cache=None, source_digest=None, profile=PROXY_PROFILE, name=None):
+    """
+    Returns the path of a proxy for `source_video_path`, reusing one cached
+    for the same source bytes and profile. Without a cache the proxy is
+    written to `work_dir` and the caller removes it. For a signed URL, pass
+    the video's `name` and its `source_digest`.
+    """
+    if cache:
+        key = proxy_key(source_digest or file_digest(source_video_path), profile)
+        cached_proxy = cache.get_path("proxy", key, ".mp4")
+        if cached_proxy:
+            print(f"Using cached proxy {cached_proxy}")
+            return cached_proxy
+
+    name = name or os.path.splitext(os.path.basename(source_video_path))[0]
+    output_path = os.path.join(work_dir, f"{name}_proxy_{uuid.uuid4().hex[:8]}.mp4")
+    make_proxy(source_video_path, output_path, profile)
+    if os.path.exists(source_video_path):
+        print(
+            f"Transcoded a {os.path.getsize(output_path) / (1024 * 1024):.1f} MB proxy of "
+            f"{os.path.getsize(source_video_path) / (1024 * 1024):.1f} MB {source_video_path}"
+        )
+    else:
+        print(f"Transcoded a {os.path.getsize(output_path) / (1024 * 1024):.1f} MB proxy of {name} from its stream")
+    if cache:
+        return cache.put_file("proxy", key, output_path, ".mp4", move=True)
+    return output_path
+
+
+def analyze_with_proxy(
+    local_video_path,
+    work_dir,
+    cache=None,
+    analyze=analyze_video_cached,
+    motion_trim=False,
+    use_proxy=True,
+):
+    """
+    Analyzes a local video, uploading a downscaled, low frame rate proxy in
+    its place when that makes the upload meaningfully smaller.
+
+    The analysis is cached under the source's digest and the proxy settings,
+    so it survives the proxy itself being evicted. With `motion_trim`, idle
+    stretches are also dropped, detected on the proxy.
+    """
+    source_digest = file_digest(local_video_path) if cache else None
+    upload_path = local_video_path
+    upload_digest = source_digest
+    if use_proxy and needs_proxy(local_video_path):
+        upload_path = get_proxy(local_video_path, work_dir, cache, source_digest)
+        upload_digest = proxy_key(source_digest) if cache else None
+
+    try:
+        if motion_trim:
+            return analyze_active_segments(upload_path, work_dir, cache, analyze, upload_digest)
+        return analyze(upload_path, cache, upload_digest)
+    finally:
+        if not cache and upload_path != local_video_path:
+            os.remove(upload_path)
+
+
+def analyze_gcs_stream(
+    gcs_uri,
+    signed_url,
+    work_dir,
+    cache=None,
+    analyze=analyze_video_cached,
+    motion_trim=False,
+    use_proxy=True,
+):
+    """
+    Analyzes a GCS video too large to download, given its signed URL.
+
+    ffmpeg transcodes the proxy straight from the URL with range requests,
+    so only the proxy is written locally, and is cached under the object's
+    MD5. Motion trimming then runs on the proxy. When no proxy is needed,
+    the original is streamed to the upload instead.
+    """
+    import mimetypes
+    from gcs_utils import gcs_content_digest, open_gcs_stream
+
+    source_digest = gcs_content_digest(gcs_uri)
+    # Composite objects have no MD5 to key the proxy by
+    proxy_cache = cache if source_digest else None
+    name = os.path.splitext(os.path.basename(gcs_uri))[0]
+    # Streamed sources are past the stream threshold, far above PROXY_MIN_MB
+    if use_proxy and needs_proxy(signed_url, min_mb=0):
+        upload_path = get_proxy(signed_url, work_dir, proxy_cache, source_digest, name=name)
+        upload_digest = proxy_key(source_digest) if proxy_cache else None
+        try:
+            if motion_trim:
+                return analyze_active_segments(upload_path, work_dir, proxy_cache, analyze, upload_digest)
+            return analyze(upload_path, proxy_cache, upload_digest)
+        finally:
+            if not proxy_cache:
+                os.remove(upload_path)
+
+    if not use_proxy:
+        print(f"Streaming {gcs_uri} to the analysis as it is, since the proxy is disabled.")
+    else:
+        print(f"Streaming {gcs_uri} to the analysis as it is, since it is within the proxy settings.")
+    if motion_trim:
+        print("Motion trimming needs a local copy or a proxy and is skipped for this streamed video.")
+    mime_type = mimetypes.guess_type(gcs_uri)[0] or "video/mp4"
+    with open_gcs_stream(gcs_uri) as video_stream:
+        return analyze(video_stream, cache, source_digest, mime_type)
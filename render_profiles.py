@@ -0,0 +1,73 @@
+import os
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+load_dotenv()
+DEFAULT_RENDER_PROFILE = os.getenv("RENDER_PROFILE", "fast")
+# 0 lets ffmpeg pick a thread count for the machine it runs on
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", "0"))
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """
+    Encoder settings for rendered videos. Profiles use the software encoders
+    so they behave the same on any CPU-only worker. `max_height` downscales
+    taller sources, keeping the aspect ratio, and `frame_rate` resamples to
+    that many frames per second.
+    """
+    name: str
+    preset: str
+    crf: int
+    audio_bitrate: str = "128k"
+    max_height: int = None
+    frame_rate: float = None
+    vcodec: str = "libx264"
+    acodec: str = "aac"
+
+    def output_kwargs(self, threads=None):
+        """ffmpeg output options for this profile."""
+        return {
+            "vcodec": self.vcodec,
+            "preset": self.preset,
+            "crf": self.crf,
+            "acodec": self.acodec,
+            "audio_bitrate": self.audio_bitrate,
+            "threads": RENDER_THREADS if threads is None else threads,
+        }
+
+    def filter_video(self, video):
+        """Applies the profile's frame rate and downscale, if any, to a video stream."""
+        if self.frame_rate is not None:
+            video = video.filter("fps", self.frame_rate)
+        if self.max_height is not None:
+            video = video.filter("scale", -2, f"min({self.max_height},ih)")
+        return video
+
+
+RENDER_PROFILES = {
+    "preview": RenderProfile("preview", preset="ultrafast", crf=30, audio_bitrate="96k", max_height=480),
+    "fast": RenderProfile("fast", preset="veryfast", crf=23),
+    "archive": RenderProfile("archive", preset="slow", crf=18, audio_bitrate="192k"),
+}
+
+# Analysis uploads: the model samples video at a few frames per second and
+# modest resolution, so anything more is wasted upload and processing time
+PROXY_PROFILE = RenderProfile(
+    "proxy",
+    preset="veryfast",
+    crf=int(os.getenv("PROXY_CRF", "30")),
+    audio_bitrate="64k",
+    max_height=int(os.getenv("PROXY_MAX_HEIGHT", "720")),
+    frame_rate=float(os.getenv("PROXY_FPS", "5")),
+)
+
+
+def get_render_profile(profile=None):
+    """Returns a `RenderProfile` by name, or the default profile when None."""
+    if isinstance(profile, RenderProfile):
+        return profile
+    name = profile or DEFAULT_RENDER_PROFILE
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile {name!r}; expected one of {', '.join(RENDER_PROFILES)}.")
+    return RENDER_PROFILES[name]
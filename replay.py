@@ -0,0 +1,397 @@
+"""
+Offline backends for the Gemini analysis, TTS, frame analysis and GCS calls.
+
+Each replay backend takes the same arguments as the live function it stands
+in for and returns data of the same shape, after sleeping for a latency
+drawn from a configurable distribution. The recording wrappers call the live
+backends and save their results and latencies, so a later replay can return
+what was actually recorded with latencies drawn from the recorded ones.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from cache_utils import file_digest
+from tracing import stage
+from tts_utils import TTS_SAMPLE_RATE, commentary_cache_key
+
+load_dotenv()
+# Stands in for the GCS buckets: gs://bucket/name is <REPLAY_GCS_DIR>/bucket/name
+REPLAY_GCS_DIR = os.getenv("REPLAY_GCS_DIR", "replay_gcs")
+REPLAY_ANALYSIS_FILE = os.getenv(
+    "REPLAY_ANALYSIS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "example_files", "shaun_white_analysis.json"),
+)
+# Latency specs: "fixed:S", "uniform:LOW,HIGH", "normal:MEAN,STDDEV", "lognormal:MEDIAN,SIGMA" or "recorded"
+REPLAY_ANALYSIS_LATENCY = os.getenv("REPLAY_ANALYSIS_LATENCY", "lognormal:30,0.3")
+REPLAY_TTS_LATENCY = os.getenv("REPLAY_TTS_LATENCY", "lognormal:1.5,0.3")
+REPLAY_FRAMES_LATENCY = os.getenv("REPLAY_FRAMES_LATENCY", "lognormal:4,0.3")
+REPLAY_GCS_LATENCY = os.getenv("REPLAY_GCS_LATENCY", "fixed:0.1")
+# Transfer rate of replayed downloads and uploads, on top of their latency
+REPLAY_GCS_MBPS = float(os.getenv("REPLAY_GCS_MBPS", "100"))
+# Speaking rate of replayed commentary, which sets the length of its PCM
+REPLAY_TTS_CHARS_PER_SECOND = float(os.getenv("REPLAY_TTS_CHARS_PER_SECOND", "15"))
+# Sampled latencies are multiplied by this, e.g. 0.1 for a quick benchmark
+REPLAY_LATENCY_SCALE = float(os.getenv("REPLAY_LATENCY_SCALE", "1"))
+
+LATENCIES_FILE = "latencies.jsonl"
+LISTINGS_FILE = "listings.jsonl"
+
+
+def _recorded_latencies(record_dir, backend):
+    path = os.path.join(record_dir, LATENCIES_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [entry["seconds"] for entry in map(json.loads, f) if entry["backend"] == backend]
+
+
+def frames_key(frames):
+    """Keys a batch of `(frame_index, timestamp, jpeg_bytes)` frames by their JPEG bytes."""
+    digest = hashlib.sha256()
+    for _, _, jpeg_bytes in frames:
+        digest.update(hashlib.sha256(jpeg_bytes).digest())
+    return digest.hexdigest()
+
+
+def _recorded_object(record_dir, gcs_uri):
+    return os.path.join(record_dir, "gcs", gcs_uri.replace("gs://", "", 1))
+
+
+def _recorded_listing(record_dir, gcs_prefix_uri):
+    """The URIs last recorded for a listing of `gcs_prefix_uri`, or None."""
+    path = os.path.join(record_dir, "gcs", LISTINGS_FILE)
+    if not os.path.exists(path):
+        return None
+    uris = None
+    with open(path, 'r') as f:
+        for entry in map(json.loads, f):
+            if entry["prefix"] == gcs_prefix_uri:
+                uris = entry["uris"]
+    return uris
+
+
+@dataclass
+class Latency:
+    """A latency distribution, in seconds, that backends sample before each call."""
+
+    kind: str = "fixed"
+    params: tuple = (0.0,)
+    scale: float = REPLAY_LATENCY_SCALE
+    seed: int = None
+    _random: random.Random = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def parse(cls, spec, record_dir=None, backend=None, scale=REPLAY_LATENCY_SCALE, seed=None):
+        """
+        Parses a spec such as "lognormal:1.5,0.3". "recorded" resamples the
+        latencies that a recording wrapper saved for `backend` in `record_dir`.
+        """
+        kind, _, values = spec.partition(":")
+        if kind == "recorded":
+            params = tuple(_recorded_latencies(record_dir, backend)) if record_dir else ()
+            if not params:
+                raise ValueError(f"No recorded {backend} latencies in {record_dir}.")
+            return cls("recorded", params, scale, seed)
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {', '.join(expected)} or recorded.")
+        try:
+            params = tuple(float(value) for value in values.split(",")) if values else ()
+        except ValueError:
+            raise ValueError(f"Invalid latency spec {spec!r}.")
+        if len(params) != expected[kind]:
+            raise ValueError(f"{kind} latency takes {expected[kind]} parameters, got {spec!r}.")
+        return cls(kind, params, scale, seed)
+
+    def sample(self):
+        if self._random is None:
+            self._random = random.Random(self.seed)
+        if self.kind == "fixed":
+            seconds = self.params[0]
+        elif self.kind == "uniform":
+            seconds = self._random.uniform(*self.params)
+        elif self.kind == "normal":
+            seconds = self._random.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            seconds = self._random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        else:
+            seconds = self._random.choice(self.params)
+        return max(0.0, seconds) * self.scale
+
+    def wait(self, extra=0.0):
+        """Sleeps for one sampled latency plus `extra` seconds and returns the time slept."""
+        seconds = self.sample() + extra * self.scale
+        time.sleep(seconds)
+        return seconds
+
+
+class ReplayAnalysis:
+    """
+    Stands in for `analyze_video_cached`: returns the analysis recorded for
+    the video's content digest in `record_dir`, or else `analysis_file`.
+    The cache is ignored, so every call pays the latency.
+    """
+
+    def __init__(self, analysis_file=REPLAY_ANALYSIS_FILE, latency=None, record_dir=None):
+        with open(analysis_file, 'r') as f:
+            self.analysis = f.read()
+        self.latency = latency or Latency.parse(REPLAY_ANALYSIS_LATENCY, record_dir, "analysis")
+        self.record_dir = record_dir
+
+    def __call__(self, local_video_path, cache=None, content_digest=None, mime_type=None, prompt_hints=None):
+        analysis = self.analysis
+        if self.record_dir:
+            if content_digest is None and isinstance(local_video_path, str):
+                content_digest = file_digest(local_video_path)
+            recorded_path = os.path.join(self.record_dir, "analysis", f"{content_digest}.json")
+            if os.path.exists(recorded_path):
+                with open(recorded_path, 'r') as f:
+                    analysis = f.read()
+        with stage("gemini.generation", backend="replay"):
+            self.latency.wait()
+        return analysis
+
+
+class ReplayTTS:
+    """
+    Stands in for `synthesize_speech`: returns the PCM recorded for the
+    commentary in `record_dir`, or else a quiet tone as long as the text
+    would take to speak at `chars_per_second`.
+    """
+
+    def __init__(self, latency=None, chars_per_second=REPLAY_TTS_CHARS_PER_SECOND, record_dir=None):
+        self.latency = latency or Latency.parse(REPLAY_TTS_LATENCY, record_dir, "tts")
+        self.chars_per_second = chars_per_second
+        self.record_dir = record_dir
+
+    def __call__(self, text):
+        pcm = None
+        if self.record_dir:
+            recorded_path = os.path.join(self.record_dir, "tts", f"{commentary_cache_key(text)}.pcm")
+            if os.path.exists(recorded_path):
+                with open(recorded_path, 'rb') as f:
+                    pcm = f.read()
+        if pcm is None:
+            import numpy as np
+
+            samples = int(TTS_SAMPLE_RATE * max(1, len(text)) / self.chars_per_second)
+            tone = 1000 * np.sin(2 * np.pi * 220 * np.arange(samples) / TTS_SAMPLE_RATE)
+            pcm = tone.astype("<i2").tobytes()
+        self.latency.wait()
+        return pcm
+
+
+class ReplayFrames:
+    """
+    Stands in for `analyze_frames_with_gemini`: returns the analyses recorded
+    for the same frame bytes in `record_dir`, or else one placeholder
+    `FrameAnalysis` per frame.
+    """
+
+    def __init__(self, latency=None, record_dir=None):
+        self.latency = latency or Latency.parse(REPLAY_FRAMES_LATENCY, record_dir, "frames")
+        self.record_dir = record_dir
+
+    def __call__(self, frames):
+        from extract_frames import FrameAnalysis
+
+        recorded = None
+        if self.record_dir:
+            recorded_path = os.path.join(self.record_dir, "frames", f"{frames_key(frames)}.json")
+            if os.path.exists(recorded_path):
+                with open(recorded_path, 'r') as f:
+                    recorded = json.load(f)
+        with stage("gemini.frames", frames=len(frames), backend="replay"):
+            self.latency.wait()
+        if recorded is not None:
+            # Matched by position, so the same frames sampled at other indices replay too
+            return [
+                FrameAnalysis(**{**analysis, "frame_index": frame_index})
+                for (frame_index, _, _), analysis in zip(frames, recorded)
+            ]
+        return [
+            FrameAnalysis(frame_index=frame_index, trick_name="Replayed trick", description=f"Frame at {timestamp:.2f}s.")
+            for frame_index, timestamp, _ in frames
+        ]
+
+
+class ReplayGCS:
+    """
+    Stands in for GCS with a local directory, where `gs://bucket/name` is
+    `<root>/bucket/name`. Transfers copy files and take the sampled latency
+    plus their size at `mbps`. Uploads land under `<root>/<bucket>/`.
+
+    Objects and listings missing from `root` are read from those recorded
+    in `record_dir`. Recorded latencies already include the transfer time.
+    """
+
+    def __init__(self, root, bucket="replay", latency=None, mbps=REPLAY_GCS_MBPS, record_dir=None):
+        self.root = root
+        self.bucket = bucket
+        self.latency = latency or Latency.parse(REPLAY_GCS_LATENCY, record_dir, "gcs")
+        self.mbps = mbps
+        self.record_dir = record_dir
+
+    def _local(self, gcs_uri):
+        return os.path.join(self.root, gcs_uri.replace("gs://", "", 1))
+
+    def _transfer(self, source_path, destination_path):
+        size = os.path.getsize(source_path)
+        os.makedirs(os.path.dirname(os.path.abspath(destination_path)), exist_ok=True)
+        self.latency.wait(0.0 if self.latency.kind == "recorded" else size / (self.mbps * 1024 * 1024))
+        shutil.copyfile(source_path, destination_path)
+        return size
+
+    def download(self, gcs_uri, local_path):
+        source_path = self._local(gcs_uri)
+        if not os.path.exists(source_path) and self.record_dir:
+            source_path = _recorded_object(self.record_dir, gcs_uri)
+        if not os.path.exists(source_path):
+            raise ValueError(f"{gcs_uri} does not exist.")
+        with stage("download", uri=gcs_uri, bytes=os.path.getsize(source_path), backend="replay"):
+            self._transfer(source_path, local_path)
+
+    def upload(self, local_path, gcs_folder):
+        gcs_uri = f"gs://{self.bucket}/{gcs_folder}/{os.path.basename(local_path)}"
+        with stage("upload", uri=gcs_uri, backend="replay") as record:
+            record["bytes"] = self._transfer(local_path, self._local(gcs_uri))
+        return gcs_uri
+
+    def list_videos(self, gcs_prefix_uri, extensions=(".mp4", ".mov", ".m4v", ".avi", ".mkv")):
+        recorded = _recorded_listing(self.record_dir, gcs_prefix_uri) if self.record_dir else None
+        if recorded is not None:
+            return [uri for uri in recorded if uri.lower().endswith(extensions)]
+        prefix_path = self._local(gcs_prefix_uri)
+        bucket = gcs_prefix_uri.replace("gs://", "", 1).split("/", 1)[0]
+        uris = []
+        for root, _, files in os.walk(os.path.join(self.root, bucket)):
+            for name in files:
+                path = os.path.join(root, name)
+                if path.startswith(prefix_path) and name.lower().endswith(extensions):
+                    uris.append(f"gs://{os.path.relpath(path, self.root)}")
+        return sorted(uris)
+
+
+class _Recorder:
+    _lock = threading.Lock()
+
+    def __init__(self, record_dir, backend):
+        self.record_dir = record_dir
+        self.backend = backend
+        os.makedirs(record_dir, exist_ok=True)
+
+    def record_latency(self, seconds):
+        with self._lock, open(os.path.join(self.record_dir, LATENCIES_FILE), "a") as f:
+            f.write(json.dumps({"backend": self.backend, "seconds": seconds}) + "\n")
+
+
+class RecordingAnalysis(_Recorder):
+    """Calls a live analysis backend and records its result and latency for `ReplayAnalysis`."""
+
+    def __init__(self, record_dir, analyze=None):
+        super().__init__(record_dir, "analysis")
+        if analyze is None:
+            from video_analysis import analyze_video_cached as analyze
+        self.analyze = analyze
+
+    def __call__(self, local_video_path, cache=None, content_digest=None, mime_type=None, prompt_hints=None):
+        if content_digest is None and isinstance(local_video_path, str):
+            content_digest = file_digest(local_video_path)
+        start = time.perf_counter()
+        analysis = self.analyze(local_video_path, cache, content_digest, mime_type, prompt_hints=prompt_hints)
+        self.record_latency(time.perf_counter() - start)
+        if content_digest is not None:
+            os.makedirs(os.path.join(self.record_dir, "analysis"), exist_ok=True)
+            with open(os.path.join(self.record_dir, "analysis", f"{content_digest}.json"), 'w') as f:
+                f.write(analysis)
+        return analysis
+
+
+class RecordingTTS(_Recorder):
+    """Calls a live TTS backend and records its PCM and latency for `ReplayTTS`."""
+
+    def __init__(self, record_dir, synthesize=None):
+        super().__init__(record_dir, "tts")
+        if synthesize is None:
+            from tts_utils import synthesize_speech as synthesize
+        self.synthesize = synthesize
+
+    def __call__(self, text):
+        start = time.perf_counter()
+        pcm = self.synthesize(text)
+        self.record_latency(time.perf_counter() - start)
+        os.makedirs(os.path.join(self.record_dir, "tts"), exist_ok=True)
+        with open(os.path.join(self.record_dir, "tts", f"{commentary_cache_key(text)}.pcm"), 'wb') as f:
+            f.write(pcm)
+        return pcm
+
+
+class RecordingFrames(_Recorder):
+    """Calls a live frame analysis backend and records its result and latency for `ReplayFrames`."""
+
+    def __init__(self, record_dir, analyze_frames=None):
+        super().__init__(record_dir, "frames")
+        if analyze_frames is None:
+            from extract_frames import analyze_frames_with_gemini as analyze_frames
+        self.analyze_frames = analyze_frames
+
+    def __call__(self, frames):
+        start = time.perf_counter()
+        analyses = self.analyze_frames(frames)
+        self.record_latency(time.perf_counter() - start)
+        os.makedirs(os.path.join(self.record_dir, "frames"), exist_ok=True)
+        with open(os.path.join(self.record_dir, "frames", f"{frames_key(frames)}.json"), 'w') as f:
+            json.dump([analysis.model_dump() for analysis in analyses], f)
+        return analyses
+
+
+class RecordingGCS(_Recorder):
+    """
+    Calls the live GCS functions and records, for `ReplayGCS`, the latency
+    of every transfer, every listing, and each downloaded object under
+    `<record_dir>/gcs/<bucket>/<name>`.
+    """
+
+    def __init__(self, record_dir, download=None, upload=None, list_videos=None):
+        super().__init__(record_dir, "gcs")
+        import gcs_utils
+
+        self._download = download or gcs_utils.download_from_gcs
+        self._upload = upload or gcs_utils.upload_to_gcs
+        self._list_videos = list_videos or gcs_utils.list_gcs_videos
+
+    def download(self, gcs_uri, local_path):
+        start = time.perf_counter()
+        self._download(gcs_uri, local_path)
+        self.record_latency(time.perf_counter() - start)
+        recorded_path = _recorded_object(self.record_dir, gcs_uri)
+        os.makedirs(os.path.dirname(recorded_path), exist_ok=True)
+        temp_path = f"{recorded_path}.{uuid.uuid4().hex}.tmp"
+        # The batch removes its download once the run is done, so the recording keeps its own link
+        try:
+            os.link(local_path, temp_path)
+        except OSError:
+            shutil.copyfile(local_path, temp_path)
+        os.replace(temp_path, recorded_path)
+
+    def upload(self, local_path, gcs_folder):
+        start = time.perf_counter()
+        gcs_uri = self._upload(local_path, gcs_folder)
+        self.record_latency(time.perf_counter() - start)
+        return gcs_uri
+
+    def list_videos(self, gcs_prefix_uri, extensions=(".mp4", ".mov", ".m4v", ".avi", ".mkv")):
+        uris = self._list_videos(gcs_prefix_uri, extensions)
+        os.makedirs(os.path.join(self.record_dir, "gcs"), exist_ok=True)
+        with self._lock, open(os.path.join(self.record_dir, "gcs", LISTINGS_FILE), "a") as f:
+            f.write(json.dumps({"prefix": gcs_prefix_uri, "uris": uris}) + "\n")
+        return uris
@@ -0,0 +1,261 @@
+import glob
+import os
+import re
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+# Outside temp/, so `clean` and the workspace quota never touch the results
+RESULTS_DB = os.getenv("RESULTS_DB", "results.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    event TEXT NOT NULL,
+    run TEXT NOT NULL,
+    skater TEXT NOT NULL,
+    source TEXT,
+    final_score REAL NOT NULL,
+    trick_count INTEGER NOT NULL,
+    average_score REAL,
+    best_trick_score REAL,
+    ingested_at REAL NOT NULL,
+    UNIQUE (event, run)
+);
+CREATE TABLE IF NOT EXISTS tricks (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    trick_name TEXT NOT NULL,
+    trick_key TEXT NOT NULL,
+    start_seconds REAL NOT NULL,
+    end_seconds REAL NOT NULL,
+    score REAL NOT NULL,
+    description TEXT,
+    commentary TEXT,
+    PRIMARY KEY (run_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_by_score ON runs (final_score DESC);
+CREATE INDEX IF NOT EXISTS runs_by_event_score ON runs (event, final_score DESC);
+CREATE INDEX IF NOT EXISTS runs_by_skater ON runs (skater, final_score DESC);
+-- trick_name makes it cover the per-trick stats
+CREATE INDEX IF NOT EXISTS tricks_by_name_score ON tricks (trick_key, score DESC, trick_name);
+CREATE INDEX IF NOT EXISTS tricks_by_score ON tricks (score DESC);
+"""
+
+
+def trick_key(trick_name):
+    """Normalizes a trick name for matching: lowercase, with hyphens and runs of spaces collapsed."""
+    return re.sub(r"[\s\-_]+", " ", trick_name.strip().lower())
+
+
+def run_name(analysis_path, root=None):
+    """
+    Names a run after its analysis file, e.g. `temp/tony_hawk_2_analysis.json`
+    -> `tony_hawk_2`. With `root`, after its path below `root`, as batch runs
+    are named, so `a/run_1_analysis.json` and `b/run_1_analysis.json` are
+    `a__run_1` and `b__run_1`.
+    """
+    path = os.path.relpath(analysis_path, root) if root else os.path.basename(analysis_path)
+    name = os.path.splitext(path)[0].replace(os.sep, "__")
+    return name[:-len("_analysis")] if name.endswith("_analysis") else name
+
+
+def _glob_root(pattern):
+    """The directory a glob pattern is rooted at: its leading components without wildcards."""
+    root = []
+    for part in pattern.split(os.sep)[:-1]:
+        if re.search(r"[*?[]", part):
+            break
+        root.append(part)
+    return os.sep.join(root) or (os.sep if pattern.startswith(os.sep) else ".")
+
+
+def skater_name(run):
+    """Guesses the skater from a run name such as `tony_hawk_2` or `heats__tony_hawk_2`: `Tony Hawk`."""
+    name = re.sub(r"[_\-\s]*\d+$", "", run.rsplit("__", 1)[-1])
+    return " ".join(part.capitalize() for part in re.split(r"[_\-\s]+", name) if part) or run
+
+
+class ResultsStore:
+    """
+    Every analyzed run and its tricks in one SQLite database, indexed by
+    event and final score, skater, trick name and trick score, so
+    leaderboards and trick queries read an index instead of parsing every
+    analysis JSON. Re-ingesting a run, e.g. after a judge corrects its
+    analysis, replaces it. Safe to share between threads.
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        import sqlite3
+
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # WAL lets the leaderboard read while a batch is writing
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _insert(self, run, timeline, skater, event, source):
+        self._db.execute("DELETE FROM runs WHERE event = ? AND run = ?", (event, run))
+        scores = list(timeline.scores)
+        cursor = self._db.execute(
+            "INSERT INTO runs (event, run, skater, source, final_score, trick_count, average_score, "
+            "best_trick_score, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                event,
+                run,
+                skater or skater_name(run),
+                source,
+                timeline.final_score if len(timeline) else 0.0,
+                len(timeline),
+                sum(scores) / len(scores) if scores else None,
+                max(scores) if scores else None,
+                time.time(),
+            ),
+        )
+        self._db.executemany(
+            "INSERT INTO tricks (run_id, position, trick_name, trick_key, start_seconds, end_seconds, score, "
+            "description, commentary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    cursor.lastrowid, i, trick.trick_name, trick_key(trick.trick_name), start, end,
+                    trick.trick_score, trick.description, trick.commentary,
+                )
+                for i, (trick, start, end) in enumerate(zip(timeline.tricks, timeline.starts, timeline.ends))
+            ],
+        )
+
+    def add_run(self, run, analysis, skater=None, event="", source=None):
+        """
+        Ingests one run's analysis JSON or `Timeline`, replacing any earlier
+        result for the same run and event. Raises ValueError if the analysis
+        is malformed.
+        """
+        from timeline import load_timeline
+
+        timeline = load_timeline(analysis)
+        with self._lock, self._db:
+            self._insert(run, timeline, skater, event or "", source)
+
+    def import_files(self, patterns, event=""):
+        """
+        Bulk-imports analysis JSON files matching `patterns` (paths, globs
+        or directories) in one transaction, naming each run after its path
+        below the directory or the glob's root. Malformed files, and files
+        that would replace a run imported earlier in the same call, are
+        skipped. Returns `(imported, skipped)`.
+        """
+        from timeline import Timeline
+
+        paths = []
+        for pattern in patterns:
+            if os.path.isdir(pattern):
+                root, pattern = pattern, os.path.join(pattern, "*_analysis.json")
+            else:
+                root = _glob_root(pattern)
+            paths.extend((path, root) for path in sorted(glob.glob(pattern, recursive=True)))
+
+        imported = skipped = 0
+        sources = {}
+        with self._lock, self._db:
+            for path, root in paths:
+                run = run_name(path, root)
+                if run in sources:
+                    print(f"Skipping {path}: run {run} was already imported from {sources[run]}")
+                    skipped += 1
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        timeline = Timeline.from_json(f.read())
+                except (OSError, ValueError) as e:
+                    print(f"Skipping {path}: {e}")
+                    skipped += 1
+                    continue
+                sources[run] = path
+                self._insert(run, timeline, None, event or "", os.path.abspath(path))
+                imported += 1
+        return imported, skipped
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    @staticmethod
+    def _filters(event=None, skater=None):
+        clauses, params = [], []
+        if event is not None:
+            clauses.append("runs.event = ?")
+            params.append(event)
+        if skater is not None:
+            clauses.append("runs.skater = ?")
+            params.append(skater)
+        return clauses, params
+
+    def top_runs(self, limit=10, event=None, skater=None):
+        """The highest-scoring runs, optionally of one event or skater."""
+        clauses, params = self._filters(event, skater)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT event, run, skater, final_score, trick_count, average_score, best_trick_score FROM runs "
+            f"{where} ORDER BY final_score DESC LIMIT ?",
+            (*params, limit),
+        )
+
+    def find_tricks(self, name=None, score_above=None, limit=50, event=None, skater=None):
+        """
+        The highest-scoring tricks whose normalized name starts with `name`,
+        so "McTwist" also matches "mctwist 540", scoring more than `score_above`.
+        """
+        clauses, params = self._filters(event, skater)
+        if name:
+            key = trick_key(name)
+            # A range on the key rather than LIKE, so the prefix match reads the index
+            clauses.append("tricks.trick_key >= ? AND tricks.trick_key < ?")
+            params.extend([key, key + "\uffff"])
+        if score_above is not None:
+            clauses.append("tricks.score > ?")
+            params.append(score_above)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT runs.event, runs.run, runs.skater, tricks.trick_name, tricks.score, tricks.start_seconds, "
+            f"tricks.end_seconds FROM tricks JOIN runs ON runs.id = tricks.run_id {where} "
+            f"ORDER BY tricks.score DESC LIMIT ?",
+            (*params, limit),
+        )
+
+    def trick_stats(self, limit=20, event=None, skater=None):
+        """How often each trick was landed and how it scored, most common first."""
+        clauses, params = self._filters(event, skater)
+        # Unfiltered, the aggregate reads only the trick index
+        source = "tricks JOIN runs ON runs.id = tricks.run_id" if clauses else "tricks"
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT MIN(tricks.trick_name) AS trick_name, COUNT(*) AS count, AVG(tricks.score) AS average_score, "
+            f"MAX(tricks.score) AS best_score FROM {source} {where} "
+            f"GROUP BY tricks.trick_key ORDER BY count DESC, best_score DESC LIMIT ?",
+            (*params, limit),
+        )
+
+    def skater_stats(self, limit=20, event=None):
+        """Each skater's run count, best and average final score, best first."""
+        clauses, params = self._filters(event)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT skater, COUNT(*) AS runs, MAX(final_score) AS best_score, AVG(final_score) AS average_score "
+            f"FROM runs {where} GROUP BY skater ORDER BY best_score DESC LIMIT ?",
+            (*params, limit),
+        )
+
+    def events(self):
+        return self._query(
+            "SELECT event, COUNT(*) AS runs, MAX(final_score) AS best_score FROM runs GROUP BY event ORDER BY event"
+        )
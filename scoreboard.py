@@ -0,0 +1,172 @@
+import os
+import ffmpeg
+from dotenv import load_dotenv
+from cache_utils import content_key
+
+load_dotenv()
+# TrueType font of the score cards; PIL's bundled font is used if it cannot be found
+SCOREBOARD_FONT = os.getenv("SCOREBOARD_FONT", "DejaVuSans.ttf")
+SCOREBOARD_FONT_SIZE = int(os.getenv("SCOREBOARD_FONT_SIZE", "48"))
+FINAL_SCORE_SECONDS = 5
+# The overlay track's last card is held this long, past the end of any video
+OVERLAY_TAIL_SECONDS = 86400
+
+# White text on a translucent black box in the bottom-right corner, as the
+# previous `drawtext` overlay drew it
+SCORE_CARD_STYLE = {
+    "font": SCOREBOARD_FONT,
+    "fontsize": SCOREBOARD_FONT_SIZE,
+    "fontcolor": [255, 255, 255, 255],
+    "boxcolor": [0, 0, 0, 128],
+    "boxborderw": 5,
+    "spacing": 8,
+    "margin": 10,
+}
+
+
+def final_score_overlay(timeline, start, end=None):
+    """The final score card, shown over `[start, end)` seconds of source time."""
+    return ((f"Final Score: {timeline.final_score}",), start, end)
+
+
+def running_score_overlays(timeline):
+    """
+    One card per trick, shown from the trick's end until the next trick
+    ends, with its score and the run's average so far.
+    """
+    overlays = []
+    total = 0.0
+    for i, (trick, end) in enumerate(zip(timeline.tricks, timeline.ends)):
+        total += trick.trick_score
+        lines = (f"{trick.trick_name}: {trick.trick_score:g}", f"Tricks: {i + 1}  Average: {total / (i + 1):.1f}")
+        overlays.append((lines, end, timeline.ends[i + 1] if i + 1 < len(timeline) else None))
+    return overlays
+
+
+def score_overlays(timeline, final_start, final_end=None, scoreboard=False):
+    """
+    The score cards of a render: the final score over `[final_start,
+    final_end)`, after a running per-trick scoreboard with `scoreboard`.
+    """
+    overlays = running_score_overlays(timeline) if scoreboard else []
+    if overlays:
+        # The last trick's card gives way to the final score
+        lines, start, _ = overlays[-1]
+        overlays[-1] = (lines, start, final_start)
+    overlays.append(final_score_overlay(timeline, final_start, final_end))
+    return overlays
+
+
+def overlay_steps(overlays, start=0.0, end=None):
+    """
+    Resolves `(lines, start, end)` overlays in source time into the card
+    shown over `[start, end)`, as `(lines, offset)` steps on a clock that
+    starts at `start`. `lines` is None where no card is shown, and where
+    overlays overlap the later one in the list is shown.
+    """
+    points = {start}
+    for _, overlay_start, overlay_end in overlays:
+        for t in (overlay_start, overlay_end):
+            if t is not None and t > start and (end is None or t < end):
+                points.add(t)
+
+    steps = []
+    for t in sorted(points):
+        shown = None
+        for lines, overlay_start, overlay_end in overlays:
+            if overlay_start <= t and (overlay_end is None or t < overlay_end):
+                shown = tuple(lines)
+        if not steps or steps[-1][0] != shown:
+            steps.append((shown, t - start))
+    return steps
+
+
+def _load_font():
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(SCORE_CARD_STYLE["font"], SCORE_CARD_STYLE["fontsize"])
+    except OSError:
+        return ImageFont.load_default(SCORE_CARD_STYLE["fontsize"])
+
+
+def render_cards(cards, work_dir):
+    """
+    Renders each distinct card, a tuple of text lines or None for no card,
+    once as an RGBA PNG in `work_dir` and returns `{card: path}`. All cards
+    share one canvas size, so they can be played as one stream, with their
+    box in the canvas's bottom-right corner.
+    """
+    from PIL import Image, ImageDraw
+
+    font = _load_font()
+    border = SCORE_CARD_STYLE["boxborderw"]
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    boxes = {}
+    for card in set(cards):
+        if card is not None:
+            boxes[card] = measure.multiline_textbbox(
+                (0, 0), "\n".join(card), font=font, spacing=SCORE_CARD_STYLE["spacing"]
+            )
+    width = max((right - left + 2 * border for left, _, right, _ in boxes.values()), default=1)
+    height = max((bottom - top + 2 * border for _, top, _, bottom in boxes.values()), default=1)
+
+    paths = {}
+    for card in set(cards):
+        key = content_key("score_card", card, width, height, SCORE_CARD_STYLE)
+        path = os.path.join(work_dir, f"card_{key[:16]}.png")
+        paths[card] = path
+        if os.path.exists(path):
+            continue
+        image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        if card is not None:
+            left, top, right, bottom = boxes[card]
+            box_left = width - (right - left + 2 * border)
+            box_top = height - (bottom - top + 2 * border)
+            draw = ImageDraw.Draw(image)
+            draw.rectangle((box_left, box_top, width, height), fill=tuple(SCORE_CARD_STYLE["boxcolor"]))
+            draw.multiline_text(
+                (box_left + border - left, box_top + border - top),
+                "\n".join(card),
+                font=font,
+                fill=tuple(SCORE_CARD_STYLE["fontcolor"]),
+                spacing=SCORE_CARD_STYLE["spacing"],
+            )
+        # Segments render in parallel and may share cards, so each is written once, atomically
+        temp_path = f"{path}.{os.getpid()}.{id(image)}.tmp"
+        image.save(temp_path, format="PNG")
+        os.replace(temp_path, path)
+    return paths
+
+
+def apply_overlays(video, overlays, work_dir, start=0.0, end=None, name="overlays"):
+    """
+    Draws `(lines, start, end)` overlays, in source time, on `video`, whose
+    clock starts at `start` seconds of the source and runs to `end`.
+
+    Each distinct card is rendered once by `render_cards`, and the cards are
+    played as an image track from an ffconcat list, one image per change of
+    card. A single `overlay` filter composites the track, holding each image
+    until the next, so the per-frame cost is one alpha blend however many
+    tricks the scoreboard shows. Returns `video` unchanged if no card falls
+    within `[start, end)`.
+    """
+    steps = overlay_steps(overlays, start, end)
+    if all(card is None for card, _ in steps):
+        return video
+
+    os.makedirs(work_dir, exist_ok=True)
+    cards = render_cards([card for card, _ in steps], work_dir)
+    track_path = os.path.join(work_dir, f"{name}.ffconcat")
+    with open(track_path, "w") as f:
+        f.write("ffconcat version 1.0\n")
+        for (card, offset), next_step in zip(steps, steps[1:] + [None]):
+            f.write(f"file '{os.path.abspath(cards[card])}'\n")
+            f.write(f"duration {next_step[1] - offset if next_step else OVERLAY_TAIL_SECONDS:.6f}\n")
+        # The concat demuxer only honors the last entry's duration when it is
+        # followed by another, so the track outlasts `video` and `shortest` ends it
+        f.write(f"file '{os.path.abspath(cards[steps[-1][0]])}'\n")
+
+    track = ffmpeg.input(track_path, f="concat", safe=0)
+    margin = SCORE_CARD_STYLE["margin"]
+    return video.overlay(track, x=f"W-w-{margin}", y=f"H-h-{margin}", eof_action="repeat", shortest=1)
@@ -0,0 +1,310 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+import ffmpeg
+from cache_utils import content_key, file_digest
+from render_profiles import get_render_profile
+from scoreboard import SCORE_CARD_STYLE, apply_overlays
+from tracing import run_ffmpeg, stage
+from workspace import small_dir
+
+# Stream copy needs re-encoded segments that can be concatenated with the
+# source's own packets, so only codecs we can re-encode to are supported
+STREAM_COPY_VIDEO_CODECS = ("h264",)
+STREAM_COPY_AUDIO_CODECS = ("aac",)
+# Encoders whose output can be joined with stream-copied packets of each codec
+STREAM_COPY_ENCODERS = {"h264": "libx264", "aac": "aac"}
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 1)))
+
+
+@dataclass
+class Segment:
+    """
+    A span `[start, end)` of the source in output order. `end` of None runs to
+    the end of the source. `freeze` holds the last frame for that many
+    seconds while `commentary_audio`, an `AudioClip`, plays. `overlays` is a
+    list of `(lines, start, end)` score cards in source time, as drawn by
+    `scoreboard.apply_overlays`.
+    """
+    start: float
+    end: float = None
+    copy: bool = False
+    freeze: float = 0.0
+    commentary_audio: object = None
+    overlays: list = field(default_factory=list)
+
+
+@dataclass
+class SourceInfo:
+    duration: float
+    keyframes: list
+    video_codec: str
+    audio_codec: str
+    pix_fmt: str
+    height: int
+    frame_rate: str
+    sample_rate: int
+    channels: int
+
+
+def probe_source(source_video_path):
+    """Probes the codecs and keyframe times of a video without decoding it."""
+    with stage("ffprobe", path=source_video_path):
+        probe = ffmpeg.probe(source_video_path)
+        packets = ffmpeg.probe(
+            source_video_path, select_streams="v:0", show_entries="packet=pts_time,flags"
+        )["packets"]
+    video = next(stream for stream in probe["streams"] if stream["codec_type"] == "video")
+    audio = next(stream for stream in probe["streams"] if stream["codec_type"] == "audio")
+    keyframes = sorted(
+        float(packet["pts_time"]) for packet in packets
+        if "K" in packet.get("flags", "") and packet.get("pts_time") not in (None, "N/A")
+    )
+    return SourceInfo(
+        duration=float(probe["format"]["duration"]),
+        keyframes=keyframes,
+        video_codec=video["codec_name"],
+        audio_codec=audio["codec_name"],
+        pix_fmt=video["pix_fmt"],
+        height=int(video["height"]),
+        frame_rate=video["avg_frame_rate"],
+        sample_rate=int(audio["sample_rate"]),
+        channels=int(audio["channels"]),
+    )
+
+
+def can_stream_copy(info, profile):
+    """Whether segments re-encoded with `profile` can be joined with copied spans of the source."""
+    return (
+        info.video_codec in STREAM_COPY_VIDEO_CODECS
+        and info.audio_codec in STREAM_COPY_AUDIO_CODECS
+        and profile.vcodec == STREAM_COPY_ENCODERS[info.video_codec]
+        and profile.acodec == STREAM_COPY_ENCODERS[info.audio_codec]
+        and (profile.max_height is None or info.height <= profile.max_height)
+        and profile.frame_rate is None
+    )
+
+
+def plan_segments(pieces, info, min_copy_seconds=1.0):
+    """
+    Splits each piece into keyframe-aligned spans that can be stream-copied and
+    spans that must be re-encoded.
+
+    A span is copied only if it starts on a keyframe, ends on a keyframe or the
+    end of the source, and touches no overlay or freeze. Everything else is
+    re-encoded, carrying the piece's overlays; the freeze and commentary
+    attach to the span that ends the piece.
+    """
+    keyframe_set = set(info.keyframes)
+    segments = []
+    for piece in pieces:
+        end = info.duration if piece.end is None else piece.end
+        dirty = [(start, info.duration if stop is None else stop) for _, start, stop in piece.overlays]
+        if piece.freeze:
+            # The held frame has to be decoded, so the tail is always re-encoded
+            dirty.append((end - 0.001, end))
+
+        points = sorted({piece.start, end} | {k for k in info.keyframes if piece.start < k < end})
+        spans = []
+        for span_start, span_end in zip(points, points[1:]):
+            copy = (
+                span_start in keyframe_set
+                and (span_end in keyframe_set or span_end >= info.duration)
+                and not any(start < span_end and span_start < stop for start, stop in dirty)
+            )
+            if spans and spans[-1].copy == copy:
+                spans[-1].end = span_end
+            else:
+                spans.append(Segment(span_start, span_end, copy=copy, overlays=piece.overlays))
+
+        # Copying very short spans costs more in process overhead than it saves
+        for span in spans:
+            if span.copy and span.end - span.start < min_copy_seconds:
+                span.copy = False
+        merged = []
+        for span in spans:
+            if merged and merged[-1].copy == span.copy:
+                merged[-1].end = span.end
+            else:
+                merged.append(span)
+
+        merged[-1] = replace(merged[-1], freeze=piece.freeze, commentary_audio=piece.commentary_audio)
+        if piece.end is None:
+            merged[-1].end = None
+        for span in merged:
+            # Only the cards a span shows are part of its cache key, so editing
+            # one trick's score leaves the other spans cached
+            span_end = info.duration if span.end is None else span.end
+            span.overlays = [
+                overlay for overlay in piece.overlays
+                if overlay[1] < span_end and (overlay[2] is None or span.start < overlay[2])
+            ]
+        segments.extend(merged)
+    return segments
+
+
+def segment_key(source_digest, segment, info, profile):
+    """Keys a re-encoded segment by every input that shapes its frames and samples."""
+    return content_key(
+        source_digest,
+        segment.start,
+        segment.end,
+        segment.freeze,
+        segment.commentary_audio.digest() if segment.commentary_audio else None,
+        segment.overlays,
+        SCORE_CARD_STYLE if segment.overlays else None,
+        info.pix_fmt,
+        info.frame_rate,
+        info.sample_rate,
+        info.channels,
+        repr(profile),
+    )
+
+
+def _render_segment(source_video_path, segment, output_path, info, profile, threads, cards_dir):
+    kwargs = {"ss": segment.start}
+    if segment.end is not None:
+        kwargs["t"] = segment.end - segment.start
+    source = ffmpeg.input(source_video_path, **kwargs)
+
+    if segment.copy:
+        stream = ffmpeg.output(source, output_path, c="copy", f="mpegts")
+    else:
+        # Overlay windows are in source time; the segment's clock starts at its start
+        video = apply_overlays(
+            source.video,
+            segment.overlays,
+            cards_dir,
+            segment.start,
+            segment.end,
+            name=os.path.basename(output_path),
+        )
+        audio = source.audio
+        if segment.freeze:
+            video = video.filter("tpad", stop_mode="clone", stop_duration=segment.freeze)
+        if segment.commentary_audio:
+            commentary = ffmpeg.input("pipe:", **segment.commentary_audio.input_kwargs())
+            audio = ffmpeg.concat(audio, commentary["a"], v=0, a=1)
+        stream = ffmpeg.output(
+            video,
+            audio,
+            output_path,
+            pix_fmt=info.pix_fmt,
+            r=info.frame_rate,
+            ar=info.sample_rate,
+            ac=info.channels,
+            f="mpegts",
+            **profile.output_kwargs(threads),
+        )
+    pcm = segment.commentary_audio.pcm if segment.commentary_audio and not segment.copy else None
+    run_ffmpeg(stream, "ffmpeg.segment", quiet=True, input=pcm, start=segment.start, copy=segment.copy)
+    return output_path
+
+
+def _pin(path, pinned_path):
+    """
+    Gives the job its own link to a cached file, so the concat still finds
+    it if the cache evicts the entry. Copies across filesystems.
+    """
+    try:
+        os.link(path, pinned_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(path, pinned_path)
+    return pinned_path
+
+
+def render_segments(
+    source_video_path,
+    pieces,
+    output_video_path,
+    info=None,
+    workers=RENDER_WORKERS,
+    profile=None,
+    cache=None,
+    source_digest=None,
+    work_dir=None,
+):
+    """
+    Renders `pieces` by stream-copying untouched keyframe-aligned spans and
+    re-encoding only the modified ones with the render `profile`, in
+    parallel, then joins the results with the concat demuxer. Returns False,
+    rendering nothing, if the source codecs cannot be stream-copied alongside
+    segments re-encoded with `profile`.
+
+    With a `ContentCache`, re-encoded segments are stored by `segment_key`,
+    so a re-render after an edit to one trick only re-encodes the segments
+    whose inputs changed. `source_digest` saves hashing the source again,
+    and is needed to cache segments of a source that is a URL rather than a
+    local file.
+    Intermediate segments are written to `work_dir`, next to the output by
+    default, and score cards to the tmpfs if `WORKSPACE_TMPFS_DIR` is set.
+    """
+    info = info or probe_source(source_video_path)
+    profile = get_render_profile(profile)
+    if not can_stream_copy(info, profile):
+        return False
+
+    segments = plan_segments(pieces, info)
+    work_dir = tempfile.mkdtemp(
+        prefix="segments_", dir=work_dir or os.path.dirname(os.path.abspath(output_video_path))
+    )
+    cards_dir = tempfile.mkdtemp(prefix="cards_", dir=small_dir(work_dir))
+    try:
+        paths = [os.path.join(work_dir, f"segment_{i:04}.ts") for i in range(len(segments))]
+        keys = {}
+        pending = []
+        if cache and not source_digest:
+            if os.path.isfile(source_video_path):
+                source_digest = file_digest(source_video_path)
+            else:
+                # A streamed URL cannot be hashed locally
+                print("No digest for the streamed source, render segments will not be cached.")
+                cache = None
+        for i, segment in enumerate(segments):
+            if cache and not segment.copy:
+                keys[i] = segment_key(source_digest, segment, info, profile)
+                cached_segment = cache.get_path("segments", keys[i], ".ts")
+                if cached_segment:
+                    try:
+                        _pin(cached_segment, paths[i])
+                        continue
+                    except FileNotFoundError:
+                        # Evicted since the lookup
+                        pass
+            pending.append(i)
+        encoded = sum(1 for i in pending if not segments[i].copy)
+        print(
+            f"Rendering {len(segments)} segments: {len(pending) - encoded} stream-copied, "
+            f"{encoded} re-encoded, {len(segments) - len(pending)} reused from the cache."
+        )
+
+        threads = max(1, (os.cpu_count() or 1) // max(1, min(workers, encoded)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(
+                lambda i: _render_segment(
+                    source_video_path, segments[i], paths[i], info, profile, threads=threads, cards_dir=cards_dir
+                ),
+                pending,
+            ))
+        for i in pending:
+            if i in keys:
+                # Storing may evict; the concat reads the job's own link
+                cache.put_file("segments", keys[i], _pin(paths[i], f"{paths[i]}.store"), ".ts", move=True)
+
+        concat_list = os.path.join(work_dir, "segments.txt")
+        with open(concat_list, "w") as f:
+            for path in paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        run_ffmpeg(
+            ffmpeg.input(concat_list, f="concat", safe=0).output(output_video_path, c="copy"),
+            "ffmpeg.concat",
+            quiet=True,
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        shutil.rmtree(cards_dir, ignore_errors=True)
+    return True
@@ -0,0 +1,352 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from gcs_utils import (
+    GCS_STREAM_THRESHOLD_MB,
+    gcs_content_digest,
+    get_client as get_gcs_client,
+    resolve_video_source,
+    upload_to_gcs,
+)
+from render_profiles import get_render_profile
+from tracing import prometheus_text
+from tts_utils import synthesize_speech
+from video_analysis import analyze_video_cached, get_client as get_gemini_client
+from proxy import analyze_gcs_stream, analyze_with_proxy
+from video_editor import add_score_overlay, create_commentary_video
+from workspace import Workspace
+
+load_dotenv()
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+# Jobs beyond this many waiting are rejected with 503 until the queue drains
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "16"))
+SERVICE_MAX_FINISHED_JOBS = int(os.getenv("SERVICE_MAX_FINISHED_JOBS", "1000"))
+JOB_MODES = ("analyze", "commentary", "score-overlay")
+
+
+class JobQueue:
+    """
+    A bounded queue of jobs drained by a fixed pool of worker threads.
+
+    `submit` never blocks: when `queue_size` jobs are already waiting it
+    returns None so callers can push back. Only the most recent
+    `max_finished` finished jobs are kept.
+    """
+
+    def __init__(self, handler, workers=SERVICE_WORKERS, queue_size=SERVICE_QUEUE_SIZE,
+                 max_finished=SERVICE_MAX_FINISHED_JOBS):
+        self.handler = handler
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, request):
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "request": request,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            try:
+                self._queue.put_nowait(job["id"])
+            except queue.Full:
+                return None
+            self.jobs[job["id"]] = job
+            return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self._lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self.jobs.values()]
+        return {
+            "workers": len(self._workers),
+            "queue_size": self._queue.maxsize,
+            **{status: statuses.count(status) for status in ("queued", "running", "done", "failed")},
+        }
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+            return dict(self.jobs[job_id])
+
+    def _prune(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job["status"] in ("done", "failed")]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            job = self._update(job_id, status="running", started_at=time.time())
+            try:
+                result = self.handler(job)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            else:
+                self._update(job_id, status="done", result=result, finished_at=time.time())
+            self._prune()
+
+    def close(self):
+        """Lets the workers finish their current jobs and stop."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+
+class ScoringService:
+    """
+    Runs scoring jobs against clients and a cache that live as long as the
+    process, so each job pays only for its own analysis and rendering.
+
+    `analyze` and `synthesize` default to the Gemini backends and can be
+    replaced with stubs that take the same arguments. Each job's directory
+    is leased from the `workspace` while the job runs, and only its outputs
+    are kept once it finishes. Analyses are recorded in the `results`
+    store, if one is given, under the request's "event" and "skater".
+    """
+
+    def __init__(self, cache=None, temp_dir="temp", analyze=analyze_video_cached, synthesize=synthesize_speech,
+                 stream_threshold_mb=GCS_STREAM_THRESHOLD_MB, workspace=None, results=None):
+        self.cache = cache
+        self.workspace = workspace or Workspace(temp_dir, exclude=[cache.cache_dir] if cache else ())
+        self.jobs_dir = os.path.join(temp_dir, "jobs")
+        self.analyze = analyze
+        self.synthesize = synthesize
+        self.stream_threshold_mb = stream_threshold_mb
+        self.results = results
+
+    def warm_up(self):
+        """Creates the shared Gemini and storage clients before the first job arrives."""
+        for name, get_client in (("Gemini", get_gemini_client), ("GCS", get_gcs_client)):
+            try:
+                get_client()
+                print(f"{name} client ready.")
+            except Exception as e:
+                print(f"{name} client not available: {e}")
+
+    def run(self, job):
+        request = job["request"]
+        source = request["source"]
+        mode = request.get("mode", "analyze")
+        work_dir = os.path.join(self.jobs_dir, job["id"])
+        video_name = os.path.splitext(os.path.basename(source))[0]
+        self.workspace.enforce_quota()
+        self.workspace.acquire(work_dir)
+
+        downloaded = False
+        streamed = False
+        try:
+            if source.startswith("gs://"):
+                local_video_path, streamed = resolve_video_source(
+                    source, os.path.join(work_dir, os.path.basename(source)), self.stream_threshold_mb
+                )
+                downloaded = not streamed
+            elif os.path.isfile(source):
+                local_video_path = source
+            else:
+                raise ValueError(f"Video not found: {source}")
+
+            if streamed:
+                analysis_result = analyze_gcs_stream(
+                    source,
+                    local_video_path,
+                    work_dir,
+                    self.cache,
+                    self.analyze,
+                    motion_trim=request.get("motion_trim", False),
+                    use_proxy=request.get("proxy", True),
+                )
+            else:
+                analysis_result = analyze_with_proxy(
+                    local_video_path,
+                    work_dir,
+                    self.cache,
+                    self.analyze,
+                    motion_trim=request.get("motion_trim", False),
+                    use_proxy=request.get("proxy", True),
+                )
+            result = {"analysis_path": os.path.join(work_dir, f"{video_name}_analysis.json")}
+            with open(result["analysis_path"], 'w') as f:
+                f.write(analysis_result)
+            if self.results is not None:
+                try:
+                    self.results.add_run(
+                        video_name,
+                        analysis_result,
+                        skater=request.get("skater"),
+                        event=request.get("event", ""),
+                        source=source,
+                    )
+                except ValueError as e:
+                    print(f"Could not record {source}: {e}")
+
+            # Render segments of a streamed source are keyed by its GCS MD5
+            source_digest = gcs_content_digest(source) if streamed and mode != "analyze" else None
+            if mode == "commentary":
+                result["output_path"] = os.path.join(work_dir, f"{video_name}_commentary.mp4")
+                create_commentary_video(
+                    local_video_path,
+                    analysis_result,
+                    result["output_path"],
+                    work_dir,
+                    synthesize=self.synthesize,
+                    cache=self.cache,
+                    profile=request.get("profile"),
+                    scoreboard=request.get("scoreboard", False),
+                    source_digest=source_digest,
+                )
+            elif mode == "score-overlay":
+                result["output_path"] = os.path.join(work_dir, f"{video_name}_score_overlay.mp4")
+                add_score_overlay(
+                    local_video_path,
+                    analysis_result,
+                    result["output_path"],
+                    profile=request.get("profile"),
+                    cache=self.cache,
+                    scoreboard=request.get("scoreboard", False),
+                    temp_dir=work_dir,
+                    source_digest=source_digest,
+                )
+
+            if "output_path" in result:
+                if not os.path.exists(result["output_path"]):
+                    raise ValueError(f"Rendering produced no output for {source}")
+                if request.get("upload"):
+                    result["output_uri"] = upload_to_gcs(result["output_path"], "output")
+            return result
+        finally:
+            # Only the job's outputs are kept; the source copy can be large
+            if downloaded and os.path.exists(local_video_path):
+                os.remove(local_video_path)
+            self.workspace.release(work_dir)
+
+
+def validate_job_request(request):
+    """Raises ValueError unless `request` is a job the service can run."""
+    if not isinstance(request, dict) or not isinstance(request.get("source"), str):
+        raise ValueError("Job must be a JSON object with a 'source' path or gs:// URI.")
+    if request.get("mode", "analyze") not in JOB_MODES:
+        raise ValueError(f"Unknown mode {request['mode']!r}; expected one of {', '.join(JOB_MODES)}.")
+    get_render_profile(request.get("profile"))
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API over the server's `jobs` queue:
+
+        POST /jobs                {"source": ..., "mode": ..., "profile": ..., "motion_trim": false, "proxy": true,
+                                   "scoreboard": false, "upload": false, "event": "", "skater": null}
+        GET  /jobs                all known jobs
+        GET  /jobs/<id>           status of one job
+        GET  /jobs/<id>/analysis  the analysis JSON of a finished job
+        GET  /healthz             worker and queue counts
+        GET  /metrics             per-stage Prometheus metrics
+    """
+
+    def _send_json(self, status, body, headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            validate_job_request(request)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        job = self.server.jobs.submit(request)
+        if job is None:
+            self._send_json(503, {"error": "Job queue is full, retry later."}, {"Retry-After": "5"})
+            return
+        self._send_json(202, job, {"Location": f"/jobs/{job['id']}"})
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("/") if part]
+        if parts == ["healthz"]:
+            self._send_json(200, self.server.jobs.stats())
+        elif parts == ["metrics"]:
+            data = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif parts == ["jobs"]:
+            self._send_json(200, self.server.jobs.list())
+        elif len(parts) in (2, 3) and parts[0] == "jobs" and parts[2:] in ([], ["analysis"]):
+            job = self.server.jobs.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": f"Unknown job {parts[1]}"})
+            elif len(parts) == 2:
+                self._send_json(200, job)
+            elif job["status"] != "done":
+                self._send_json(409, {"error": f"Job is {job['status']}"})
+            else:
+                with open(job["result"]["analysis_path"], 'rb') as f:
+                    self._send_json(200, f.read())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def log_message(self, format, *args):
+        # Job progress is already printed by the workers
+        pass
+
+
+def create_server(service, host="127.0.0.1", port=8080, workers=SERVICE_WORKERS, queue_size=SERVICE_QUEUE_SIZE):
+    """Binds the HTTP server and starts the job workers; call `serve_forever()` to handle requests."""
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.jobs = JobQueue(service.run, workers, queue_size)
+    return server
+
+
+def serve(service, host="127.0.0.1", port=8080, workers=SERVICE_WORKERS, queue_size=SERVICE_QUEUE_SIZE):
+    """Runs the scoring service until interrupted."""
+    service.warm_up()
+    server = create_server(service, host, port, workers, queue_size)
+    print(f"Scoring service listening on http://{host}:{server.server_address[1]} "
+          f"with {workers} workers and a queue of {queue_size}.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down after the queued jobs finish...")
+    finally:
+        server.server_close()
+        server.jobs.close()
@@ -0,0 +1,36 @@
+import json
+import subprocess
+import pytest
+
+
+@pytest.fixture
+def analysis_json():
+    """Builds an analysis JSON from `(trick_name, start, end, score)` tuples; the last one carries `final`."""
+
+    def build(tricks, final=None):
+        entries = [
+            {
+                "trick_name": name,
+                "time_stamp_start": start,
+                "time_stamp_end": end,
+                "description": f"{name} description.",
+                "trick_score": score,
+                "previous_tricks": "",
+                "final_run_score": 0.0,
+                "commentary": f"{name} commentary.",
+            }
+            for name, start, end, score in tricks
+        ]
+        if entries:
+            entries[-1]["final_run_score"] = final if final is not None else entries[-1]["trick_score"]
+        return json.dumps(entries)
+
+    return build
+
+
+@pytest.fixture
+def dead_pid():
+    """The pid of a process that has exited."""
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import ffmpeg
+import pytest
+import segment_render
+from batch import run_batch
+from bench.synthetic import make_test_clip
+from workspace import Workspace
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+
+@pytest.fixture
+def no_concat(monkeypatch):
+    """Writes an empty output for the final join instead of running it; the render processes are forked."""
+    run_ffmpeg = segment_render.run_ffmpeg
+
+    def fake_run_ffmpeg(stream, name, **kwargs):
+        if name != "ffmpeg.concat":
+            return run_ffmpeg(stream, name, **kwargs)
+        open(ffmpeg.compile(stream)[-1], 'wb').close()
+
+    monkeypatch.setattr(segment_render, "run_ffmpeg", fake_run_ffmpeg)
+
+
+def test_quota_does_not_evict_outputs_before_their_upload(tmp_path, analysis_json, no_concat):
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    make_test_clip(str(videos / "run_1.mp4"), duration=4, size="320x240")
+    temp_dir = str(tmp_path / "temp")
+    workspace = Workspace(temp_dir, quota_bytes=1)
+    uploaded = []
+
+    def analyze(path, cache=None, content_digest=None, mime_type=None, prompt_hints=None):
+        return analysis_json([("Ollie", "00:01", "00:02", 70)])
+
+    def upload(local_path, gcs_folder):
+        # Another run's download making room evicts everything no live process owns
+        workspace.enforce_quota(needed=10**12)
+        assert os.path.exists(local_path)
+        uploaded.append(local_path)
+        return f"gs://bucket/{gcs_folder}/{os.path.basename(local_path)}"
+
+    runs = run_batch(
+        str(videos), mode="score-overlay", temp_dir=temp_dir, render_workers=1, workspace=workspace,
+        analyze=analyze, upload=upload,
+    )
+    run = runs[str(videos / "run_1.mp4")]
+    assert run["status"] == "done"
+    assert run["output_uri"] == "gs://bucket/output/run_1_score_overlay.mp4"
+    assert len(uploaded) == 1
+    assert os.path.exists(os.path.join(temp_dir, "run_1_score_overlay.mp4"))
+    assert not os.path.exists(os.path.join(temp_dir, "batch", "run_1"))
+    with open(os.path.join(temp_dir, "batch_manifest.json"), 'r') as f:
+        assert json.load(f)["runs"] == runs
+
+    # A resumed batch finds the moved output and does not upload it again
+    run_batch(
+        str(videos), mode="score-overlay", temp_dir=temp_dir, render_workers=1, workspace=workspace,
+        analyze=analyze, upload=upload,
+    )
+    assert len(uploaded) == 1
@@ -0,0 +1,72 @@
+import hashlib
+import os
+from cache_utils import ContentCache, content_key, file_digest
+
+
+def test_content_key_is_stable_and_order_sensitive():
+    assert content_key("a", 1, {"x": 1, "y": 2}) == content_key("a", 1, {"y": 2, "x": 1})
+    assert content_key("a", "b") != content_key("b", "a")
+    assert len(content_key("a")) == 64
+
+
+def test_file_digest_is_md5_of_contents(tmp_path):
+    path = tmp_path / "clip.bin"
+    path.write_bytes(b"x" * 3_000_000)
+    assert file_digest(str(path), chunk_size=1024) == hashlib.md5(b"x" * 3_000_000).hexdigest()
+
+
+def test_put_and_get_records_hits_and_misses(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    key = content_key("analysis", "abc")
+    assert cache.get_text("analysis", key, ".json") is None
+    path = cache.put_text("analysis", key, "[]", ".json")
+    assert path == os.path.join(str(tmp_path / "cache"), "analysis", key[:2], f"{key}.json")
+    assert cache.get_text("analysis", key, ".json") == "[]"
+    assert cache.stats == {"analysis": {"hits": 1, "misses": 1}}
+
+
+def test_put_file_moves_or_copies(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    source = tmp_path / "segment.ts"
+    source.write_bytes(b"video")
+    copied = cache.put_file("segments", content_key("copy"), str(source), ".ts")
+    assert source.exists()
+    moved = cache.put_file("segments", content_key("move"), str(source), ".ts", move=True)
+    assert not source.exists()
+    assert open(copied, 'rb').read() == open(moved, 'rb').read() == b"video"
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"), max_bytes=250)
+    paths = {}
+    for i, name in enumerate(["old", "used", "new"]):
+        paths[name] = cache.put_bytes("tts", content_key(name), b"x" * 100, ".pcm")
+        os.utime(paths[name], (1000 + i, 1000 + i))
+    # A hit refreshes "used", leaving "old" the least recently used
+    assert cache.get_path("tts", content_key("used"), ".pcm") == paths["used"]
+    cache.put_bytes("tts", content_key("newest"), b"x" * 100, ".pcm")
+    assert not os.path.exists(paths["old"])
+    assert not os.path.exists(paths["new"])
+    assert os.path.exists(paths["used"])
+    assert cache.get_path("tts", content_key("newest"), ".pcm") is not None
+
+
+def test_size_survives_reopening(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"))
+    cache.put_bytes("tts", content_key("a"), b"x" * 100)
+    assert ContentCache(str(tmp_path / "cache"))._size == 100
+
+
+def test_eviction_leaves_in_flight_writes(tmp_path):
+    cache = ContentCache(str(tmp_path / "cache"), max_bytes=150)
+    key = content_key("writing")
+    temp_path = cache.path_for("tts", key, ".pcm") + ".1234.tmp"
+    os.makedirs(os.path.dirname(temp_path))
+    with open(temp_path, 'wb') as f:
+        f.write(b"x" * 100)
+    os.utime(temp_path, (1000, 1000))
+    cache.put_bytes("tts", content_key("a"), b"x" * 100, ".pcm")
+    cache.put_bytes("tts", content_key("b"), b"x" * 100, ".pcm")
+    assert os.path.exists(temp_path)
+    assert cache.get_path("tts", content_key("a"), ".pcm") is None
+    assert cache.get_path("tts", content_key("b"), ".pcm") is not None
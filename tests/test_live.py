@@ -0,0 +1,19 @@
+from live import LiveScorer
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+def test_window_without_chunks_is_skipped(tmp_path):
+    scorer = LiveScorer(str(tmp_path / "live"))
+    # Only a chunk that ended before the window opened is left
+    scorer.chunks = [(str(tmp_path / "live" / "chunk_0000.ts"), 0.0, 2.0)]
+    executor = RecordingExecutor()
+    scorer._submit(executor, (5.0, 9.0))
+    assert executor.submitted == []
+    assert not list((tmp_path / "live").glob("window_*"))
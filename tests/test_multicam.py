@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from multicam import audio_offset
+
+
+@pytest.mark.parametrize("offset_seconds", [1.25, -0.5, 0.0])
+def test_audio_offset_finds_the_shift(offset_seconds):
+    rate = 1000
+    rng = np.random.default_rng(0)
+    signal = rng.standard_normal(rate * 10).astype(np.float32)
+    shift = int(offset_seconds * rate)
+    # `other` starts `offset_seconds` into `reference`
+    reference, other = (signal, signal[shift:]) if shift >= 0 else (signal[-shift:], signal)
+    offset, confidence = audio_offset(reference, other, rate=rate, max_offset=5)
+    assert offset == pytest.approx(offset_seconds, abs=1 / rate)
+    assert confidence > 0.5
+
+
+def test_audio_offset_ignores_shifts_beyond_max_offset():
+    rate = 1000
+    signal = np.random.default_rng(1).standard_normal(rate * 10).astype(np.float32)
+    offset, _ = audio_offset(signal, signal[3 * rate:], rate=rate, max_offset=2)
+    assert abs(offset) <= 2
@@ -0,0 +1,81 @@
+import pytest
+from results_store import ResultsStore, run_name, skater_name, trick_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    yield store
+    store.close()
+
+
+def test_names():
+    assert run_name("temp/tony_hawk_2_analysis.json") == "tony_hawk_2"
+    assert skater_name("tony_hawk_2") == "Tony Hawk"
+    assert trick_key("  Backside-540 ") == "backside 540"
+
+
+def test_top_runs_orders_by_final_score_and_filters(store, analysis_json):
+    store.add_run("tony_hawk_1", analysis_json([("900", "00:01", "00:04", 95)], final=92), event="finals")
+    store.add_run("shaun_white_1", analysis_json([("McTwist", "00:01", "00:04", 80)], final=81), event="finals")
+    store.add_run("tony_hawk_2", analysis_json([("Ollie", "00:01", "00:02", 60)], final=60), event="heats")
+    assert [run["run"] for run in store.top_runs(event="finals")] == ["tony_hawk_1", "shaun_white_1"]
+    assert [run["run"] for run in store.top_runs(skater="Tony Hawk")] == ["tony_hawk_1", "tony_hawk_2"]
+    assert store.top_runs(1)[0]["final_score"] == 92
+    assert store.events() == [
+        {"event": "finals", "runs": 2, "best_score": 92.0},
+        {"event": "heats", "runs": 1, "best_score": 60.0},
+    ]
+
+
+def test_find_tricks_matches_prefixes_above_a_strict_score(store, analysis_json):
+    store.add_run("run_1", analysis_json([
+        ("McTwist", "00:01", "00:03", 80), ("McTwist 540", "00:05", "00:07", 88), ("Ollie", "00:09", "00:10", 90),
+    ]))
+    tricks = store.find_tricks("mctwist", score_above=80)
+    assert [(trick["trick_name"], trick["score"]) for trick in tricks] == [("McTwist 540", 88.0)]
+    assert len(store.find_tricks("McTwist")) == 2
+    assert [trick["trick_name"] for trick in store.find_tricks(limit=1)] == ["Ollie"]
+
+
+def test_stats(store, analysis_json):
+    store.add_run("tony_hawk_1", analysis_json([("900", "00:01", "00:04", 95), ("Ollie", "00:05", "00:06", 60)]))
+    store.add_run("tony_hawk_2", analysis_json([("900", "00:01", "00:04", 85)]))
+    assert store.trick_stats()[0] == {"trick_name": "900", "count": 2, "average_score": 90.0, "best_score": 95.0}
+    assert store.skater_stats() == [{"skater": "Tony Hawk", "runs": 2, "best_score": 85.0, "average_score": 72.5}]
+
+
+def test_re_adding_a_run_replaces_it(store, analysis_json):
+    store.add_run("run_1", analysis_json([("Ollie", "00:01", "00:02", 60)]), event="heats")
+    store.add_run("run_1", analysis_json([("900", "00:01", "00:04", 95)]), event="heats")
+    assert [run["final_score"] for run in store.top_runs()] == [95.0]
+    assert [trick["trick_name"] for trick in store.find_tricks()] == ["900"]
+
+
+def test_add_run_rejects_malformed_analysis(store):
+    with pytest.raises(ValueError):
+        store.add_run("run_1", "not json")
+
+
+def test_import_files_skips_malformed_analyses(store, tmp_path, analysis_json):
+    (tmp_path / "tony_hawk_1_analysis.json").write_text(analysis_json([("900", "00:01", "00:04", 95)]))
+    (tmp_path / "broken_analysis.json").write_text("not json")
+    assert store.import_files([str(tmp_path)], event="finals") == (1, 1)
+    assert store.top_runs()[0]["run"] == "tony_hawk_1"
+
+
+def test_import_files_names_runs_by_path_below_the_root(store, tmp_path, analysis_json):
+    for heat, score in (("a", 70), ("b", 80)):
+        (tmp_path / heat).mkdir()
+        (tmp_path / heat / "tony_hawk_1_analysis.json").write_text(analysis_json([("Ollie", "00:01", "00:02", score)]))
+    assert store.import_files([str(tmp_path / "**" / "*_analysis.json")], event="finals") == (2, 0)
+    runs = store.top_runs()
+    assert [(run["run"], run["skater"]) for run in runs] == [("b__tony_hawk_1", "Tony Hawk"), ("a__tony_hawk_1", "Tony Hawk")]
+
+
+def test_import_files_reports_colliding_runs(store, tmp_path, analysis_json):
+    for heat, score in (("a", 70), ("b", 80)):
+        (tmp_path / heat).mkdir()
+        (tmp_path / heat / "run_1_analysis.json").write_text(analysis_json([("Ollie", "00:01", "00:02", score)]))
+    assert store.import_files([str(tmp_path / "a"), str(tmp_path / "b")]) == (1, 1)
+    assert [run["final_score"] for run in store.top_runs()] == [70.0]
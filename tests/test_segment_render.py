@@ -0,0 +1,92 @@
+import http.server
+import os
+import shutil
+import threading
+import ffmpeg
+import pytest
+import segment_render
+from bench.synthetic import make_test_clip
+from cache_utils import ContentCache, file_digest
+from segment_render import Segment, render_segments
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+
+@pytest.fixture
+def clip(tmp_path):
+    return make_test_clip(str(tmp_path / "run_1.mp4"), duration=4, size="320x240")
+
+
+@pytest.fixture
+def clip_url(clip):
+    """Serves the clip over HTTP with range requests, like a signed GCS URL."""
+    with open(clip, 'rb') as f:
+        data = f.read()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            start, end = 0, len(data) - 1
+            if self.headers.get("Range"):
+                first, _, last = self.headers["Range"].split("=", 1)[1].partition("-")
+                start, end = int(first), int(last) if last else end
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            else:
+                self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            self.wfile.write(data[start:end + 1])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/run_1.mp4"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def concats(monkeypatch):
+    """Records the final join instead of running it; only the segments are rendered."""
+    joined = []
+    run_ffmpeg = segment_render.run_ffmpeg
+
+    def fake_run_ffmpeg(stream, name, **kwargs):
+        if name != "ffmpeg.concat":
+            return run_ffmpeg(stream, name, **kwargs)
+        output_path = ffmpeg.compile(stream)[-1]
+        open(output_path, 'wb').close()
+        joined.append(output_path)
+
+    monkeypatch.setattr(segment_render, "run_ffmpeg", fake_run_ffmpeg)
+    return joined
+
+
+def _pieces():
+    return [Segment(0.0, overlays=[(["Final Score: 90"], 2.5, 4.0)])]
+
+
+def test_url_source_renders_without_caching_segments(tmp_path, clip_url, concats):
+    cache = ContentCache(str(tmp_path / "cache"))
+    output = str(tmp_path / "out.mp4")
+    assert render_segments(clip_url, _pieces(), output, cache=cache, work_dir=str(tmp_path))
+    assert concats == [output]
+    assert not os.path.isdir(os.path.join(cache.cache_dir, "segments"))
+
+
+def test_url_source_with_digest_caches_segments(tmp_path, clip, clip_url, concats):
+    cache = ContentCache(str(tmp_path / "cache"))
+    digest = file_digest(clip)
+    for i in range(2):
+        assert render_segments(
+            clip_url, _pieces(), str(tmp_path / f"out_{i}.mp4"), cache=cache, source_digest=digest,
+            work_dir=str(tmp_path),
+        )
+    # The local file is keyed by the same digest, so it reuses the URL's segments too
+    assert render_segments(clip, _pieces(), str(tmp_path / "out_local.mp4"), cache=cache, work_dir=str(tmp_path))
+    misses = cache.stats["segments"]["misses"]
+    assert misses > 0
+    assert cache.stats["segments"]["hits"] == 2 * misses
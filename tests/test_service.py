@@ -0,0 +1,70 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from service import JobQueue, create_server
+
+
+class BlockingService:
+    """Stands in for ScoringService: every job waits until `release` is set."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def run(self, job):
+        self.started.set()
+        self.release.wait(timeout=10)
+        return {"source": job["request"]["source"]}
+
+
+def test_job_queue_rejects_jobs_beyond_its_size():
+    service = BlockingService()
+    jobs = JobQueue(service.run, workers=1, queue_size=1)
+    try:
+        running = jobs.submit({"source": "run_1.mp4"})
+        assert service.started.wait(timeout=5)
+        queued = jobs.submit({"source": "run_2.mp4"})
+        assert running and queued
+        assert jobs.submit({"source": "run_3.mp4"}) is None
+        assert jobs.stats()["running"] == 1 and jobs.stats()["queued"] == 1
+    finally:
+        service.release.set()
+        jobs.close()
+    assert [job["status"] for job in jobs.list()] == ["done", "done"]
+
+
+def _post(port, body):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/jobs", data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    return urllib.request.urlopen(request, timeout=5)
+
+
+def test_post_jobs_returns_503_when_the_queue_is_full():
+    service = BlockingService()
+    server = create_server(service, port=0, workers=1, queue_size=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    try:
+        with _post(port, {"source": "run_1.mp4"}) as response:
+            assert response.status == 202
+            assert response.headers["Location"].startswith("/jobs/")
+        assert service.started.wait(timeout=5)
+        with _post(port, {"source": "run_2.mp4"}) as response:
+            assert response.status == 202
+        with pytest.raises(urllib.error.HTTPError) as rejected:
+            _post(port, {"source": "run_3.mp4"})
+        assert rejected.value.code == 503
+        assert rejected.value.headers["Retry-After"] == "5"
+        with pytest.raises(urllib.error.HTTPError) as invalid:
+            _post(port, {"mode": "analyze"})
+        assert invalid.value.code == 400
+    finally:
+        service.release.set()
+        server.shutdown()
+        server.server_close()
+        server.jobs.close()
@@ -0,0 +1,61 @@
+import pytest
+from timeline import Timeline, format_timestamp, load_timeline, parse_timestamp
+
+
+@pytest.mark.parametrize(
+    "time_stamp, seconds",
+    [("7", 7.0), ("01:02", 62.0), ("01:02.5", 62.5), ("01:00:03", 3603.0), (" 00:04 ", 4.0), (12, 12.0)],
+)
+def test_parse_timestamp(time_stamp, seconds):
+    assert parse_timestamp(time_stamp) == seconds
+
+
+@pytest.mark.parametrize("time_stamp", ["", "abc", "1:2:3:4", "01:xx"])
+def test_parse_timestamp_rejects_malformed(time_stamp):
+    with pytest.raises(ValueError):
+        parse_timestamp(time_stamp)
+
+
+@pytest.mark.parametrize("seconds, time_stamp", [(62, "01:02"), (62.5, "01:02.5"), (3603, "01:00:03"), (0, "00:00")])
+def test_format_timestamp_round_trips(seconds, time_stamp):
+    assert format_timestamp(seconds) == time_stamp
+    assert parse_timestamp(format_timestamp(seconds)) == seconds
+
+
+def test_timeline_orders_tricks_by_start(analysis_json):
+    timeline = Timeline.from_json(
+        analysis_json([("Ollie", "00:02", "00:03.5", 70), ("McTwist", "00:20", "00:24", 90)], final=85)
+    )
+    assert [trick.trick_name for trick in timeline.tricks] == ["Ollie", "McTwist"]
+    assert list(timeline.starts) == [2.0, 20.0]
+    assert list(timeline.ends) == [3.5, 24.0]
+    assert list(timeline.scores) == [70.0, 90.0]
+    assert len(timeline) == 2
+    assert timeline.final_score == 85
+
+
+def test_trick_at_and_windows(analysis_json):
+    timeline = Timeline.from_json(analysis_json([("Ollie", "00:02", "00:04", 70), ("900", "00:10", "00:15", 95)]))
+    assert timeline.trick_at(3) == 0
+    assert timeline.trick_at(4) == 0
+    assert timeline.trick_at(5) is None
+    assert timeline.trick_at(1) is None
+    assert timeline.trick_at(12) == 1
+    assert timeline.windows(padding=3) == [(0.0, 7.0), (7.0, 18.0)]
+
+
+@pytest.mark.parametrize("analysis", ["not json", "[1]", '[{"trick_name": "Ollie"}]'])
+def test_from_json_rejects_malformed_analysis(analysis):
+    with pytest.raises(ValueError):
+        Timeline.from_json(analysis)
+
+
+def test_from_json_rejects_trick_ending_before_it_starts(analysis_json):
+    with pytest.raises(ValueError, match="before it starts"):
+        Timeline.from_json(analysis_json([("Ollie", "00:05", "00:04", 70)]))
+
+
+def test_load_timeline_passes_timelines_through(analysis_json):
+    timeline = Timeline.from_json(analysis_json([("Ollie", "00:01", "00:02", 70)]))
+    assert load_timeline(timeline) is timeline
+    assert load_timeline(analysis_json([("Ollie", "00:01", "00:02", 70)])).final_score == 70
@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+from google.genai import types
+import video_analysis
+
+
+class StubFiles:
+    def __init__(self):
+        self.deleted = []
+
+    async def upload(self, file, config=None):
+        return SimpleNamespace(name="files/stub", state=types.FileState.ACTIVE)
+
+    async def get(self, name):
+        return SimpleNamespace(name=name, state=types.FileState.ACTIVE)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+class StubModels:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_content(self, model, contents, config=None):
+        self.prompts.append(contents[0])
+        return SimpleNamespace(text="[]")
+
+
+def test_async_analysis_sends_the_prompt_hints(tmp_path):
+    client = SimpleNamespace(aio=SimpleNamespace(files=StubFiles(), models=StubModels()))
+    path = tmp_path / "run_1.mp4"
+    path.write_bytes(b"video")
+    results = asyncio.run(
+        video_analysis.analyze_videos_async([str(path)] * 2, client=client, prompt_hints="Idle stretches were cut.")
+    )
+    assert [result for result, _ in results] == ["[]", "[]"]
+    # The same prompt the sync path sends, so both share analysis cache keys
+    assert client.aio.models.prompts == [video_analysis._analysis_prompt("Idle stretches were cut.")] * 2
+    assert "Idle stretches were cut." in client.aio.models.prompts[0]
+    assert client.aio.files.deleted == ["files/stub"] * 2
@@ -0,0 +1,81 @@
+import json
+import os
+import socket
+import time
+import pytest
+from workspace import OWNER_FILE, Workspace
+
+
+def _write(path, size, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b"x" * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_job_directory_is_removed_even_on_error(tmp_path):
+    workspace = Workspace(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        with workspace.job("render") as path:
+            _write(os.path.join(path, "segment.ts"), 10)
+            raise RuntimeError("render failed")
+    assert not os.path.exists(path)
+    assert os.listdir(workspace.jobs_dir) == []
+
+
+def test_lease_marks_owner_and_keeps_contents(tmp_path):
+    workspace = Workspace(str(tmp_path))
+    run_dir = str(tmp_path / "batch" / "run_1")
+    with workspace.lease(run_dir):
+        with open(os.path.join(run_dir, OWNER_FILE), 'r') as f:
+            owner = json.load(f)
+        assert owner["pid"] == os.getpid()
+        assert owner["host"] == socket.gethostname()
+        _write(os.path.join(run_dir, "run_1.mp4"), 10)
+    assert not os.path.exists(os.path.join(run_dir, OWNER_FILE))
+    assert os.path.exists(os.path.join(run_dir, "run_1.mp4"))
+
+
+def test_quota_evicts_oldest_unowned_files(tmp_path):
+    workspace = Workspace(str(tmp_path), quota_bytes=550)
+    old = _write(str(tmp_path / "old.mp4"), 100, mtime=1000)
+    analysis = _write(str(tmp_path / "old_analysis.json"), 100, mtime=900)
+    newer = _write(str(tmp_path / "newer.mp4"), 100, mtime=2000)
+    leased_dir = str(tmp_path / "batch" / "run_1")
+    workspace.acquire(leased_dir)
+    leased = _write(os.path.join(leased_dir, "run_1.mp4"), 100, mtime=500)
+
+    workspace.enforce_quota(needed=100)
+    assert not os.path.exists(old)
+    assert os.path.exists(analysis)
+    assert os.path.exists(newer)
+    assert os.path.exists(leased)
+
+
+def test_quota_is_disabled_at_zero(tmp_path):
+    path = _write(str(tmp_path / "big.mp4"), 1000)
+    Workspace(str(tmp_path), quota_bytes=0).enforce_quota(needed=10**9)
+    assert os.path.exists(path)
+
+
+def test_sweep_orphans_removes_dead_jobs_and_stale_intermediates(tmp_path, dead_pid):
+    workspace = Workspace(str(tmp_path), orphan_seconds=60)
+    dead_job = os.path.join(workspace.jobs_dir, "render-dead")
+    os.makedirs(dead_job)
+    with open(os.path.join(dead_job, OWNER_FILE), 'w') as f:
+        json.dump({"pid": dead_pid, "host": socket.gethostname(), "started": time.time()}, f)
+    _write(os.path.join(dead_job, "segment.ts"), 10)
+    stale = time.time() - 3600
+    stale_tmp = _write(str(tmp_path / "cache" / "tts" / "ab" / "key.pcm.1234.tmp"), 10, mtime=stale)
+    fresh_tmp = _write(str(tmp_path / "cache" / "tts" / "ab" / "key.pcm.5678.tmp"), 10)
+    output = _write(str(tmp_path / "run_1_commentary.mp4"), 10, mtime=stale)
+
+    with workspace.job("live") as live_job:
+        assert workspace.sweep_orphans() > 0
+        assert os.path.exists(live_job)
+    assert not os.path.exists(dead_job)
+    assert not os.path.exists(stale_tmp)
+    assert os.path.exists(fresh_tmp)
+    assert os.path.exists(output)
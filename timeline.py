@@ -0,0 +1,97 @@
+import json
+from array import array
+from bisect import bisect_right
+from pydantic import ValidationError
+from video_analysis import Trick
+
+
+def parse_timestamp(time_stamp):
+    """
+    Converts an `SS`, `MM:SS` or `HH:MM:SS` timestamp to seconds. The seconds
+    may be fractional, e.g. `01:02.5`.
+    """
+    if isinstance(time_stamp, (int, float)):
+        return float(time_stamp)
+    parts = time_stamp.strip().split(':')
+    try:
+        if len(parts) == 1:
+            seconds = float(parts[0])
+        elif len(parts) == 2:
+            seconds = int(parts[0]) * 60 + float(parts[1])
+        elif len(parts) == 3:
+            seconds = int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
+        else:
+            seconds = -1.0
+    except ValueError:
+        seconds = -1.0
+    if not seconds >= 0:
+        raise ValueError(f"Invalid timestamp format: {time_stamp}")
+    return seconds
+
+
+def format_timestamp(seconds):
+    """Formats seconds as `MM:SS` or `HH:MM:SS`, keeping up to two decimal places when fractional."""
+    seconds = round(seconds, 2)
+    hours, rest = divmod(seconds, 3600)
+    minutes, rest = divmod(rest, 60)
+    whole = f"{int(rest):02}" if rest == int(rest) else f"{rest:05.2f}".rstrip("0")
+    if hours:
+        return f"{int(hours):02}:{int(minutes):02}:{whole}"
+    return f"{int(minutes):02}:{whole}"
+
+
+class Timeline:
+    """
+    The tricks of one analysis, validated once and ordered by start time.
+
+    Start and end seconds and scores are kept in parallel `array`s, so
+    renderers and exporters share one parsed copy and lookups by time are a
+    binary search. `tricks` keeps the `Trick` models for names and commentary.
+    """
+
+    def __init__(self, tricks):
+        spans = sorted(
+            ((parse_timestamp(trick.time_stamp_start), parse_timestamp(trick.time_stamp_end), trick) for trick in tricks),
+            key=lambda span: span[0],
+        )
+        for start, end, trick in spans:
+            if end < start:
+                raise ValueError(f"Trick '{trick.trick_name}' ends at {end}s, before it starts at {start}s.")
+        self.tricks = [trick for _, _, trick in spans]
+        self.starts = array("d", (start for start, _, _ in spans))
+        self.ends = array("d", (end for _, end, _ in spans))
+        self.scores = array("d", (trick.trick_score for trick in self.tricks))
+
+    @classmethod
+    def from_json(cls, analysis_json):
+        """Parses and validates an analysis JSON. Raises ValueError if it is malformed."""
+        try:
+            return cls([Trick(**trick) for trick in json.loads(analysis_json)])
+        except (TypeError, ValidationError) as e:
+            raise ValueError(f"Invalid analysis JSON: {e}") from e
+
+    def __len__(self):
+        return len(self.tricks)
+
+    @property
+    def final_score(self):
+        """The run score reported with the last trick."""
+        return self.tricks[-1].final_run_score
+
+    def trick_at(self, t):
+        """Returns the index of the latest-starting trick in progress at `t` seconds, or None."""
+        i = bisect_right(self.starts, t) - 1
+        if i >= 0 and t <= self.ends[i]:
+            return i
+        return None
+
+    def windows(self, padding=0.0):
+        """Returns `(start, end)` seconds of each trick, padded on both sides."""
+        return [(max(0.0, start - padding), end + padding) for start, end in zip(self.starts, self.ends)]
+
+
+def load_timeline(analysis):
+    """Returns `analysis` if it is already a `Timeline`, otherwise parses it as analysis JSON."""
+    if isinstance(analysis, Timeline):
+        return analysis
+    return Timeline.from_json(analysis)
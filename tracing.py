@@ -0,0 +1,241 @@
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import ffmpeg
+from dotenv import load_dotenv
+
+load_dotenv()
+# Stage records are appended to this JSON-lines file when set
+TRACE_FILE = os.getenv("TRACE_FILE")
+# Shared by worker processes so a run's records can be told apart in the file
+TRACE_RUN_ID = os.getenv("TRACE_RUN_ID") or uuid.uuid4().hex[:12]
+
+# Which resource a stage mostly waits on, for the summary
+STAGE_CATEGORIES = {
+    "download": "network",
+    "upload": "network",
+    "gemini.upload": "network",
+    "gemini.processing": "model",
+    "gemini.generation": "model",
+    "gemini.frames": "model",
+    "tts": "model",
+    "ffprobe": "encode",
+}
+
+_lock = threading.Lock()
+_totals = {}
+
+
+def configure(trace_path=None):
+    """
+    Starts writing stage records to `trace_path`. The path and run id are
+    exported to the environment so worker processes write to the same file.
+    """
+    global TRACE_FILE
+    if trace_path:
+        os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+        TRACE_FILE = trace_path
+        os.environ["TRACE_FILE"] = trace_path
+    os.environ["TRACE_RUN_ID"] = TRACE_RUN_ID
+
+
+def _peak_rss_bytes(usage):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def _add_to_totals(totals, record):
+    stage_totals = totals.setdefault(
+        record["stage"], {"count": 0, "wall": 0.0, "cpu": 0.0, "bytes": 0, "peak_rss": 0, "errors": 0}
+    )
+    stage_totals["count"] += 1
+    stage_totals["wall"] += record["wall"]
+    stage_totals["cpu"] += record.get("cpu", 0.0)
+    stage_totals["bytes"] += record.get("bytes", 0)
+    stage_totals["peak_rss"] = max(stage_totals["peak_rss"], record.get("peak_rss", 0))
+    stage_totals["errors"] += "error" in record
+
+
+def _record(record):
+    with _lock:
+        _add_to_totals(_totals, record)
+        if TRACE_FILE:
+            with open(TRACE_FILE, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+@contextlib.contextmanager
+def stage(name, **attrs):
+    """
+    Times a pipeline stage and records it with `attrs`.
+
+    Yields the record so the stage can add `bytes` it moved, or `cpu` and
+    `peak_rss` of a subprocess. Otherwise `cpu` is the calling thread's CPU
+    time and `peak_rss` the high-water mark of this process.
+    """
+    record = {"stage": name, **attrs}
+    started_at = time.time()
+    started = time.perf_counter()
+    cpu_started = time.thread_time()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record.setdefault("cpu", time.thread_time() - cpu_started)
+        record.setdefault("peak_rss", _peak_rss_bytes(resource.getrusage(resource.RUSAGE_SELF)))
+        record.update(run=TRACE_RUN_ID, pid=os.getpid(), start=started_at, wall=time.perf_counter() - started)
+        _record(record)
+
+
+def _write_stdin(stdin, data):
+    try:
+        stdin.write(data)
+    except BrokenPipeError:
+        # ffmpeg exited early; its status reports why
+        pass
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def run_ffmpeg(stream, name, quiet=False, input=None, **attrs):  # pylint: disable=redefined-builtin
+    """
+    Runs an ffmpeg-python stream like `stream.run(overwrite_output=True)`,
+    recording the process's CPU time, peak RSS and output size as stage `name`.
+    `input` is written to ffmpeg's stdin, for `pipe:` inputs. Raises
+    `ffmpeg.Error` if ffmpeg fails.
+    """
+    args = ffmpeg.compile(stream, overwrite_output=True)
+    with stage(name, **attrs) as record:
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL if input is None else subprocess.PIPE,
+            stdout=subprocess.DEVNULL if quiet else None,
+            stderr=subprocess.PIPE if quiet else None,
+        )
+        stderr = []
+        reader = threading.Thread(target=lambda: stderr.append(process.stderr.read())) if quiet else None
+        if reader:
+            reader.start()
+        writer = None
+        if input is not None:
+            writer = threading.Thread(target=_write_stdin, args=(process.stdin, input))
+            writer.start()
+        if hasattr(os, "wait4"):
+            # Reaping the process ourselves gives its own resource usage
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            record["cpu"] = usage.ru_utime + usage.ru_stime
+            record["peak_rss"] = _peak_rss_bytes(usage)
+        else:
+            process.wait()
+        if reader:
+            reader.join()
+        if writer:
+            writer.join()
+        if os.path.isfile(args[-1]):
+            record["bytes"] = os.path.getsize(args[-1])
+        if process.returncode:
+            raise ffmpeg.Error("ffmpeg", None, stderr[0] if stderr else None)
+
+
+def _category(stage_name):
+    if stage_name.startswith("ffmpeg."):
+        return "encode"
+    return STAGE_CATEGORIES.get(stage_name, "other")
+
+
+def load_totals(trace_path, run_id=TRACE_RUN_ID):
+    """Aggregates one run's records from a trace file, including those written by worker processes."""
+    totals = {}
+    with open(trace_path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("run") == run_id:
+                _add_to_totals(totals, record)
+    return totals
+
+
+def get_totals():
+    """Per-stage totals recorded by this process."""
+    with _lock:
+        return {name: dict(totals) for name, totals in _totals.items()}
+
+
+def print_summary(totals=None):
+    """Prints per-stage totals and the busy time spent on network, model calls and encoding."""
+    if totals is None:
+        totals = load_totals(TRACE_FILE) if TRACE_FILE and os.path.exists(TRACE_FILE) else get_totals()
+    if not totals:
+        print("No stages were traced.")
+        return
+
+    print(f"\n{'stage':<20} {'count':>6} {'wall (s)':>9} {'mean (s)':>9} {'cpu (s)':>8} {'MB':>9} {'peak RSS (MB)':>14}")
+    categories = {}
+    for name, t in sorted(totals.items(), key=lambda item: -item[1]["wall"]):
+        print(
+            f"{name:<20} {t['count']:>6} {t['wall']:>9.2f} {t['wall'] / t['count']:>9.2f} {t['cpu']:>8.2f} "
+            f"{t['bytes'] / (1024 * 1024):>9.1f} {t['peak_rss'] / (1024 * 1024):>14.0f}"
+            + (f"  ({t['errors']} failed)" if t["errors"] else "")
+        )
+        categories[_category(name)] = categories.get(_category(name), 0.0) + t["wall"]
+
+    # Concurrent stages overlap, so busy time can exceed the elapsed time
+    busiest = max(categories, key=categories.get)
+    breakdown = ", ".join(f"{category} {seconds:.1f}s" for category, seconds in sorted(categories.items()))
+    print(f"Busy time: {breakdown}. Mostly {busiest}-bound.")
+
+
+def prometheus_text(totals=None):
+    """Renders per-stage totals in the Prometheus text exposition format."""
+    totals = get_totals() if totals is None else totals
+    metrics = (
+        ("halfpipe_stage_runs_total", "counter", "Stage executions.", "count"),
+        ("halfpipe_stage_errors_total", "counter", "Stage executions that raised.", "errors"),
+        ("halfpipe_stage_seconds_total", "counter", "Wall time spent in a stage.", "wall"),
+        ("halfpipe_stage_cpu_seconds_total", "counter", "CPU time of a stage or its subprocess.", "cpu"),
+        ("halfpipe_stage_bytes_total", "counter", "Bytes moved or written by a stage.", "bytes"),
+        ("halfpipe_stage_peak_rss_bytes", "gauge", "Highest peak RSS seen in a stage.", "peak_rss"),
+    )
+    lines = []
+    for metric, kind, help_text, key in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, t in sorted(totals.items()):
+            lines.append(f'{metric}{{stage="{name}"}} {t[key]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serves `/metrics` for Prometheus from a background thread and returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -1,64 +1,183 @@
+import hashlib
+import io
 import os
+import random
+import time
 import wave
-import google.genai as genai
-from google.genai import types
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from cache_utils import content_key
+from video_analysis import get_client
+from tracing import stage
 from dotenv import load_dotenv
 
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+TTS_VOICE = "Schedar"
+TTS_PROMPT = "Read in the voice of an action sports commentator speaking quickly with excitement: {text}"
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4"))
+TTS_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", "5"))
+# The TTS model returns 16-bit mono PCM at this rate
+TTS_SAMPLE_RATE = 24000
 
+# Rate limiting and transient server errors are retried with backoff
+RETRYABLE_STATUS_CODES = (429, 500, 503)
 
-def _wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
-   """Saves PCM data to a WAV file."""
-   with wave.open(filename, "wb") as wf:
-      wf.setnchannels(channels)
-      wf.setsampwidth(sample_width)
-      wf.setframerate(rate)
-      wf.writeframes(pcm)
+
+@dataclass
+class AudioClip:
+    """
+    Synthesized speech held in memory as raw little-endian PCM. The duration
+    follows from the PCM length, so clips never need to be probed, and they
+    reach ffmpeg through a pipe rather than a file.
+    """
+    pcm: bytes
+    rate: int = TTS_SAMPLE_RATE
+    channels: int = 1
+    sample_width: int = 2
+
+    @property
+    def duration(self):
+        return len(self.pcm) / (self.rate * self.channels * self.sample_width)
+
+    def digest(self):
+        """Hex MD5 of the PCM, for keying anything rendered from this clip."""
+        return hashlib.md5(self.pcm).hexdigest()
+
+    def input_kwargs(self):
+        """ffmpeg input options for reading this clip's PCM from a pipe."""
+        return {"format": f"s{self.sample_width * 8}le", "ar": self.rate, "ac": self.channels}
+
+    def wav_bytes(self):
+        """The clip as a WAV file."""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(self.sample_width)
+            wf.setframerate(self.rate)
+            wf.writeframes(self.pcm)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_wav(cls, path):
+        with wave.open(path, "rb") as wf:
+            return cls(wf.readframes(wf.getnframes()), wf.getframerate(), wf.getnchannels(), wf.getsampwidth())
 
 
-def generate_commentary_audio(text, output_filename):
+def concat_clips(clips):
     """
-    Generates audio commentary from text using the Gemini API and saves it to a file.
+    Joins clips of the same format into one track. Returns the track and the
+    offset in seconds at which each clip starts in it.
     """
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY not found in .env file.")
+    offsets = []
+    offset = 0.0
+    for clip in clips:
+        offsets.append(offset)
+        offset += clip.duration
+    first = clips[0]
+    return AudioClip(b"".join(clip.pcm for clip in clips), first.rate, first.channels, first.sample_width), offsets
 
-    client = genai.Client(api_key=GEMINI_API_KEY)
 
-    print(f"Generating audio for: '{text}'")
+def synthesize_speech(text):
+    """
+    Synthesizes commentary speech with the Gemini TTS model and returns the raw PCM bytes.
+    """
+    from google.genai import types
 
-    prompt = f"Read in the voice of an action sports commentator speaking quickly with excitement: {text}"
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-preview-tts",
-            contents=[prompt],
-            config=types.GenerateContentConfig(
-                response_modalities=[types.MediaModality.AUDIO],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name='Schedar',
-                        )
+    client = get_client()
+
+    prompt = TTS_PROMPT.format(text=text)
+    response = client.models.generate_content(
+        model=TTS_MODEL,
+        contents=[prompt],
+        config=types.GenerateContentConfig(
+            response_modalities=[types.MediaModality.AUDIO],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                        voice_name=TTS_VOICE,
                     )
-                ),
-            )
+                )
+            ),
         )
+    )
+
+    if (response
+        and response.candidates
+        and response.candidates[0].content
+        and response.candidates[0].content.parts):
+
+        audio_part = response.candidates[0].content.parts[0]
+        if audio_part.inline_data and audio_part.inline_data.data:
+            return audio_part.inline_data.data
 
-        if (response
-            and response.candidates
-            and response.candidates[0].content
-            and response.candidates[0].content.parts):
-            
-            audio_part = response.candidates[0].content.parts[0]
-            if audio_part.inline_data and audio_part.inline_data.data:
-                data = audio_part.inline_data.data
-                _wave_file(output_filename, data)
-                print(f"Audio saved to {output_filename}")
-                return output_filename
+    raise ValueError("Could not extract audio data from the response.")
 
-        raise ValueError("Could not extract audio data from the response.")
+
+def commentary_cache_key(text):
+    """Keys a commentary clip by everything that shapes the synthesized audio."""
+    return content_key(TTS_PROMPT.format(text=text), TTS_VOICE, TTS_MODEL)
+
+
+def _synthesize_with_retry(text, synthesize, max_retries, base_delay=1.0, max_delay=30.0):
+    """Calls `synthesize`, backing off exponentially with jitter on retryable errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            with stage("tts", chars=len(text), attempt=attempt) as record:
+                pcm = synthesize(text)
+                record["bytes"] = len(pcm)
+            return pcm
+        except Exception as e:
+            if getattr(e, "code", None) not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"TTS request failed with {e.code}, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def generate_commentary_audio(text, synthesize=synthesize_speech):
+    """
+    Generates audio commentary from text using the Gemini API and returns it as an `AudioClip`.
+    """
+    print(f"Generating audio for: '{text}'")
+    try:
+        with stage("tts", chars=len(text)) as record:
+            pcm = synthesize(text)
+            record["bytes"] = len(pcm)
+        clip = AudioClip(pcm)
+        print(f"Generated {clip.duration:.1f}s of audio")
+        return clip
 
     except Exception as e:
         print(f"Error generating audio: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def iter_commentary_audio(
+    texts,
+    max_concurrency=TTS_MAX_CONCURRENCY,
+    max_retries=TTS_MAX_RETRIES,
+    synthesize=synthesize_speech,
+):
+    """
+    Synthesizes all commentary clips concurrently and yields `(index, clip)`
+    as each `AudioClip` arrives, in completion order.
+
+    At most `max_concurrency` requests are in flight at once, and rate-limit
+    errors are retried with exponential backoff. Clips that still fail are
+    yielded as `None`.
+    """
+    def generate(text):
+        print(f"Generating audio for: '{text}'")
+        clip = AudioClip(_synthesize_with_retry(text, synthesize, max_retries))
+        print(f"Generated {clip.duration:.1f}s of audio for: '{text}'")
+        return clip
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {executor.submit(generate, text): i for i, text in enumerate(texts)}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                print(f"Error generating audio: {e}")
+                yield futures[future], None
@@ -1,38 +1,24 @@
+import asyncio
 import os
+import threading
 import time
 import datetime
-import google.genai as genai
+from cache_utils import content_key, file_digest
+from tracing import stage
 from pydantic import BaseModel
-from google.genai import types
 from dotenv import load_dotenv
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+ANALYSIS_MODEL = 'models/gemini-2.5-pro'
+# Processing polls start short and back off exponentially up to the cap
+POLL_INITIAL_SECONDS = float(os.getenv("POLL_INITIAL_SECONDS", "0.5"))
+POLL_MAX_SECONDS = float(os.getenv("POLL_MAX_SECONDS", "10"))
 
+_clients = {}
+_clients_lock = threading.Lock()
 
-class Trick(BaseModel):
-    trick_name: str
-    time_stamp_start: str
-    time_stamp_end: str
-    description: str
-    trick_score: float
-    previous_tricks: str
-    final_run_score: float
-    commentary: str
-
-
-def analyze_video(local_video_path):
-    """
-    Analyzes a video from a local path using the Gemini 2.5 Pro model.
-    """
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY not found in .env file.")
-
-    client = genai.Client(api_key=GEMINI_API_KEY)
-
-    print(f"Analyzing video from local path: {local_video_path}")
-
-    prompt = """You are a professional judge at a skateboarding vert competition. Use the official World Skate vert rules to analyze this video. Identify each trick that a skater performs and note the time stamps for the beggining and ending of the trick. Analyze each trick performed, name it, describe it,give it a score based on the provided criteria, and explain the reasoning for the score. 
+ANALYSIS_PROMPT = """You are a professional judge at a skateboarding vert competition. Use the official World Skate vert rules to analyze this video. Identify each trick that a skater performs and note the time stamps for the beggining and ending of the trick. Analyze each trick performed, name it, describe it,give it a score based on the provided criteria, and explain the reasoning for the score. 
     Do not make up trick names and scores if you are not able to identify the trick. Create commentary ouput like your a sports commentary explaining all of these elements. The commentary output should include a score value for the trick and a total run score. Keep track of each trick performed as well as the score for the trick. The total run score should start at 0 on the first trick. After the last trick is performed the final score should be an average of the top 3 tricks performed. In the commentary don't mention the running score until the last trick.
 
 First, record the number of tricks the skateboarder performs. Note each tricks corresponding start and end timestamps.
@@ -108,30 +94,115 @@ Think through the problem step by step.
 # </example>
 # """
 
+
+class Trick(BaseModel):
+    trick_name: str
+    time_stamp_start: str
+    time_stamp_end: str
+    description: str
+    trick_score: float
+    previous_tricks: str
+    final_run_score: float
+    commentary: str
+
+
+def get_client():
+    """
+    Returns the Gemini client shared by every analysis, TTS and frame request
+    in this process, so its HTTP connection pool stays warm between calls.
+    """
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not found in .env file.")
+    # The SDK takes several hundred ms to import, so commands that never call Gemini skip it
+    import google.genai as genai
+
+    pid = os.getpid()
+    with _clients_lock:
+        # Clients are not fork-safe, so worker processes get their own
+        if pid not in _clients:
+            _clients[pid] = genai.Client(api_key=GEMINI_API_KEY)
+        return _clients[pid]
+
+
+def _upload_size(local_video_path):
+    """Size of a path or of a seekable stream, for tracing."""
+    if isinstance(local_video_path, str):
+        return os.path.getsize(local_video_path)
+    return getattr(local_video_path, "size", None) or 0
+
+
+def _analysis_prompt(prompt_hints=None):
+    if not prompt_hints:
+        return ANALYSIS_PROMPT
+    return f"{ANALYSIS_PROMPT}\n\n<hints>\n{prompt_hints}\n</hints>"
+
+
+def _poll_intervals(initial=POLL_INITIAL_SECONDS, maximum=POLL_MAX_SECONDS, factor=2.0):
+    """Yields poll delays that start short and back off exponentially up to `maximum`."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(maximum, delay * factor)
+
+
+def analyze_video(local_video_path, mime_type=None, client=None, latencies=None, prompt_hints=None):
+    """
+    Analyzes a video using the Gemini 2.5 Pro model.
+
+    `local_video_path` may also be a seekable binary stream, such as one from
+    `gcs_utils.open_gcs_stream`, in which case `mime_type` must be given.
+    When a `latencies` dict is passed, the seconds spent uploading, waiting
+    for processing and generating are recorded in it. `prompt_hints` is
+    extra context appended to the analysis prompt.
+    """
+    from google.genai import types
+
+    if client is None:
+        client = get_client()
+    latencies = {} if latencies is None else latencies
+
+    if isinstance(local_video_path, str):
+        print(f"Analyzing video from local path: {local_video_path}")
+    else:
+        print("Analyzing video from stream")
+
     print("Uploading file to Gemini...")
-    video_file = client.files.upload(file=local_video_path)
+    started = time.perf_counter()
+    with stage("gemini.upload", bytes=_upload_size(local_video_path)):
+        video_file = client.files.upload(
+            file=local_video_path, config={"mime_type": mime_type} if mime_type else None
+        )
     video_file_name = video_file.name
+    latencies["upload"] = time.perf_counter() - started
 
     # Wait for the video to be processed
-    while video_file.state == types.FileState.PROCESSING:
-        print('.', end='', flush=True)
-        time.sleep(10)
-        if video_file_name:
-            video_file = client.files.get(name=video_file_name)
+    started = time.perf_counter()
+    with stage("gemini.processing"):
+        for delay in _poll_intervals():
+            if video_file.state != types.FileState.PROCESSING:
+                break
+            print('.', end='', flush=True)
+            time.sleep(delay)
+            if video_file_name:
+                video_file = client.files.get(name=video_file_name)
+    latencies["processing"] = time.perf_counter() - started
 
     if video_file.state == types.FileState.FAILED:
         raise ValueError(f"Video processing failed: {video_file.state}")
 
     print("\nFile uploaded and processed.")
-    
-    response = client.models.generate_content(
-        model='models/gemini-2.5-pro',
-        contents=[prompt, video_file],
-        config={
-        "response_mime_type": "application/json",
-        "response_schema": list[Trick],
-    },
-    )
+
+    started = time.perf_counter()
+    with stage("gemini.generation"):
+        response = client.models.generate_content(
+            model=ANALYSIS_MODEL,
+            contents=[_analysis_prompt(prompt_hints), video_file],
+            config={
+            "response_mime_type": "application/json",
+            "response_schema": list[Trick],
+        },
+        )
+    latencies["generation"] = time.perf_counter() - started
 
     # Clean up the uploaded file from the Gemini service
     if video_file_name:
@@ -139,3 +210,111 @@ Think through the problem step by step.
         print(f"Deleted file from Gemini service: {video_file_name}")
 
     return response.text
+
+
+async def analyze_video_async(local_video_path, mime_type=None, client=None, latencies=None, prompt_hints=None):
+    """
+    Async variant of `analyze_video` built on `client.aio`, so many uploads and
+    processing polls can be in flight on one event loop. `prompt_hints` is
+    extra context appended to the analysis prompt, as in `analyze_video`.
+
+    `client` may be any object exposing the `aio.files` and `aio.models` calls
+    used here, such as a local stub of the files API.
+    """
+    from google.genai import types
+
+    if client is None:
+        client = get_client()
+    latencies = {} if latencies is None else latencies
+
+    started = time.perf_counter()
+    with stage("gemini.upload", bytes=_upload_size(local_video_path)):
+        video_file = await client.aio.files.upload(
+            file=local_video_path, config={"mime_type": mime_type} if mime_type else None
+        )
+    video_file_name = video_file.name
+    latencies["upload"] = time.perf_counter() - started
+
+    try:
+        started = time.perf_counter()
+        with stage("gemini.processing"):
+            for delay in _poll_intervals():
+                if video_file.state != types.FileState.PROCESSING:
+                    break
+                await asyncio.sleep(delay)
+                video_file = await client.aio.files.get(name=video_file_name)
+        latencies["processing"] = time.perf_counter() - started
+
+        if video_file.state == types.FileState.FAILED:
+            raise ValueError(f"Video processing failed: {video_file.state}")
+
+        started = time.perf_counter()
+        with stage("gemini.generation"):
+            response = await client.aio.models.generate_content(
+                model=ANALYSIS_MODEL,
+                contents=[_analysis_prompt(prompt_hints), video_file],
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": list[Trick],
+                },
+            )
+        latencies["generation"] = time.perf_counter() - started
+    finally:
+        # Clean up the uploaded file from the Gemini service
+        await client.aio.files.delete(name=video_file_name)
+
+    return response.text
+
+
+async def analyze_videos_async(local_video_paths, max_concurrency=4, client=None, prompt_hints=None):
+    """
+    Analyzes many videos concurrently, with at most `max_concurrency` in
+    flight, each with the same `prompt_hints`.
+
+    Returns one `(result, latencies)` pair per video, in input order, where
+    `result` is the analysis JSON or the exception that analysis raised.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def analyze(local_video_path):
+        latencies = {}
+        async with semaphore:
+            try:
+                result = await analyze_video_async(
+                    local_video_path, client=client, latencies=latencies, prompt_hints=prompt_hints
+                )
+                return result, latencies
+            except Exception as e:
+                return e, latencies
+
+    return await asyncio.gather(*(analyze(path) for path in local_video_paths))
+
+
+def analysis_cache_key(content_digest, prompt_hints=None):
+    """The cache key of an analysis of the video with `content_digest`, under the current prompt and model."""
+    return content_key(content_digest, _analysis_prompt(prompt_hints), ANALYSIS_MODEL)
+
+
+def analyze_video_cached(local_video_path, cache=None, content_digest=None, mime_type=None, prompt_hints=None):
+    """
+    Analyzes a video, reusing a cached result for the same video bytes, prompt and model.
+
+    For streams, pass the hex MD5 of the video as `content_digest`; streams
+    without one are analyzed uncached.
+    """
+    if cache is None:
+        return analyze_video(local_video_path, mime_type, prompt_hints=prompt_hints)
+    if content_digest is None and isinstance(local_video_path, str):
+        content_digest = file_digest(local_video_path)
+    if content_digest is None:
+        return analyze_video(local_video_path, mime_type, prompt_hints=prompt_hints)
+
+    key = analysis_cache_key(content_digest, prompt_hints)
+    analysis_result = cache.get_text("analysis", key, ".json")
+    if analysis_result is not None:
+        print(f"Using cached analysis for {content_digest}")
+        return analysis_result
+
+    analysis_result = analyze_video(local_video_path, mime_type, prompt_hints=prompt_hints)
+    cache.put_text("analysis", key, analysis_result, ".json")
+    return analysis_result
@@ -1,104 +1,98 @@
-import json
 import os
+import shutil
+import tempfile
 import ffmpeg
-from tts_utils import generate_commentary_audio
-from video_analysis import Trick
+from tts_utils import (
+    TTS_MAX_CONCURRENCY,
+    AudioClip,
+    commentary_cache_key,
+    concat_clips,
+    iter_commentary_audio,
+    synthesize_speech,
+)
+from timeline import load_timeline
+from segment_render import Segment, render_segments
+from render_profiles import get_render_profile
+from scoreboard import FINAL_SCORE_SECONDS, apply_overlays, score_overlays
+from tracing import run_ffmpeg, stage
+from workspace import small_dir
 
-def create_commentary_video(source_video_path, analysis_json, output_video_path, temp_dir):
-    """
-    Creates a new video with commentary overlaid on the original video.
+
+def commentary_overlays(timeline, scoreboard=False):
+    """Score cards of the commentary video: the final score for 5 seconds, 1 second after the last trick."""
+    final_start = timeline.ends[-1] + 1
+    return score_overlays(timeline, final_start, final_start + FINAL_SCORE_SECONDS, scoreboard)
+
+
+def build_commentary_graph(
+    source_video_path,
+    timeline,
+    commentary_track,
+    offsets,
+    output_video_path,
+    profile=None,
+    overlays=None,
+    work_dir=None,
+):
     """
-    try:
-        tricks_data = json.loads(analysis_json)
-        tricks = [Trick(**trick) for trick in tricks_data]
-        print(f"Tricks JSON: \n{tricks}")
-    except (json.JSONDecodeError, TypeError) as e:
-        print(f"Error parsing analysis JSON: {e}")
-        return
+    Builds a single ffmpeg graph that renders the commentary video.
 
-    if not tricks:
-        print("No tricks found in the analysis text.")
-        return
+    The source is opened once and fanned out with `split`/`asplit`. Each trick
+    segment is frozen on its last frame with `tpad` for the length of its
+    commentary clip, so no separate frame grabs are needed. The commentary is
+    one `AudioClip` track read from stdin, as joined by `concat_clips`, and
+    `offsets` holds where each trick's clip starts in it. Run the graph with
+    the track's PCM as input. The output is encoded with the render `profile`.
+
+    `overlays` are score cards in source time, by default those of
+    `commentary_overlays`. They are drawn on the source before it is cut, so
+    each freeze holds the card shown on its frame. The card images are
+    written to `work_dir`, next to the output by default.
+    """
+    profile = get_render_profile(profile)
+    if overlays is None:
+        overlays = commentary_overlays(timeline)
+    work_dir = work_dir or os.path.join(os.path.dirname(os.path.abspath(output_video_path)), "cards")
+    source = ffmpeg.input(source_video_path)
+    video_split = apply_overlays(
+        source.video, overlays, work_dir, name=os.path.basename(output_video_path)
+    ).split()
+    audio_split = source.audio.asplit()
+    commentary_split = ffmpeg.input("pipe:", **commentary_track.input_kwargs()).audio.asplit()
+    clip_ends = list(offsets[1:]) + [commentary_track.duration]
 
-    temp_audio_files = []
     video_streams = []
     audio_streams = []
     last_end_time = 0
 
-    # Get the original video's audio stream
-    original_audio = ffmpeg.input(source_video_path)['a']
+    for i, (trick_end_time, clip_start, clip_end) in enumerate(zip(timeline.ends, offsets, clip_ends)):
+        audio_duration = clip_end - clip_start
 
-    for i, trick in enumerate(tricks):
-        # Generate commentary audio for the trick
-        audio_filename = os.path.join(temp_dir, f"temp_audio_{i}.wav")
-        if not os.path.exists(audio_filename):
-            generate_commentary_audio(trick.commentary, audio_filename)
-        temp_audio_files.append(audio_filename)
-        commentary_audio = ffmpeg.input(audio_filename)['a']
-
-        # Get the end time of the trick
-        time_parts = list(map(int, trick.time_stamp_end.split(':')))
-        if len(time_parts) == 3:
-            h, m, s = time_parts
-            trick_end_time = h * 3600 + m * 60 + s
-        elif len(time_parts) == 2:
-            m, s = time_parts
-            trick_end_time = m * 60 + s
-        else:
-            raise ValueError(f"Invalid timestamp format: {trick.time_stamp_end}")
-
-        # Get the duration of the commentary audio
-        audio_probe = ffmpeg.probe(audio_filename)
-        audio_duration = float(audio_probe['format']['duration'])
-
-        # Add the video segment for the trick
+        # Add the video segment for the trick, holding its last frame while
+        # the commentary plays
         video_streams.append(
-            ffmpeg.input(source_video_path).trim(start=last_end_time, end=trick_end_time).setpts('PTS-STARTPTS')
+            video_split[i]
+            .trim(start=last_end_time, end=trick_end_time)
+            .setpts('PTS-STARTPTS')
+            .filter('tpad', stop_mode='clone', stop_duration=audio_duration)
         )
-        
-        # Add a "paused" frame at the end of the trick
-        temp_frame_path = os.path.join(temp_dir, f"temp_frame_{i}.jpg")
-        ffmpeg.input(source_video_path, ss=trick_end_time).output(temp_frame_path, vframes=1).run(overwrite_output=True)
-        
-        paused_clip = ffmpeg.input(temp_frame_path, loop=1, t=audio_duration)
-        video_streams.append(paused_clip['v'])
-        
+
         # Add the original audio segment for the trick
         audio_streams.append(
-            original_audio.filter('atrim', start=last_end_time, end=trick_end_time).filter('asetpts', 'PTS-STARTPTS')
+            audio_split[i].filter('atrim', start=last_end_time, end=trick_end_time).filter('asetpts', 'PTS-STARTPTS')
         )
-        
+
         # Add the commentary audio
-        audio_streams.append(commentary_audio)
-        
+        audio_streams.append(
+            commentary_split[i].filter('atrim', start=clip_start, end=clip_end).filter('asetpts', 'PTS-STARTPTS')
+        )
 
         last_end_time = trick_end_time
 
     # Add the remainder of the video and audio
-    # Get the final score from the last trick
-    final_score = tricks[-1].final_run_score
-    score_text = f"Final Score: {final_score}"
-
-    # Add the remainder of the video with the score overlay
-    remainder_video = (
-        ffmpeg.input(source_video_path)
-        .trim(start=last_end_time)
-        .setpts("PTS-STARTPTS")
-        .drawtext(
-            text=score_text,
-            x="w-tw-10",
-            y="h-th-10",
-            fontsize=48,
-            fontcolor="white",
-            box=1,
-            boxcolor="black@0.5",
-            boxborderw=5,
-            enable="between(t,1,6)",  # Show for 5 seconds, 1 second after the last trick
-        )
-    )
-    video_streams.append(remainder_video)
+    video_streams.append(video_split[len(timeline)].trim(start=last_end_time).setpts("PTS-STARTPTS"))
     audio_streams.append(
-        original_audio.filter("atrim", start=last_end_time).filter(
+        audio_split[len(timeline)].filter("atrim", start=last_end_time).filter(
             "asetpts", "PTS-STARTPTS"
         )
     )
@@ -108,45 +102,194 @@ def create_commentary_video(source_video_path, analysis_json, output_video_path,
     final_audio = ffmpeg.concat(*audio_streams, v=0, a=1)
 
     # Combine the final video and audio
-    ffmpeg.output(final_video, final_audio, output_video_path).run(overwrite_output=True)
+    return ffmpeg.output(profile.filter_video(final_video), final_audio, output_video_path, **profile.output_kwargs())
 
-    # Clean up temporary audio files
+
+def build_commentary_segments(timeline, audio_clips, scoreboard=False):
+    """
+    Describes the commentary video as `Segment`s for `render_segments`: each
+    trick's span frozen for its commentary `AudioClip`, then the remainder
+    with the score. With `scoreboard`, every span also carries the running
+    per-trick scoreboard.
+    """
+    overlays = commentary_overlays(timeline, scoreboard)
+    segments = []
+    last_end_time = 0
+    for trick_end_time, clip in zip(timeline.ends, audio_clips):
+        segments.append(
+            Segment(last_end_time, trick_end_time, freeze=clip.duration, commentary_audio=clip, overlays=overlays)
+        )
+        last_end_time = trick_end_time
+    segments.append(Segment(last_end_time, overlays=overlays))
+    return segments
 
 
-def add_score_overlay(source_video_path, analysis_json, output_video_path):
+def create_commentary_video(
+    source_video_path,
+    analysis,
+    output_video_path,
+    temp_dir,
+    tts_concurrency=TTS_MAX_CONCURRENCY,
+    synthesize=synthesize_speech,
+    cache=None,
+    segmented=True,
+    profile=None,
+    scoreboard=False,
+    source_digest=None,
+):
     """
-    Adds a final score overlay to the video without commentary.
+    Creates a new video with commentary overlaid on the original video.
+    `analysis` is the analysis JSON or an already parsed `Timeline`.
+    With `scoreboard`, each trick's score and the running average are shown
+    from the trick's end until the next trick's.
+
+    Commentary clips are synthesized concurrently with up to `tts_concurrency`
+    requests in flight. `synthesize` maps text to PCM bytes and can be
+    swapped for a local fake backend. When a `ContentCache` is given, clips
+    are reused across runs keyed by their text, voice and model.
+
+    With `segmented`, untouched spans of the source are stream-copied and only
+    the spans around freeze frames and overlays are re-encoded. Re-encoded
+    spans are cached too, so after a trick's commentary or score is edited
+    only the spans it touches are synthesized and encoded again. `profile`
+    names the render profile used for encoding. `source_digest` keys the
+    cached spans of a source that is a URL rather than a local file.
     """
     try:
-        tricks_data = json.loads(analysis_json)
-        tricks = [Trick(**trick) for trick in tricks_data]
-    except (json.JSONDecodeError, TypeError) as e:
+        timeline = load_timeline(analysis)
+    except ValueError as e:
         print(f"Error parsing analysis JSON: {e}")
         return
+    tricks = timeline.tricks
+    print(f"Tricks JSON: \n{tricks}")
 
     if not tricks:
         print("No tricks found in the analysis text.")
         return
 
+    # Reuse commentary clips cached for the same text, voice and model
+    audio_clips = [None] * len(tricks)
+    for i, trick in enumerate(tricks):
+        cached_audio = cache.get_path("tts", commentary_cache_key(trick.commentary), ".wav") if cache else None
+        if cached_audio:
+            audio_clips[i] = AudioClip.from_wav(cached_audio)
+    missing = [i for i, clip in enumerate(audio_clips) if clip is None]
+
+    # Synthesize the missing commentary clips concurrently. They stay in
+    # memory, and their durations follow from their PCM length
+    generated = iter_commentary_audio(
+        [tricks[i].commentary for i in missing],
+        max_concurrency=tts_concurrency,
+        synthesize=synthesize,
+    )
+    for j, clip in generated:
+        i = missing[j]
+        if clip is None:
+            print(f"Could not generate commentary audio for trick {i + 1}.")
+            return
+        if cache:
+            cache.put_bytes("tts", commentary_cache_key(tricks[i].commentary), clip.wav_bytes(), ".wav")
+        audio_clips[i] = clip
+
+    if segmented:
+        segments = build_commentary_segments(timeline, audio_clips, scoreboard)
+        if render_segments(
+            source_video_path,
+            segments,
+            output_video_path,
+            profile=profile,
+            cache=cache,
+            source_digest=source_digest,
+            work_dir=temp_dir,
+        ):
+            return
+        print("Source cannot be stream-copied with this render profile, re-encoding the whole video.")
+
+    # Render everything in a single ffmpeg process, reading the commentary
+    # as one track from stdin
+    commentary_track, offsets = concat_clips(audio_clips)
+    work_dir = tempfile.mkdtemp(prefix="cards_", dir=small_dir(temp_dir))
+    try:
+        graph = build_commentary_graph(
+            source_video_path,
+            timeline,
+            commentary_track,
+            offsets,
+            output_video_path,
+            profile,
+            overlays=commentary_overlays(timeline, scoreboard),
+            work_dir=work_dir,
+        )
+        run_ffmpeg(graph, "ffmpeg.commentary", input=commentary_track.pcm)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def add_score_overlay(
+    source_video_path,
+    analysis,
+    output_video_path,
+    segmented=True,
+    profile=None,
+    cache=None,
+    scoreboard=False,
+    temp_dir=None,
+    source_digest=None,
+):
+    """
+    Adds a final score overlay to the video without commentary. `analysis` is
+    the analysis JSON or an already parsed `Timeline`. With `scoreboard`,
+    each trick's score and the running average are shown from the trick's
+    end until the next trick's, and the final score over the last 5 seconds.
+
+    With `segmented`, only the span from the last keyframe before the overlay
+    is re-encoded and the rest of the video is stream-copied, and the
+    re-encoded span is kept in `cache` if one is given. `profile` names the
+    render profile used for encoding, and `source_digest` keys the cached
+    span of a source that is a URL. Intermediates are written to `temp_dir`,
+    next to the output by default.
+    """
+    try:
+        timeline = load_timeline(analysis)
+    except ValueError as e:
+        print(f"Error parsing analysis JSON: {e}")
+        return
+
+    if not len(timeline):
+        print("No tricks found in the analysis text.")
+        return
+
     # Get video duration
-    probe = ffmpeg.probe(source_video_path)
+    with stage("ffprobe", path=source_video_path):
+        probe = ffmpeg.probe(source_video_path)
     duration = float(probe["format"]["duration"])
-    overlay_start_time = duration - 5
+    overlays = score_overlays(timeline, duration - FINAL_SCORE_SECONDS, scoreboard=scoreboard)
 
-    final_score = tricks[-1].final_run_score
-    score_text = f"Final Score: {final_score}"
+    if segmented:
+        pieces = [Segment(0.0, overlays=overlays)]
+        if render_segments(
+            source_video_path,
+            pieces,
+            output_video_path,
+            profile=profile,
+            cache=cache,
+            source_digest=source_digest,
+            work_dir=temp_dir,
+        ):
+            return
+        print("Source cannot be stream-copied with this render profile, re-encoding the whole video.")
 
     video_input = ffmpeg.input(source_video_path)
-    video_with_overlay = video_input.video.drawtext(
-        text=score_text,
-        x="w-tw-10",
-        y="h-th-10",
-        fontsize=48,
-        fontcolor="white",
-        box=1,
-        boxcolor="black@0.5",
-        boxborderw=5,
-        enable=f"gte(t,{overlay_start_time})",
-    )
-
-    ffmpeg.output(video_with_overlay, video_input.audio, output_video_path).run(overwrite_output=True)
+    temp_dir = temp_dir or os.path.dirname(os.path.abspath(output_video_path))
+    work_dir = tempfile.mkdtemp(prefix="cards_", dir=small_dir(temp_dir))
+    try:
+        video_with_overlay = apply_overlays(video_input.video, overlays, work_dir)
+        profile = get_render_profile(profile)
+        run_ffmpeg(
+            ffmpeg.output(
+                profile.filter_video(video_with_overlay), video_input.audio, output_video_path, **profile.output_kwargs()
+            ),
+            "ffmpeg.overlay",
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,259 @@
+import fnmatch
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+# Bounds the temp directory outside the cache, which has its own CACHE_MAX_MB; 0 disables the quota
+WORKSPACE_QUOTA_MB = int(os.getenv("WORKSPACE_QUOTA_MB", "0"))
+# A tmpfs such as /dev/shm for small intermediates like score cards; unset keeps them on disk
+WORKSPACE_TMPFS_DIR = os.getenv("WORKSPACE_TMPFS_DIR", "")
+# Small intermediates go to the tmpfs only while it has at least this much free
+WORKSPACE_TMPFS_MIN_FREE_MB = int(os.getenv("WORKSPACE_TMPFS_MIN_FREE_MB", "256"))
+# Leftovers without a live owner are swept once they are this old
+WORKSPACE_ORPHAN_SECONDS = int(os.getenv("WORKSPACE_ORPHAN_SECONDS", "3600"))
+
+OWNER_FILE = ".owner"
+TMPFS_SUBDIR = "halfpipe"
+# Intermediates that a crashed render or analysis leaves behind
+ORPHAN_PATTERNS = ("segments_*", "cards_*", "*.tmp", "*_proxy_*.mp4", "*_active.mp4", "*_angles.mp4", "window_*.mp4")
+# Analyses, manifests, traces and logs are small and are never evicted for the quota
+KEEP_EXTENSIONS = (".json", ".jsonl", ".txt", ".csv", ".log")
+
+
+def small_dir(default_dir):
+    """
+    Returns the directory for a small intermediate: a subdirectory of
+    `WORKSPACE_TMPFS_DIR` if one is set and has room, else `default_dir`.
+    """
+    if WORKSPACE_TMPFS_DIR and os.path.isdir(WORKSPACE_TMPFS_DIR):
+        if shutil.disk_usage(WORKSPACE_TMPFS_DIR).free >= WORKSPACE_TMPFS_MIN_FREE_MB * 1024 * 1024:
+            path = os.path.join(WORKSPACE_TMPFS_DIR, TMPFS_SUBDIR)
+            os.makedirs(path, exist_ok=True)
+            return path
+    os.makedirs(default_dir, exist_ok=True)
+    return default_dir
+
+
+def _owner_alive(owner):
+    """Whether the process that wrote `owner` still runs. Owners on other hosts are assumed alive."""
+    if owner.get("host") != socket.gethostname():
+        return True
+    try:
+        os.kill(owner["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_owner(path):
+    try:
+        with open(os.path.join(path, OWNER_FILE), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _tree_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+    return total
+
+
+def _remove(path):
+    """Removes a file or directory tree and returns the bytes freed."""
+    try:
+        size = _tree_size(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        # Another process sharing the workspace removed it first
+        return 0
+    return size
+
+
+class Workspace:
+    """
+    The temp directory shared by every command and worker.
+
+    Jobs work in scoped directories under `<root>/work` that are removed when
+    they finish. Directories that must outlive a job, such as a batch run's
+    download or a service job's outputs, are leased while in use instead.
+    Both carry an owner file with the pid of the process using them, so
+    `sweep_orphans` can tell what a crashed process left behind from what
+    a running one is still writing. With a quota, `enforce_quota` evicts
+    the least recently used files that no live process owns.
+    """
+
+    def __init__(self, root, quota_bytes=WORKSPACE_QUOTA_MB * 1024 * 1024, exclude=(),
+                 orphan_seconds=WORKSPACE_ORPHAN_SECONDS):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        # Directories with their own size limit, such as the cache
+        self.exclude = [os.path.abspath(path) for path in exclude]
+        self.orphan_seconds = orphan_seconds
+        self.jobs_dir = os.path.join(root, "work")
+        self._lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def acquire(self, path):
+        """Marks `path`, created if needed, as in use by this process."""
+        os.makedirs(path, exist_ok=True)
+        owner = {"pid": os.getpid(), "host": socket.gethostname(), "started": time.time()}
+        temp_path = os.path.join(path, f"{OWNER_FILE}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(owner, f)
+        os.replace(temp_path, os.path.join(path, OWNER_FILE))
+
+    def release(self, path):
+        try:
+            os.remove(os.path.join(path, OWNER_FILE))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def lease(self, path):
+        """Holds `path` for the duration of the block; its contents are kept."""
+        self.acquire(path)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    @contextmanager
+    def job(self, name):
+        """
+        A scoped directory for one job's intermediates, removed with
+        everything in it when the block exits, even on an error.
+        """
+        self.enforce_quota()
+        path = os.path.join(self.jobs_dir, f"{name}-{uuid.uuid4().hex[:8]}")
+        self.acquire(path)
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _walk(self, skip_excluded=True):
+        """
+        Yields `(dirpath, dirnames, filenames, owner)` below the root,
+        skipping directories a live process owns and, with `skip_excluded`,
+        the excluded ones. `owner` is set for directories whose owner has died.
+        """
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if skip_excluded:
+                dirnames[:] = [
+                    name for name in dirnames if os.path.abspath(os.path.join(dirpath, name)) not in self.exclude
+                ]
+            owner = _read_owner(dirpath) if OWNER_FILE in filenames else None
+            if owner and _owner_alive(owner):
+                dirnames[:] = []
+                continue
+            yield dirpath, dirnames, filenames, owner
+
+    def usage(self):
+        """Bytes used under the root, outside the excluded directories."""
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [
+                name for name in dirnames if os.path.abspath(os.path.join(dirpath, name)) not in self.exclude
+            ]
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+        return total
+
+    def enforce_quota(self, needed=0):
+        """
+        Deletes least recently used files that no live process owns until
+        the workspace plus `needed` bytes fits in the quota. Analyses,
+        manifests and logs are never evicted.
+        """
+        if not self.quota_bytes:
+            return
+        with self._lock:
+            used = self.usage()
+            if used + needed <= self.quota_bytes:
+                return
+            candidates = []
+            for dirpath, _, filenames, _ in self._walk():
+                for name in filenames:
+                    if name == OWNER_FILE or name.endswith(KEEP_EXTENSIONS):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        candidates.append((os.path.getmtime(path), path))
+                    except FileNotFoundError:
+                        continue
+            for _, path in sorted(candidates):
+                if used + needed <= self.quota_bytes:
+                    break
+                freed = _remove(path)
+                used -= freed
+                print(f"Evicted {os.path.relpath(path, self.root)} ({freed / (1024 * 1024):.1f} MB) from the workspace")
+            if used + needed > self.quota_bytes:
+                print(
+                    f"Workspace holds {used / (1024 * 1024):.0f} MB in use, over its "
+                    f"{self.quota_bytes / (1024 * 1024):.0f} MB quota."
+                )
+
+    def sweep_orphans(self):
+        """
+        Removes what crashed processes left behind: job directories and
+        leases whose owner has died, and stray intermediates older than
+        `orphan_seconds`, including those in the tmpfs. Returns the bytes freed.
+        """
+        cutoff = time.time() - self.orphan_seconds
+        freed = 0
+        # Interrupted writes to the cache are swept too
+        for dirpath, dirnames, filenames, owner in self._walk(skip_excluded=False):
+            if owner is not None:
+                if os.path.dirname(os.path.abspath(dirpath)) == os.path.abspath(self.jobs_dir):
+                    freed += _remove(dirpath)
+                    dirnames[:] = []
+                    continue
+                # A leased directory's outputs are kept
+                self.release(dirpath)
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                # A job directory that never got its owner file
+                stale_job = dirpath == self.jobs_dir and name in dirnames and _read_owner(path) is None
+                if stale_job or any(fnmatch.fnmatch(name, pattern) for pattern in ORPHAN_PATTERNS):
+                    try:
+                        if os.path.getmtime(path) < cutoff:
+                            freed += _remove(path)
+                    except FileNotFoundError:
+                        continue
+            dirnames[:] = [name for name in dirnames if os.path.isdir(os.path.join(dirpath, name))]
+
+        tmpfs_dir = os.path.join(WORKSPACE_TMPFS_DIR, TMPFS_SUBDIR) if WORKSPACE_TMPFS_DIR else None
+        if tmpfs_dir and os.path.isdir(tmpfs_dir):
+            for name in os.listdir(tmpfs_dir):
+                path = os.path.join(tmpfs_dir, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        freed += _remove(path)
+                except FileNotFoundError:
+                    continue
+        if freed:
+            print(f"Swept {freed / (1024 * 1024):.1f} MB of orphaned files from the workspace.")
+        return freed